@@ -0,0 +1,6 @@
+# Production ASGI entry point: downloads and notification long polls on an event loop,
+# every other route by the Flask app (see asyncapp.py).
+# Run with: uvicorn asgi:app --host 0.0.0.0 --port 5555
+from asyncapp import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,270 @@
+import asyncio
+import contextvars
+import logging
+import mimetypes
+import os
+from collections import defaultdict, namedtuple
+from contextlib import asynccontextmanager
+from functools import wraps
+from itertools import starmap
+import anyio
+import jwt
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import FileResponse, Response
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_accept_header
+from app import create_app
+from compression import VARIANT_SUFFIXES, material_variant
+from config import Config, async_engine_options
+from database import configure_sqlite
+from models import LearningMaterial, Notifications, Parent, Teacher
+from partitions import recent_since
+from readmodels import NotificationRow, latest_notification_id, notifications_after
+from routes.auth import secret_key
+from routes.notification import poll_args
+from storage import LocalStorage, get_storage
+from tenancy import school_schema, use_schema
+
+# An asyncio serving path (Starlette, run by uvicorn) for the routes that mostly wait:
+#   - GET /download/<filename> from local storage: the file goes out a chunk at a time as
+#     the client takes it, so a slow phone holds a little memory instead of a worker thread;
+#   - GET /notifications/poll, the long poll: a waiting poll is just a future, and one query
+#     per school every NOTIFICATION_POLL_INTERVAL finds the polls to wake, however many wait.
+# They read through SQLAlchemy's asyncio engine (asyncpg or aiosqlite) with the same models
+# and statements as the Flask routes, and answer the same way.
+#
+# Every other route is the Flask app, run by a pool of ASGI_WSGI_THREADS threads. So are
+# downloads from S3, which are a quick redirect to a presigned URL.
+
+logger = logging.getLogger(__name__)
+
+User = namedtuple('User', 'model id school_id')
+
+
+def async_database_uri(database_uri):
+    # The same database through an asyncio driver
+    url = make_url(database_uri)
+    drivers = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+    if url.get_backend_name() not in drivers:
+        raise RuntimeError(f'asgi.py needs PostgreSQL or SQLite, not {url.get_backend_name()}')
+    return url.set(drivername=drivers[url.get_backend_name()])
+
+
+def json_response(request, obj, status=200):
+    # Encoded by the Flask app's JSON provider (orjson), so both paths answer alike
+    return Response(request.app.state.flask_app.json.dumps(obj), status_code=status, media_type='application/json')
+
+
+@asynccontextmanager
+async def connect(state, school_id):
+    # In schema mode (tenancy.py), on the school's own tables. These statements don't go
+    # through db.session, so they filter by parent or user themselves.
+    async with state.engine.connect() as connection:
+        if school_id is not None and state.schemas:
+            await connection.run_sync(_use_school_schema, school_id)
+        yield connection
+
+
+def _use_school_schema(connection, school_id):
+    schema = school_schema(connection, school_id)
+    if schema:
+        use_schema(connection, schema)
+
+
+async def fetch(connection, row_class, statement):
+    return list(starmap(row_class, (await connection.execute(statement)).tuples()))
+
+
+# routes.utils.token_required for these routes: checks the token, looks its user up and
+# passes the view a User. The view runs in the Flask app's context, for its config.
+def token_required(f):
+    @wraps(f)
+    async def decorated(request):
+        with request.app.state.flask_app.app_context():
+            token = request.headers.get('Authorization')
+            if not token or not token.startswith('Bearer '):
+                return json_response(request, {'message': 'Token is missing or incorrect format!'}, 403)
+            try:
+                decoded_token = jwt.decode(token.split()[1], secret_key(), algorithms=['HS256'])
+            except jwt.ExpiredSignatureError:
+                return json_response(request, {'message': 'Token has expired!'}, 401)
+            except jwt.InvalidTokenError:
+                return json_response(request, {'message': 'Invalid token!'}, 401)
+
+            model = {'Teacher': Teacher, 'Parent': Parent}.get(decoded_token.get('role'))
+            school_id = decoded_token.get('school_id')
+            school_id = school_id if isinstance(school_id, int) else None
+            row = None
+            if model:
+                statement = select(model.id, model.school_id).where(model.id == decoded_token.get('user_id'))
+                if school_id is not None:
+                    statement = statement.where(model.school_id == school_id)
+                async with connect(request.app.state, school_id) as connection:
+                    row = (await connection.execute(statement)).first()
+            if row is None:
+                return json_response(request, {'message': 'User not found!'}, 404)
+            return await f(request, User(model, *row))
+
+    return decorated
+
+
+## Downloads from local storage ##
+
+@token_required
+async def download_file(request, current_user):
+    filename = request.path_params['filename']
+    # As routes.learningmaterialdownload: only files of a material in the user's school
+    storage = request.app.state.storage
+    async with connect(request.app.state, current_user.school_id) as connection:
+        material = (await connection.execute(
+            select(LearningMaterial.id).where(LearningMaterial.file_path == storage.location(filename),
+                                              LearningMaterial.school_id == current_user.school_id))).first()
+    if material is None:
+        return json_response(request, {'error': 'File not found'}, 404)
+    accept_encodings = parse_accept_header(request.headers.get('Accept-Encoding'))
+    # The same choice as compression.send_material(), made off the event loop as it stats files
+    path, encoding, variants = await anyio.to_thread.run_sync(
+        material_variant, storage.directory, filename, accept_encodings)
+    if path is None or not await anyio.to_thread.run_sync(os.path.isfile, path):
+        return json_response(request, {'error': 'File not found'}, 404)
+    if encoding:
+        path += VARIANT_SUFFIXES[encoding]
+
+    headers = {}
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    if variants:
+        headers['Vary'] = 'Accept-Encoding'
+    return FileResponse(path, media_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                        headers=headers)
+
+
+## Long polls of notifications ##
+
+class NotificationWatcher:
+    # The long polls waiting in this process, by (school, parent). While there are any, every
+    # `interval` seconds one query per school finds the parents with a notification newer
+    # than one of their polls' `after`, and those polls are woken.
+    def __init__(self, state, interval):
+        self.state = state
+        self.interval = interval
+        self.waiting = defaultdict(list)  # (school id, parent id): [(after, future)]
+        self.task = None
+
+    async def wait(self, school_id, parent_id, after, timeout):
+        # True as soon as the parent has a notification newer than `after`, False after `timeout`
+        future = asyncio.get_running_loop().create_future()
+        key, entry = (school_id, parent_id), (after, future)
+        self.waiting[key].append(entry)
+        if self.task is None or self.task.done():
+            # Not in the request's context, which it outlives
+            self.task = asyncio.create_task(self.run(), context=contextvars.Context())
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting[key].remove(entry)
+            if not self.waiting[key]:
+                del self.waiting[key]
+
+    async def run(self):
+        with self.state.flask_app.app_context():
+            while self.waiting:
+                await asyncio.sleep(self.interval)
+                schools = defaultdict(dict)  # school id: {parent id: lowest `after`}
+                for (school_id, parent_id), entries in self.waiting.items():
+                    schools[school_id][parent_id] = min(after for after, _ in entries)
+                for school_id, parents in schools.items():
+                    try:
+                        latest = await self.latest(school_id, parents)
+                    except Exception:
+                        logger.exception('Could not look for new notifications')
+                        continue
+                    for parent_id, latest_id in latest:
+                        for after, future in self.waiting.get((school_id, parent_id), ()):
+                            if latest_id > after and not future.done():
+                                future.set_result(None)
+
+    async def latest(self, school_id, parents, chunk_size=500):
+        # (parent id, newest notification id) of the parents with one newer than their `after`
+        rows = []
+        parents = list(parents.items())
+        async with connect(self.state, school_id) as connection:
+            for start in range(0, len(parents), chunk_size):
+                chunk = dict(parents[start:start + chunk_size])
+                rows += (await connection.execute(
+                    select(Notifications.parent_id, func.max(Notifications.id))
+                    .where(Notifications.parent_id.in_(chunk), Notifications.school_id == school_id,
+                           Notifications.id > min(chunk.values()), Notifications.created_at >= recent_since())
+                    .group_by(Notifications.parent_id))).all()
+        return rows
+
+
+@token_required
+async def poll_notifications(request, current_user):
+    if current_user.model is not Parent:
+        return json_response(request, {'message': 'Unauthorized'}, 403)
+    state = request.app.state
+    try:
+        after, timeout = poll_args(request.query_params, state.flask_app.config['NOTIFICATION_POLL_TIMEOUT'])
+    except ValueError as e:
+        return json_response(request, {'message': str(e)}, 400)
+
+    async with connect(state, current_user.school_id) as connection:
+        if after is None:
+            after = (await connection.execute(
+                latest_notification_id(current_user.id, current_user.school_id))).scalar() or 0
+        notifications = await fetch(connection, NotificationRow,
+                                    notifications_after(current_user.id, current_user.school_id, after))
+    # No connection is held while waiting
+    if not notifications and timeout and await state.watcher.wait(current_user.school_id, current_user.id,
+                                                                   after, timeout):
+        async with connect(state, current_user.school_id) as connection:
+            notifications = await fetch(connection, NotificationRow,
+                                        notifications_after(current_user.id, current_user.school_id, after))
+    return json_response(request, {'notifications': notifications,
+                                   'after': notifications[-1].id if notifications else after})
+
+
+## The app ##
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if app.state.watcher.task:
+        app.state.watcher.task.cancel()
+    await app.state.engine.dispose()
+
+
+def create_asgi_app(config=Config):
+    flask_app = create_app(config)
+    database_uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+    engine = create_async_engine(async_database_uri(database_uri), **async_engine_options(database_uri))
+    if engine.dialect.name == 'sqlite':
+        configure_sqlite(engine.sync_engine, flask_app.config.get('SQLITE_PRAGMAS', {}))
+    with flask_app.app_context():
+        storage = get_storage()
+
+    # CORS as Flask-CORS does it for the Flask routes; OPTIONS for the preflight requests
+    cors = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])]
+    methods = ['GET', 'HEAD', 'OPTIONS']
+    routes = [Route('/notifications/poll', poll_notifications, methods=methods, middleware=cors)]
+    if isinstance(storage, LocalStorage):
+        routes.append(Route('/download/{filename}', download_file, methods=methods, middleware=cors))
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 8))))
+
+    app = Starlette(routes=routes, lifespan=lifespan)
+    app.state.flask_app = flask_app
+    app.state.engine = engine
+    app.state.storage = storage
+    app.state.schemas = bool(flask_app.config.get('TENANCY_SCHEMAS')) and engine.dialect.name == 'postgresql'
+    app.state.watcher = NotificationWatcher(app.state, flask_app.config['NOTIFICATION_POLL_INTERVAL'])
+    return app
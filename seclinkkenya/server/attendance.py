@@ -0,0 +1,246 @@
+from datetime import date
+from sqlalchemy import func, select
+from models import Attendance, Class, ClassRegister, Student, Subject, db
+
+# Attendance is kept as bitmaps: one row per roll call of a class (its morning register,
+# lesson 0, or a lesson), not one row per student. Every student has a fixed position in
+# the register of each class they are marked in (class_register, given the first time), and
+# is bit `position` of the roll call's two bitmaps:
+#   - recorded: whose attendance was taken;
+#   - present:  who was there.
+# A student is absent where recorded & ~present. The bitmaps are little-endian (bit n is in
+# byte n // 8, as PostgreSQL's get_bit reads a bytea), so a class of 40 takes 5 bytes each.
+#
+# Absence over a term is counted from the class's roll calls in range with whole-bitmap
+# operations: bit_count() for the class totals, and bit-sliced counters (count_bits) for
+# every student at once.
+
+
+## Bitmaps ##
+
+def to_bitmap(mask):
+    return mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+
+
+def from_bitmap(data):
+    return int.from_bytes(data, 'little')
+
+
+def has_bit(data, position):
+    # Without converting the whole bitmap
+    return position // 8 < len(data) and data[position // 8] >> (position % 8) & 1
+
+
+def mask_of(positions):
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+    return mask
+
+
+def positions_of(mask):
+    # The set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def count_bits(masks):
+    # How many of `masks` have each bit set, as bit planes: bit n of planes[k] is bit k of
+    # position n's count. Each mask is added to every position at once with a ripple-carry
+    # add over the planes, so the cost doesn't grow with the size of the class.
+    planes = []
+    for carry in masks:
+        for k, plane in enumerate(planes):
+            if not carry:
+                break
+            planes[k], carry = plane ^ carry, plane & carry
+        if carry:
+            planes.append(carry)
+    return planes
+
+
+def count_at(planes, position):
+    return sum((plane >> position & 1) << k for k, plane in enumerate(planes))
+
+
+def absence_rate(absent, recorded):
+    return round(absent / recorded, 4) if recorded else None
+
+
+## Roll calls ##
+
+def parse_date(value, name='date'):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an ISO 8601 date, e.g. 2025-01-31')
+
+
+def student_ids(roll_call, name):
+    ids = roll_call.get(name) or []
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        raise ValueError(f'{name} must be a list of student ids')
+    return ids
+
+
+def register_positions(class_id, ids):
+    # {student id: position} in the class register, adding those of `ids` not on it yet
+    positions = dict(db.session.execute(
+        select(ClassRegister.student_id, ClassRegister.position)
+        .where(ClassRegister.class_id == class_id, ClassRegister.student_id.isnot(None))).all())
+    new = sorted(set(ids) - positions.keys())
+    if not new:
+        return positions
+
+    # Only the class's current students can be added
+    in_class = set(db.session.execute(
+        select(Student.id).where(Student.id.in_(new), Student.class_id == class_id)).scalars())
+    if len(in_class) < len(new):
+        raise ValueError(f'Students not in class {class_id}: {sorted(set(new) - in_class)}')
+    next_position = db.session.execute(
+        select(func.coalesce(func.max(ClassRegister.position) + 1, 0)).where(ClassRegister.class_id == class_id)
+    ).scalar()
+    for position, student_id in enumerate(new, start=next_position):
+        db.session.add(ClassRegister(class_id=class_id, position=position, student_id=student_id))
+        positions[student_id] = position
+    return positions
+
+
+def record_roll_call(roll_call, teacher_id):
+    # Marks the students in `present` and `absent`; those left out keep what they had, so a
+    # roll call can be sent again to correct or complete it
+    if not isinstance(roll_call, dict) or not isinstance(roll_call.get('class_id'), int):
+        raise ValueError('class_id is required')
+    class_id = roll_call['class_id']
+    day = parse_date(roll_call.get('date'))
+    lesson = roll_call.get('lesson', 0)
+    if not isinstance(lesson, int) or not 0 <= lesson <= 20:
+        raise ValueError('lesson must be a number from 0 (the morning register) to 20')
+    present, absent = student_ids(roll_call, 'present'), student_ids(roll_call, 'absent')
+    if set(present) & set(absent):
+        raise ValueError(f'Students both present and absent: {sorted(set(present) & set(absent))}')
+    subject_id = roll_call.get('subject_id')
+    if subject_id is not None and db.session.get(Subject, subject_id) is None:
+        raise ValueError(f'Subject {subject_id} not found')
+
+    # Locks the class (PostgreSQL), so its roll calls and register places are written one at a time
+    if db.session.execute(select(Class.id).where(Class.id == class_id).with_for_update()).scalar() is None:
+        raise ValueError(f'Class {class_id} not found')
+    positions = register_positions(class_id, present + absent)
+
+    row = Attendance.query.filter_by(class_id=class_id, date=day, lesson=lesson).one_or_none()
+    if row is None:
+        row = Attendance(class_id=class_id, date=day, lesson=lesson, recorded=b'', present=b'')
+        db.session.add(row)
+    taken = mask_of(positions[student_id] for student_id in present + absent)
+    here = mask_of(positions[student_id] for student_id in present)
+    row.recorded = to_bitmap(from_bitmap(row.recorded) | taken)
+    row.present = to_bitmap(from_bitmap(row.present) & ~taken | here)
+    row.subject_id = subject_id if subject_id is not None else row.subject_id
+    row.teacher_id = teacher_id
+    return row
+
+
+def record_roll_calls(roll_calls, teacher_id):
+    # All or nothing; the caller commits
+    rows = []
+    for i, roll_call in enumerate(roll_calls):
+        try:
+            rows.append(record_roll_call(roll_call, teacher_id))
+        except ValueError as e:
+            raise ValueError(f'roll_calls[{i}]: {e}')
+    return rows
+
+
+def roll_call_dict(row, students):
+    # `students`: {position: student id} of the class register
+    recorded, present = from_bitmap(row.recorded), from_bitmap(row.present)
+    return {
+        'class_id': row.class_id,
+        'date': row.date,
+        'lesson': row.lesson,
+        'subject_id': row.subject_id,
+        'teacher_id': row.teacher_id,
+        'present': [students.get(position) for position in positions_of(present)],
+        'absent': [students.get(position) for position in positions_of(recorded & ~present)],
+    }
+
+
+def register_students(class_id):
+    # {position: student id}; None for students deleted since
+    return dict(db.session.execute(
+        select(ClassRegister.position, ClassRegister.student_id).where(ClassRegister.class_id == class_id)).all())
+
+
+def class_roll_calls(class_id, day):
+    rows = Attendance.query.filter_by(class_id=class_id, date=day).order_by(Attendance.lesson).all()
+    students = register_students(class_id)
+    return [roll_call_dict(row, students) for row in rows]
+
+
+## Absence rates ##
+
+def class_attendance(class_id, start, end, subject_id=None):
+    statement = select(Attendance.recorded, Attendance.present).where(
+        Attendance.class_id == class_id, Attendance.date >= start, Attendance.date <= end)
+    if subject_id is not None:
+        statement = statement.where(Attendance.subject_id == subject_id)
+
+    recorded_masks, absent_masks = [], []
+    for recorded, present in db.session.execute(statement):
+        recorded, present = from_bitmap(recorded), from_bitmap(present)
+        recorded_masks.append(recorded)
+        absent_masks.append(recorded & ~present)
+    recorded_counts, absent_counts = count_bits(recorded_masks), count_bits(absent_masks)
+    total_recorded = sum(mask.bit_count() for mask in recorded_masks)
+    total_absent = sum(mask.bit_count() for mask in absent_masks)
+
+    students = []
+    for position, student_id in sorted(register_students(class_id).items()):
+        recorded = count_at(recorded_counts, position)
+        if student_id is None or not recorded:
+            continue
+        absent = count_at(absent_counts, position)
+        students.append({'student_id': student_id, 'recorded': recorded, 'absent': absent,
+                         'absence_rate': absence_rate(absent, recorded)})
+    return {
+        'class_id': class_id,
+        'from': start,
+        'to': end,
+        'subject_id': subject_id,
+        'roll_calls': len(recorded_masks),
+        'recorded': total_recorded,
+        'absent': total_absent,
+        'absence_rate': absence_rate(total_absent, total_recorded),
+        'students': students,
+    }
+
+
+def student_attendance(student_id, start, end):
+    # Over every class the student was marked in, by subject (None: the morning register)
+    rows = db.session.execute(
+        select(Attendance.subject_id, Attendance.recorded, Attendance.present, ClassRegister.position)
+        .join(ClassRegister, ClassRegister.class_id == Attendance.class_id)
+        .where(ClassRegister.student_id == student_id, Attendance.date >= start, Attendance.date <= end))
+    by_subject = {}
+    for subject_id, recorded, present, position in rows:
+        if not has_bit(recorded, position):
+            continue
+        counts = by_subject.setdefault(subject_id, [0, 0])
+        counts[0] += 1
+        counts[1] += not has_bit(present, position)
+    total_recorded = sum(recorded for recorded, _ in by_subject.values())
+    total_absent = sum(absent for _, absent in by_subject.values())
+    return {
+        'student_id': student_id,
+        'from': start,
+        'to': end,
+        'recorded': total_recorded,
+        'absent': total_absent,
+        'absence_rate': absence_rate(total_absent, total_recorded),
+        'subjects': [{'subject_id': subject_id, 'recorded': recorded, 'absent': absent,
+                      'absence_rate': absence_rate(absent, recorded)}
+                     for subject_id, (recorded, absent) in sorted(by_subject.items(), key=lambda item: item[0] or 0)],
+    }
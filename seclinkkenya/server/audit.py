@@ -0,0 +1,213 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from datetime import date, datetime
+import jwt
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event, inspect, insert
+from models import AuditLog, Class, Grade, LearningMaterial, Notifications, Parent, Student, Subject, Teacher, db
+
+# Audit trail: who created, changed or deleted which row, with the old and new values.
+#
+# Changes are collected from each flush and handed to the app's AuditWriter when the
+# transaction commits (rolled back changes are never audited). The writer buffers them
+# and a background thread inserts them in batches, so a request never waits for the
+# audit insert. What a hard crash can lose is bounded: the entries of the last
+# AUDIT_FLUSH_INTERVAL seconds, and never more than AUDIT_MAX_BUFFER entries. A normal
+# shutdown writes everything that is still buffered.
+#
+# `changes` is {column: value} for creates and deletes, {column: [old, new]} for updates.
+
+logger = logging.getLogger(__name__)
+
+AUDITED = (Teacher, Parent, Student, Grade, Class, Subject, Notifications, LearningMaterial)
+
+# Recorded as changed, never with their values
+REDACTED = {'password'}
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _column_values(state):
+    # Loaded values only, so auditing never triggers a lazy load
+    values = {}
+    for column in state.mapper.column_attrs:
+        if column.key in state.dict:
+            values[column.key] = '[redacted]' if column.key in REDACTED else _value(state.dict[column.key])
+    return values
+
+
+def _changed_values(state):
+    changes = {}
+    for column in state.mapper.column_attrs:
+        history = state.attrs[column.key].history
+        if not history.added and not history.deleted:
+            continue
+        if column.key in REDACTED:
+            changes[column.key] = '[redacted]'
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0] if history.added else None
+        if old != new:
+            changes[column.key] = [_value(old), _value(new)]
+    return changes
+
+
+def current_actor():
+    # (role, user id) from the request's token, if it has a valid one. Only decoded, not
+    # looked up, so it costs nothing on routes that don't require a login.
+    if not has_request_context():
+        return None, None
+    if 'audit_actor' not in g:
+        from routes.auth import secret_key
+        actor = (None, None)
+        token = request.headers.get('Authorization', '')
+        if token.startswith('Bearer '):
+            try:
+                payload = jwt.decode(token.split()[1], secret_key(), algorithms=['HS256'])
+                actor = (payload.get('role'), payload.get('user_id'))
+            except jwt.InvalidTokenError:
+                pass
+        g.audit_actor = actor
+    return g.audit_actor
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changes(session, flush_context):
+    writer = current_app.extensions.get('audit')
+    if writer is None:
+        return
+    actor_type, actor_id = current_actor()
+    described = f'{request.method} {request.path}'[:250] if has_request_context() else None
+    now = datetime.utcnow()
+    entries = []
+
+    def record(action, obj, changes):
+        if changes:
+            entries.append({
+                'created_at': now, 'school_id': obj.school_id, 'actor_type': actor_type, 'actor_id': actor_id, 'action': action,
+                'table_name': obj.__tablename__, 'row_id': obj.id, 'changes': json.dumps(changes, default=str),
+                'request': described,
+            })
+
+    for obj in session.new:
+        if isinstance(obj, AUDITED):
+            record('create', obj, _column_values(inspect(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, AUDITED):
+            record('update', obj, _changed_values(inspect(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, AUDITED):
+            record('delete', obj, _column_values(inspect(obj)))
+
+    if not entries:
+        return
+    if writer.flush_interval <= 0:
+        # Synchronous (scripts and tests): in the same transaction as the change
+        session.connection().execute(insert(AuditLog.__table__), entries)
+    else:
+        session.info.setdefault('audit_entries', []).extend(entries)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _hand_over(session):
+    entries = session.info.pop('audit_entries', None)
+    if entries:
+        writer = current_app.extensions.get('audit')
+        if writer is not None:
+            writer.add(entries)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('audit_entries', None)
+
+
+## Writer ##
+
+class AuditWriter:
+    def __init__(self, app, batch_size=200, flush_interval=1.0, max_buffer=10000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.buffer = deque()
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+
+    def add(self, entries):
+        self._start()
+        with self._lock:
+            self.buffer.extend(entries)
+            self._trim()
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _trim(self):
+        # Bounded memory while the database is unreachable: the oldest entries go first
+        overflow = len(self.buffer) - self.max_buffer
+        if overflow > 0:
+            for _ in range(overflow):
+                self.buffer.popleft()
+            self.dropped += overflow
+            logger.error('Audit buffer full, dropped %s entries (%s in total)', overflow, self.dropped)
+
+    def _start(self):
+        # Started lazily, and again after a fork, since threads don't survive into gunicorn workers
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            if self._thread_pid is not None:
+                self.buffer.clear()  # the parent process writes its own entries
+            threading.Thread(target=self._run, name='audit-writer', daemon=True).start()
+            self._thread_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        # Writes everything buffered, a batch per statement. A failed batch goes back to
+        # the front of the buffer and is retried on the next flush.
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                if not batch:
+                    return
+                try:
+                    self._insert(batch)
+                except Exception as e:
+                    logger.warning('Could not write %s audit entries, will retry: %s', len(batch), e)
+                    with self._lock:
+                        self.buffer.extendleft(reversed(batch))
+                        self._trim()
+                    return
+
+    def _insert(self, entries):
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(insert(AuditLog.__table__), entries)
+
+
+def init_audit(app):
+    writer = AuditWriter(app,
+                         batch_size=app.config.get('AUDIT_BATCH_SIZE', 200),
+                         flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', 1.0),
+                         max_buffer=app.config.get('AUDIT_MAX_BUFFER', 10000))
+    app.extensions['audit'] = writer
+    atexit.register(writer.flush)
+    return writer
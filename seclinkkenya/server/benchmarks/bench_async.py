@@ -0,0 +1,139 @@
+"""Many slow clients at once: the sync path (gunicorn, wsgi:app) vs the async one (uvicorn, asgi:app).
+
+Starts each server with a single worker process on a fresh SQLite file, then has
+--clients clients, all at once, either:
+  - poll: long poll GET /notifications/poll for --wait seconds (nothing new arrives, so
+    every poll waits it out), or
+  - download: GET /download/<file> of --size KiB, read at --rate KiB/s like a phone on a
+    slow link.
+Reports how long until every client had its answer, and the fastest and slowest answer.
+The sync server has --threads threads (GUNICORN_THREADS, gunicorn.conf.py).
+
+    python benchmarks/bench_async.py
+    python benchmarks/bench_async.py --mode download --clients 40
+    python benchmarks/bench_async.py --clients 2000 --servers async
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER)
+
+
+def setup(directory, args):
+    # The database, a parent, and the file to download
+    os.environ.update({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory}/bench.db', 'RATELIMIT_ENABLED': 'false',
+                       'UPLOAD_FOLDER': f'{directory}/uploads'})
+    from app import create_app
+    from models import School, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(School(name='Bench', code='bench'))
+        db.session.commit()
+    app.test_client().post('/signup', json={'name': 'P', 'username': 'p', 'email': 'p@example.com',
+                                            'password': 'pw', 'role': 'Parent'})
+    os.makedirs(f'{directory}/uploads', exist_ok=True)
+    with open(f'{directory}/uploads/notes.pdf', 'wb') as f:
+        f.write(os.urandom(args.size * 1024))
+
+
+def login(port):
+    # Each server process signs its own tokens
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('POST', '/login', json.dumps({'username': 'p', 'password': 'pw'}),
+                       {'Content-Type': 'application/json'})
+    return json.loads(connection.getresponse().read())['token']
+
+
+def start(name, port, args):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.threads),
+               GUNICORN_ACCESS_LOG='/dev/null', GUNICORN_PRELOAD='false', NOTIFICATION_POLL_TIMEOUT=str(args.wait))
+    if name == 'sync':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=SERVER, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'The {name} server did not start')
+
+
+async def get(port, path, token, rate=None):
+    # One request on its own connection; the body is read at `rate` bytes/s, with a small
+    # receive buffer so the server can't just drop the whole file into the kernel
+    start = time.perf_counter()
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 32 * 1024)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=32 * 1024)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n'
+                 f'Accept-Encoding: identity\r\nConnection: close\r\n\r\n'.encode())
+    status = int((await reader.readline()).split()[1])
+    received = 0
+    while data := await reader.read(16 * 1024):
+        received += len(data)
+        if rate:
+            await asyncio.sleep(len(data) / rate)
+    writer.close()
+    return status, received, time.perf_counter() - start
+
+
+async def run(port, token, args):
+    if args.mode == 'poll':
+        requests = [get(port, f'/notifications/poll?timeout={args.wait}', token) for _ in range(args.clients)]
+    else:
+        requests = [get(port, '/download/notes.pdf', token, rate=args.rate * 1024) for _ in range(args.clients)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*requests)
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['poll', 'download'], default='poll')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=4, help="the sync worker's threads")
+    parser.add_argument('--wait', type=float, default=2, help='seconds each long poll waits')
+    parser.add_argument('--size', type=int, default=8192, help='KiB downloaded')
+    parser.add_argument('--rate', type=int, default=1024, help='KiB/s each client reads')
+    parser.add_argument('--servers', nargs='+', choices=['sync', 'async'], default=['sync', 'async'])
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    setup(directory, args)
+    for port, name in ((8101, 'sync'), (8102, 'async')):
+        if name not in args.servers:
+            continue
+        process = start(name, port, args)
+        try:
+            token = login(port)
+            elapsed, results = asyncio.run(run(port, token, args))
+        finally:
+            process.terminate()
+            process.wait()
+        ok = sum(status == 200 for status, _, _ in results)
+        times = [seconds for _, _, seconds in results]
+        print(f'{name:5}: {ok}/{args.clients} answered in {elapsed:6.2f} s  '
+              f'(fastest {min(times):5.2f} s, slowest {max(times):6.2f} s, '
+              f'{sum(received for _, received, _ in results) / 2 ** 20:.1f} MiB)')
+
+
+if __name__ == '__main__':
+    main()
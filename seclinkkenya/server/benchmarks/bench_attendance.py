@@ -0,0 +1,133 @@
+"""Attendance as bitmaps vs one row per student.
+
+Takes a term of roll calls for one class (the morning register and every lesson, each
+student absent now and then) into a fresh SQLite file, through attendance.py, and the same
+marks into a table with a row per student per roll call. Then compares the space each
+takes and the time of the term's absence rates for the class and for one student.
+
+    python benchmarks/bench_attendance.py
+    python benchmarks/bench_attendance.py --students 60 --days 40 --lessons 6
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Boolean, Column, Date, Integer, MetaData, SmallInteger, Table, case, func, insert, select, text  # noqa: E402
+
+from app import create_app  # noqa: E402
+from attendance import class_attendance, record_roll_calls, student_attendance  # noqa: E402
+from config import Config  # noqa: E402
+from models import Class, Parent, Student, Teacher, db  # noqa: E402
+
+# The per-student layout it is compared with
+marks = Table('attendance_marks', MetaData(),
+              Column('id', Integer, primary_key=True),
+              Column('school_id', Integer, nullable=False),
+              Column('class_id', Integer, nullable=False),
+              Column('student_id', Integer, nullable=False, index=True),
+              Column('date', Date, nullable=False),
+              Column('lesson', SmallInteger, nullable=False),
+              Column('present', Boolean, nullable=False))
+
+
+def table_bytes(name):
+    # Pages of the table and its indexes
+    return db.session.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name = :name OR name IN "
+                                   "(SELECT name FROM sqlite_master WHERE tbl_name = :name AND type = 'index')"),
+                              {'name': name}).scalar()
+
+
+def timed(runs, function, *args):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=40)
+    parser.add_argument('--days', type=int, default=65, help='school days in the term')
+    parser.add_argument('--lessons', type=int, default=8, help='lessons a day, besides the morning register')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        marks.create(db.engine)
+        db.session.add(Teacher(name='T', username='t', email='t@example.com', password='x'))
+        db.session.add(Parent(name='P', username='p', email='p@example.com', password='x'))
+        db.session.add(Class(class_name='Form 1', teacher_id=1))
+        db.session.commit()
+        db.session.execute(insert(Student), [{'name': f'Student {i}', 'dob': '2010-01-01', 'class_id': 1,
+                                              'teacher_id': 1, 'parent_id': 1, 'school_id': 1}
+                                             for i in range(args.students)])
+        db.session.commit()
+        students = list(db.session.execute(select(Student.id).order_by(Student.id)).scalars())
+
+        random.seed(1)
+        first_day, days = date(2026, 1, 5), []
+        while len(days) < args.days:
+            first_day += timedelta(days=1)
+            if first_day.weekday() < 5:
+                days.append(first_day)
+        roll_calls, rows = [], []
+        for day in days:
+            for lesson in range(args.lessons + 1):
+                absent = {student for student in students if random.random() < 0.06}
+                roll_calls.append({'class_id': 1, 'date': day.isoformat(), 'lesson': lesson,
+                                   'present': [s for s in students if s not in absent], 'absent': sorted(absent)})
+                rows += [{'school_id': 1, 'class_id': 1, 'student_id': s, 'date': day, 'lesson': lesson,
+                          'present': s not in absent} for s in students]
+
+        start = time.perf_counter()
+        for day_start in range(0, len(roll_calls), args.lessons + 1):
+            # A day at a time, as a teacher's app would send them
+            record_roll_calls(roll_calls[day_start:day_start + args.lessons + 1], teacher_id=1)
+            db.session.commit()
+        submitted = time.perf_counter() - start
+        db.session.execute(insert(marks), rows)
+        db.session.commit()
+
+        def rows_class():
+            return db.session.execute(
+                select(marks.c.student_id, func.count(), func.sum(case((marks.c.present, 0), else_=1)))
+                .where(marks.c.class_id == 1, marks.c.date.between(days[0], days[-1]))
+                .group_by(marks.c.student_id)).all()
+
+        def rows_student():
+            return db.session.execute(
+                select(func.count(), func.sum(case((marks.c.present, 0), else_=1)))
+                .where(marks.c.student_id == students[0], marks.c.date.between(days[0], days[-1]))).one()
+
+        bitmap_class, summary = timed(args.runs, class_attendance, 1, days[0], days[-1])
+        bitmap_student, student = timed(args.runs, student_attendance, students[0], days[0], days[-1])
+        per_row_class, _ = timed(args.runs, rows_class)
+        per_row_student, (_, absent) = timed(args.runs, rows_student)
+        assert absent == student['absent']
+
+        print(f'{args.students} students, {len(roll_calls)} roll calls '
+              f'({args.days} days x {args.lessons + 1}), {summary["absence_rate"]:.1%} absent')
+        print(f'  submitted a day at a time: {len(roll_calls) / submitted:.0f} roll calls/s')
+        print(f'  bitmaps:         {len(roll_calls):7} rows {table_bytes("attendance"):9} bytes  '
+              f'class {bitmap_class * 1000:6.2f} ms  student {bitmap_student * 1000:6.2f} ms')
+        print(f'  row per student: {len(rows):7} rows {table_bytes("attendance_marks"):9} bytes  '
+              f'class {per_row_class * 1000:6.2f} ms  student {per_row_student * 1000:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
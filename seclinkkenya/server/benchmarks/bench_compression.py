@@ -0,0 +1,63 @@
+"""Size and CPU cost of compressing JSON responses.
+
+Builds a learning-material listing like GET /learning-material returns (with previews)
+and times each encoding/level on it, per response.
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --items 20 --runs 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import brotli, compress  # noqa: E402
+
+WORDS = ('equation algebra photosynthesis cell energy river kenya history map grammar '
+         'essay fraction triangle volume revision exam term week homework chapter').split()
+
+SETTINGS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 4), ('br', 5), ('br', 6), ('br', 11)]
+
+
+def listing(items):
+    random.seed(1)
+    return [{
+        'id': i,
+        'title': f'{random.choice(WORDS).title()} notes {i}',
+        'file_path': f'uploads/material_{i}.pdf',
+        'upload_date': f'2024-0{1 + i % 9}-1{i % 10}T08:30:00',
+        'teacher_id': 1 + i % 7,
+        'student_id': 1 + i % 40,
+        'subject_id': 1 + i % 9,
+        'processing_status': 'ready',
+        'file_size': random.randint(20000, 900000),
+        'page_count': random.randint(1, 30),
+        'preview': ' '.join(random.choice(WORDS) for _ in range(80)),
+    } for i in range(items)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=100)
+    args = parser.parse_args()
+
+    data = json.dumps(listing(args.items)).encode()
+    print(f'{args.items} materials: {len(data)} bytes uncompressed')
+    for encoding, level in SETTINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            out = compress(data, encoding, {encoding: level})
+        elapsed = (time.perf_counter() - start) / args.runs
+        print(f'  {encoding:4} {level:2}: {len(out):6} bytes ({len(out) / len(data):5.1%}) '
+              f'{elapsed * 1000:6.2f} ms/response')
+
+
+if __name__ == '__main__':
+    main()
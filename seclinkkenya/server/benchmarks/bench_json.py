@@ -0,0 +1,89 @@
+"""Time to encode list responses, per encoder.
+
+Builds notification and student rows like the list endpoints return (to_dict() output,
+with datetimes) and times turning them into a response body:
+  - stdlib:  json.dumps after an isoformat() per datetime, what to_dict() used to do;
+  - flask:   Flask's default provider (stdlib json, sorted keys);
+  - orjson:  serialization.JSONProvider with orjson;
+  - msgpack: what clients sending `Accept: application/msgpack` get.
+
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --rows 1000 --runs 50
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from serialization import JSONProvider, _default, msgpack, orjson  # noqa: E402
+
+NAMES = 'Achieng Wanjiru Kamau Otieno Njeri Mutua Chebet Kiprop Wambui Omondi'.split()
+
+
+def notifications(rows):
+    random.seed(1)
+    start = datetime(2026, 1, 5, 7, 30)
+    return [{
+        'id': i,
+        'message': f'Report card for term {1 + i % 3} is ready for {random.choice(NAMES)}',
+        'created_at': start + timedelta(minutes=37 * i, microseconds=i),
+        'updated_at': None,
+        'read_at': start + timedelta(minutes=37 * i + 90) if i % 3 else None,
+        'parent_id': 1 + i % 400,
+    } for i in range(rows)]
+
+
+def students(rows):
+    random.seed(2)
+    return [{
+        'id': i,
+        'name': f'{random.choice(NAMES)} {random.choice(NAMES)}',
+        'dob': date(2008 + i % 6, 1 + i % 12, 1 + i % 28),
+        'class_id': 1 + i % 12,
+        'teacher_id': 1 + i % 30,
+        'parent_id': 1 + i % 400,
+    } for i in range(rows)]
+
+
+def isoformat(rows):
+    return [{key: value.isoformat() if isinstance(value, date) else value for key, value in row.items()}
+            for row in rows]
+
+
+def encoders():
+    flask_provider = DefaultJSONProvider(Flask(__name__))
+    yield 'stdlib', lambda rows: json.dumps(isoformat(rows)).encode()
+    # Compact, as Flask's responses are outside debug mode
+    yield 'flask', lambda rows: flask_provider.dumps(rows, separators=(',', ':')).encode()
+    if orjson is not None:
+        provider = JSONProvider(Flask(__name__))
+        yield 'orjson', lambda rows: provider.dumps(rows).encode()
+    if msgpack is not None:
+        yield 'msgpack', lambda rows: msgpack.packb(rows, default=_default)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    for name, rows in [('notifications', notifications(args.rows)), ('students', students(args.rows))]:
+        print(f'{args.rows} {name}:')
+        for encoder, encode in encoders():
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                out = encode(rows)
+            elapsed = (time.perf_counter() - start) / args.runs
+            print(f'  {encoder:8} {len(out):8} bytes {elapsed * 1000:7.2f} ms/response')
+
+
+if __name__ == '__main__':
+    main()
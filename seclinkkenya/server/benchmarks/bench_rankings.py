@@ -0,0 +1,131 @@
+"""Cost of keeping rankings current.
+
+Makes up a school of Forms 1-4 with --streams streams of --students students each, every
+student graded in the 11 subjects below, in a fresh SQLite file. Then times the full
+refresh (`flask refresh-rankings`), a grade change (which re-ranks one form in its
+commit) and the same grade change with rankings rebuilt in Python, loading every latest
+grade as the window functions' stand-in.
+
+    python benchmarks/bench_rankings.py
+    python benchmarks/bench_rankings.py --streams 6 --students 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import Class, Grade, Parent, Ranking, Student, Subject, Teacher, db  # noqa: E402
+from rankings import POINTS, refresh_all  # noqa: E402
+
+SUBJECTS = ['Mathematics', 'English', 'Kiswahili', 'Biology', 'Chemistry', 'Physics',
+            'History', 'Geography', 'CRE', 'Business', 'Physical Education']
+
+
+def timed(runs, function):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def python_rankings():
+    # Every student's mean from their latest grades, then sorted per stream and per form
+    latest = select(func.max(Grade.id)).group_by(Grade.student_id, Grade.subject_id)
+    points = defaultdict(list)
+    for student_id, grade in db.session.execute(select(Grade.student_id, Grade.grade).where(Grade.id.in_(latest))):
+        if grade in POINTS:
+            points[student_id].append(POINTS[grade])
+    groups = defaultdict(list)
+    for student_id, class_id, form in db.session.execute(
+            select(Student.id, Student.class_id, Class.form).join(Class, Class.id == Student.class_id)):
+        if points[student_id]:
+            mean = sum(points[student_id]) / len(points[student_id])
+            groups['stream', class_id].append((mean, student_id))
+            groups['form', form].append((mean, student_id))
+    positions = {}
+    for key, members in groups.items():
+        members.sort(reverse=True)
+        for index, (mean, student_id) in enumerate(members):
+            if index and mean == members[index - 1][0]:
+                position = positions[key, members[index - 1][1]]
+            else:
+                position = index + 1
+            positions[key, student_id] = position
+    return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=4, help='streams per form')
+    parser.add_argument('--students', type=int, default=45, help='students per stream')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Teacher(name='T', username='t', email='t@example.com', password='x'))
+        db.session.add(Parent(name='P', username='p', email='p@example.com', password='x'))
+        db.session.add_all([Class(class_name=f'{form}{stream}', teacher_id=1, form=form)
+                            for form in range(1, 5) for stream in 'ABCDEFGH'[:args.streams]])
+        db.session.commit()
+        class_ids = list(db.session.execute(select(Class.id).order_by(Class.id)).scalars())
+        # Core inserts, so the setup doesn't re-rank on every batch
+        db.session.execute(insert(Subject), [{'subject_name': name, 'subject_code': name[:3], 'class_id': class_id,
+                                              'teacher_id': 1, 'school_id': 1}
+                                             for class_id in class_ids for name in SUBJECTS])
+        db.session.execute(insert(Student), [{'name': f'Student {class_id}-{i}', 'dob': '2010-01-01',
+                                              'class_id': class_id, 'teacher_id': 1, 'parent_id': 1, 'school_id': 1}
+                                             for class_id in class_ids for i in range(args.students)])
+        subjects = defaultdict(list)
+        for subject_id, class_id in db.session.execute(select(Subject.id, Subject.class_id)):
+            subjects[class_id].append(subject_id)
+        random.seed(1)
+        db.session.execute(insert(Grade), [{'grade': random.choice(list(POINTS)), 'student_id': student_id,
+                                            'subject_id': subject_id, 'school_id': 1}
+                                           for student_id, class_id in db.session.execute(
+                                               select(Student.id, Student.class_id))
+                                           for subject_id in subjects[class_id]])
+        db.session.commit()
+        students = db.session.query(Student).count()
+
+        def full():
+            refresh_all(db.session)
+            db.session.commit()
+
+        student = db.session.get(Student, 1)
+
+        def grade_change():
+            db.session.add(Grade(grade=random.choice(list(POINTS)), student_id=student.id,
+                                 subject_id=subjects[student.class_id][0]))
+            db.session.commit()
+
+        full_refresh = timed(args.runs, full)
+        incremental = timed(args.runs, grade_change)
+        in_python = timed(args.runs, python_rankings)
+        assert db.session.query(Ranking).count() == students
+
+        print(f'{students} students in {len(class_ids)} streams of 4 forms, {students * len(SUBJECTS)} grades')
+        print(f'  full refresh (window functions):  {full_refresh * 1000:8.1f} ms')
+        print(f'  grade change, re-ranks one form:  {incremental * 1000:8.1f} ms  (commit included)')
+        print(f'  rankings rebuilt in Python:       {in_python * 1000:8.1f} ms  (not stored)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Memory and time of listing rows as ORM objects vs read-model rows.
+
+Fills a fresh SQLite file with students and notifications, then loads every row and
+turns it into the response body, both ways:
+  - orm:       Model.query.all() and to_dict() per object, as the list endpoints did;
+  - readmodel: readmodels.py, just the listed columns in small dataclasses.
+Memory is the peak traced by tracemalloc while loading, not counting the encoded body.
+
+    python benchmarks/bench_readmodels.py
+    python benchmarks/bench_readmodels.py --rows 10000 --runs 5
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from models import Class, Notifications, Parent, Student, Teacher, db  # noqa: E402
+from readmodels import NotificationRow, StudentRow, fetch, select_rows  # noqa: E402
+
+
+def fill(rows):
+    db.create_all()
+    db.session.add(Teacher(name='T', username='t', email='t@example.com', password='x'))
+    db.session.add(Parent(name='P', username='p', email='p@example.com', password='x'))
+    db.session.add(Class(class_name='Form 1', teacher_id=1))
+    db.session.commit()
+    start = datetime(2026, 1, 5, 7, 30)
+    db.session.execute(insert(Student), [
+        {'name': f'Student {i}', 'dob': '2010-01-01', 'class_id': 1, 'teacher_id': 1, 'parent_id': 1,
+         'school_id': 1} for i in range(rows)])
+    db.session.execute(insert(Notifications), [
+        {'message': f'Report card {i} is ready', 'parent_id': 1, 'school_id': 1,
+         'created_at': start + timedelta(minutes=i)} for i in range(rows)])
+    db.session.commit()
+
+
+def measure(load, runs):
+    # (fastest run in seconds, peak bytes while loading, the loaded list)
+    times = []
+    for _ in range(runs):
+        db.session.expunge_all()
+        gc.collect()
+        start = time.perf_counter()
+        result = load()
+        times.append(time.perf_counter() - start)
+        del result
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        fill(args.rows)
+        cases = [
+            ('students', Student, StudentRow),
+            ('notifications', Notifications, NotificationRow),
+        ]
+        for name, model, row_class in cases:
+            print(f'{args.rows} {name}:')
+            ways = [
+                ('orm', lambda: [obj.to_dict() for obj in model.query.order_by(model.id).all()]),
+                ('readmodel', lambda: fetch(row_class, select_rows(row_class, model).order_by(model.id))),
+            ]
+            for way, load in ways:
+                elapsed, peak, result = measure(load, args.runs)
+                encoded = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    body = app.json.dumps(result)
+                    encoded.append(time.perf_counter() - start)
+                print(f'  {way:9} load {elapsed * 1000:7.1f} ms  peak {peak / 2 ** 20:6.1f} MiB  '
+                      f'encode {min(encoded) * 1000:6.1f} ms ({len(body)} bytes)')
+                del result, body
+
+if __name__ == '__main__':
+    main()
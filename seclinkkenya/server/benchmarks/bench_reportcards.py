@@ -0,0 +1,60 @@
+"""Time to render a batch of report cards: in one process, in the process pool, and from cache.
+
+Uses made-up cards (no database), so only rendering, caching and zipping are measured.
+
+    python benchmarks/bench_reportcards.py
+    python benchmarks/bench_reportcards.py --cards 400 --format html --workers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportcards import CardCache, render_cards, zip_cards  # noqa: E402
+
+SUBJECTS = ['Mathematics', 'English', 'Kiswahili', 'Biology', 'Chemistry', 'Physics',
+            'History', 'Geography', 'CRE', 'Business Studies']
+
+
+def cards(count):
+    return [{
+        'school': 'SecLink Kenya',
+        'term': 'Term 1 2025',
+        'student': {'id': i, 'name': f'Student {i}', 'dob': '2010-01-01'},
+        'class_name': f'Form {1 + i % 4}',
+        'overall_grade': 'ABCDE'[i % 5],
+        'grades': [{'subject': name, 'code': f'S{n}', 'grade': 'ABCDE'[(i + n) % 5]}
+                   for n, name in enumerate(SUBJECTS)],
+    } for i in range(count)]
+
+
+def run(label, batch, fmt, cache, workers):
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in zip_cards(render_cards(batch, fmt, cache, workers), fmt))
+    elapsed = time.perf_counter() - start
+    print(f'  {label:18} {elapsed:6.2f}s  {elapsed / len(batch) * 1000:6.1f} ms/card  ({size} bytes zipped)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=200)
+    parser.add_argument('--format', default='pdf', choices=['pdf', 'html'])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    batch = cards(args.cards)
+    print(f'{args.cards} {args.format} cards, {args.workers} workers, {os.cpu_count()} CPUs')
+    with tempfile.TemporaryDirectory() as directory:
+        run('one process', batch, args.format, CardCache(os.path.join(directory, 'a')), 1)
+        if args.workers > 1:
+            # start the pool's processes before timing
+            list(render_cards(batch[:2], args.format, CardCache(os.path.join(directory, 'warm')), args.workers))
+            run('process pool', batch, args.format, CardCache(os.path.join(directory, 'b')), args.workers)
+        run('cached', batch, args.format, CardCache(os.path.join(directory, 'a')), args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Full-text search benchmark over a synthetic corpus of learning materials.
+
+Fills a fresh database with --docs synthetic materials (Zipf-distributed vocabulary,
+~150 words each), then times `search.search_materials()` for a set of queries.
+
+    python benchmarks/bench_search.py                                   # temporary SQLite file (FTS5)
+    python benchmarks/bench_search.py --uri postgresql://localhost/bench  # tsvector + GIN
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from app import create_app
+from config import Config, engine_options
+from models import LearningMaterial, Parent, Student, Subject, Teacher, Class, db
+from search import index_material, search_materials
+
+SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Biology', 'English', 'Kiswahili', 'History', 'Geography']
+QUERIES = ['mathematics', 'word10', 'word4000', 'word1 word2', 'word30 word31', 'word4999 mathematics']
+
+
+def build_corpus(count, seed=42):
+    rng = random.Random(seed)
+    vocabulary = [f'word{i}' for i in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    for i in range(count):
+        words = rng.choices(vocabulary, weights, k=150)
+        yield f'{SUBJECTS[i % len(SUBJECTS)]} notes {i}', ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uri', default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}")
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(args.uri)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        teacher = Teacher(name='T', username='t', email='t@example.com', password='x')
+        parent = Parent(name='P', username='p', email='p@example.com', password='x')
+        db.session.add_all([teacher, parent])
+        db.session.flush()
+        klass = Class(class_name='Form 3', teacher_id=teacher.id)
+        db.session.add(klass)
+        db.session.flush()
+        student = Student(name='S', dob='2010-01-01', class_id=klass.id, teacher_id=teacher.id, parent_id=parent.id)
+        subject = Subject(subject_name='Mathematics', subject_code='MAT', class_id=klass.id, teacher_id=teacher.id)
+        db.session.add_all([student, subject])
+        db.session.commit()
+        owner = {'teacher_id': teacher.id, 'student_id': student.id, 'subject_id': subject.id}
+
+        start = time.perf_counter()
+        batch = []
+        for i, (title, body) in enumerate(build_corpus(args.docs), start=1):
+            batch.append((title, body))
+            if len(batch) == 1000 or i == args.docs:
+                rows = [{'title': t, 'file_path': f'/materials/{t}.pdf', **owner} for t, _ in batch]
+                ids = db.session.scalars(insert(LearningMaterial).returning(LearningMaterial.id), rows).all()
+                for material_id, (title, body) in zip(ids, batch):
+                    index_material(db.session.get(LearningMaterial, material_id), body=body)
+                db.session.commit()
+                db.session.expunge_all()
+                batch = []
+        print(f"indexed {args.docs} documents in {time.perf_counter() - start:.1f}s ({db.engine.dialect.name})")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                total, hits = search_materials(query, limit=20, offset=0)
+                timings.append(time.perf_counter() - start)
+            print(f"  {query!r:24} matches={total:6} p50={statistics.median(timings) * 1000:6.1f}ms "
+                  f"max={max(timings) * 1000:6.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
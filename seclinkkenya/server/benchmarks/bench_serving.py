@@ -0,0 +1,57 @@
+"""Throughput benchmark for the HTTP serving layer.
+
+Start the server under test first, e.g.
+
+    python app.py                                   # Flask development server
+    gunicorn -c gunicorn.conf.py wsgi:app           # production server
+
+then run
+
+    python benchmarks/bench_serving.py http://127.0.0.1:5555/students --clients 32 --seconds 15
+"""
+import argparse
+import statistics
+import threading
+import time
+import urllib.request
+
+
+def worker(url, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors.append(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=15)
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(args.url, deadline, latencies, errors))
+               for _ in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if not latencies:
+        print(f"no successful requests ({len(errors)} errors)")
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"clients={args.clients} requests={len(latencies)} errors={len(errors)}")
+    print(f"throughput={len(latencies) / args.seconds:.1f} req/s")
+    print(f"latency p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
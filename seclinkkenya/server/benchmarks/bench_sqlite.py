@@ -0,0 +1,84 @@
+"""SQLite write-contention benchmark.
+
+Runs writer threads (inserting notifications, like `manage_notifications()` POST) and reader
+threads (listing a parent's notifications) against a fresh SQLite file, then reports
+throughput and how many operations failed with "database is locked".
+
+    python benchmarks/bench_sqlite.py                       # tuned profile (WAL, pragmas, write lock)
+    SQLITE_TUNING=False SQLITE_SERIALIZE_WRITES=False python benchmarks/bench_sqlite.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import create_app
+from config import Config
+from models import Notifications, Parent, db
+
+
+def writer(app, deadline, counts, errors):
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            try:
+                db.session.add(Notifications(message='Fee reminder', parent_id=1))
+                db.session.commit()
+                counts.append('w')
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                errors.append(str(e.orig if hasattr(e, 'orig') else e).split('\n')[0])
+
+
+def reader(app, deadline, counts, errors):
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            try:
+                Notifications.query.filter_by(parent_id=1).order_by(Notifications.id.desc()).limit(20).all()
+                db.session.commit()
+                counts.append('r')
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                errors.append(str(e.orig if hasattr(e, 'orig') else e).split('\n')[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--readers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': args.writers + args.readers}
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Parent(name='Bench', username='bench', email='bench@example.com', password='x'))
+        db.session.commit()
+
+    counts, errors = [], []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=writer, args=(app, deadline, counts, errors)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(app, deadline, counts, errors)) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"pragmas={BenchConfig.SQLITE_PRAGMAS or 'default'} serialize_writes={BenchConfig.SQLITE_SERIALIZE_WRITES}")
+    print(f"writes/s={counts.count('w') / args.seconds:.1f} reads/s={counts.count('r') / args.seconds:.1f}")
+    print(f"errors={len(errors)} {sorted(set(errors))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Startup-time benchmark for the application factory.
+
+Runs the given statement in fresh interpreters, reports the median wall-clock time and,
+from `python -X importtime`, the heaviest top-level imports.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --stmt "import wsgi" --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_once(stmt):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', stmt],
+                            cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def parse_importtime(importtime_output):
+    # Lines look like "import time:  self [us] | cumulative | <indent>imported package",
+    # with two spaces of indent per nesting level.
+    total, imports = 0, {}
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total += int(cumulative)
+        elif depth == 1:
+            imports[name.strip()] = int(cumulative)
+    return total, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stmt', default='from app import create_app; create_app()')
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    timings, totals, imports = [], [], {}
+    for _ in range(args.runs):
+        elapsed, output = run_once(args.stmt)
+        total, imports = parse_importtime(output)
+        timings.append(elapsed)
+        totals.append(total)
+
+    print(f"{args.stmt!r}: median {statistics.median(timings) * 1000:.0f}ms over {args.runs} runs")
+    print(f"import time median {statistics.median(totals) / 1000:.0f}ms, heaviest imports (last run):")
+    for name, cumulative in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
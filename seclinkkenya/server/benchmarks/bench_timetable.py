@@ -0,0 +1,65 @@
+"""Time to generate a timetable for a large school.
+
+Makes up a school of --classes classes (streams of Forms 1-4), each with the 11 subjects
+below filling the 40 periods of a 5 x 8 week, taught by teachers with up to --load periods
+a week each, some unavailable now and then. Then runs the solver (timetable.solve), without
+the database, and reports the clashes left and the time taken, per seed.
+
+    python benchmarks/bench_timetable.py
+    python benchmarks/bench_timetable.py --classes 20 --seeds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timetable import solve  # noqa: E402
+
+DAYS, PERIODS = 5, 8
+
+# Periods a week of each subject; 40 in all, so every class is busy every period
+CURRICULUM = {'Mathematics': 6, 'English': 5, 'Kiswahili': 5, 'Biology': 4, 'Chemistry': 4, 'Physics': 4,
+              'History': 3, 'Geography': 3, 'CRE': 2, 'Business': 2, 'Physical Education': 2}
+
+
+def school(classes, load, unavailable_share, seed):
+    # (subjects as solve() takes them, {teacher: unavailable slots}, number of teachers)
+    rng = random.Random(seed)
+    subjects, teachers = [], 0
+    for name, count in CURRICULUM.items():
+        per_teacher = max(load // count, 1)
+        for first in range(0, classes, per_teacher):
+            teachers += 1
+            for class_id in range(first, min(first + per_teacher, classes)):
+                subjects.append((len(subjects), class_id, teachers, count))
+    unavailable = defaultdict(set)
+    for teacher in range(1, teachers + 1):
+        if rng.random() < unavailable_share:
+            unavailable[teacher] = set(rng.sample(range(DAYS * PERIODS), 4))
+    return subjects, unavailable, teachers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--classes', type=int, default=40)
+    parser.add_argument('--load', type=int, default=24, help='most periods a week per teacher')
+    parser.add_argument('--unavailable', type=float, default=0.3, help='share of teachers with 4 periods off')
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--time-limit', type=float, default=60)
+    args = parser.parse_args()
+
+    for seed in range(args.seeds):
+        subjects, unavailable, teachers = school(args.classes, args.load, args.unavailable, seed)
+        start = time.perf_counter()
+        solver = solve(subjects, unavailable, DAYS, PERIODS, args.time_limit, seed=seed)
+        elapsed = time.perf_counter() - start
+        print(f'seed {seed}: {args.classes} classes, {teachers} teachers, {len(solver.slot)} lessons: '
+              f'{solver.hard} clashes, {solver.soft} crowded days, {solver.iterations} search steps, {elapsed:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+from datetime import datetime
+from sqlalchemy import event, func, inspect, insert, select, text
+from models import ChangeLog, Class, Grade, LearningMaterial, Notifications, Student, Subject, db
+from tenancy import current_school_id, default_school_id
+
+# Change log for offline clients. Every flush that inserts, updates or deletes a synced
+# row adds (table, row id) to `change_log` in the same transaction; the log's id is the
+# sync position. GET /sync?since=<id> returns the rows changed after that position in
+# their current state, or as a tombstone if they are gone, so a row changed ten times
+# is sent once. Positions are shared by all schools; each school only sees its own rows,
+# and its positions (latest, and the marker left by a purge) are its own entries' ids.
+#
+# A school's entries must become visible in id order, or its clients could move past an
+# id that is still uncommitted and never see it. SQLite allows one writer at a time anyway;
+# on PostgreSQL writers of the log take a transaction-level advisory lock on their school
+# first, so schools don't wait for each other. Another school's uncommitted entry may be
+# skipped over, but it is never sent to this school's clients anyway.
+
+SYNCED = {model.__tablename__: model for model in (Student, Grade, Notifications, LearningMaterial, Class, Subject)}
+
+CHANGE_LOG_LOCK = 0x5ec11c  # pg_advisory_xact_lock key, with the school id as the second key
+# table_name of the entry a purge leaves in place of a school's purged entries (see purge_change_log)
+PURGED = '(purged)'
+
+
+def record_changes(connection, table_name, row_ids, school_id=None):
+    # Also for bulk UPDATE/DELETE statements, which skip the flush events
+    if school_id is None:
+        school_id = current_school_id() or default_school_id()
+    rows = [{'table_name': table_name, 'row_id': row_id, 'school_id': school_id, 'created_at': datetime.utcnow()}
+            for row_id in sorted(set(row_ids))]
+    if not rows:
+        return
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key, :school_id)'),
+                           {'key': CHANGE_LOG_LOCK, 'school_id': school_id})
+    connection.execute(insert(ChangeLog.__table__), rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _log_changes(session, flush_context):
+    models = tuple(SYNCED.values())
+    changed = {}
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, models):
+            changed.setdefault((obj.__tablename__, obj.school_id), set()).add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, models) and session.is_modified(obj, include_collections=False):
+            changed.setdefault((obj.__tablename__, obj.school_id), set()).add(obj.id)
+    for (table_name, school_id), row_ids in sorted(changed.items()):
+        record_changes(session.connection(), table_name, row_ids, school_id)
+
+
+## Reading ##
+
+# Both of the current school: ORM queries, scoped like every other (see tenancy.py)
+def latest_position():
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def oldest_position():
+    # Clients behind this have missed purged changes and must reload; None if nothing was purged
+    return db.session.query(func.max(ChangeLog.id)).filter(ChangeLog.table_name == PURGED).scalar()
+
+
+def changes_since(since, limit):
+    # Rows changed after `since`, each once, ordered by their latest change.
+    # Returns (changes by table, position to ask from next time, whether more are waiting).
+    latest = func.max(ChangeLog.id).label('position')
+    entries = (db.session.query(ChangeLog.table_name, ChangeLog.row_id, latest)
+               .filter(ChangeLog.id > since)
+               .group_by(ChangeLog.table_name, ChangeLog.row_id)
+               .order_by(latest)
+               .limit(limit + 1).all())
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    row_ids = {}
+    for table_name, row_id, _ in entries:
+        row_ids.setdefault(table_name, []).append(row_id)
+
+    changes = {}
+    for table_name, ids in row_ids.items():
+        model = SYNCED.get(table_name)
+        if model is None:
+            continue  # a table that is no longer synced
+        found = {row.id: row for row in model.query.filter(model.id.in_(ids))}
+        changes[table_name] = {
+            'upserts': [row_values(found[row_id]) for row_id in ids if row_id in found],
+            'deletes': [row_id for row_id in ids if row_id not in found],
+        }
+    return changes, (entries[-1].position if entries else since), has_more
+
+
+def row_values(obj):
+    # The row's own columns only (no nested objects), so every table is sent the same compact way
+    return {column.key: getattr(obj, column.key) for column in inspect(obj).mapper.column_attrs}
+
+
+## Retention ##
+
+def purge_change_log(before):
+    # Deletes every school's entries older than `before`, except the newest of them, which
+    # becomes the school's PURGED marker: clients behind it are told to reload (see /sync).
+    # Ids are shared by all schools, so a school's own entries are the only reliable marker.
+    # Core statements: run from the CLI, across schools.
+    table = ChangeLog.__table__
+    purged = (select(table.c.school_id, func.max(table.c.id))
+              .where(table.c.created_at < before).group_by(table.c.school_id))
+    deleted = 0
+    for school_id, newest in db.session.execute(purged).all():
+        deleted += db.session.execute(
+            table.delete().where(table.c.school_id == school_id, table.c.id < newest)).rowcount
+        db.session.execute(table.update().where(table.c.id == newest).values(table_name=PURGED, row_id=0))
+    db.session.commit()
+    return deleted
@@ -0,0 +1,140 @@
+import gzip
+import mimetypes
+import os
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Response compression for slow mobile connections.
+# JSON responses are compressed per request when they are big enough to be worth it.
+# Uploaded files are compressed once, after upload (see processing.py), and the stored
+# `<file>.br` / `<file>.gz` variants are served as-is, so downloads cost no CPU.
+
+# Extensions worth precompressing. DOCX/PPTX/PDF are usually compressed inside already;
+# write_variants() only keeps a variant that actually saves space.
+PRECOMPRESS_EXTENSIONS = {'txt', 'docx', 'pptx', 'pdf'}
+MIN_SAVING = 0.1  # keep a variant only if it is at least 10% smaller
+
+VARIANT_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# API responses: JSON, or MessagePack for clients that ask for it (see serialization.py)
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/msgpack'}
+
+
+def available_encodings():
+    # Most preferred first
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encodings, candidates):
+    # The client's highest-quality encoding among candidates; ties go to our preference order
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level['br'])
+    return gzip.compress(data, compresslevel=level['gzip'], mtime=0)
+
+
+## JSON responses ##
+
+def init_compression(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    level = {
+        'gzip': app.config.get('COMPRESS_GZIP_LEVEL', 6),
+        'br': app.config.get('COMPRESS_BROTLI_QUALITY', 6),
+    }
+
+    @app.after_request
+    def compress_response(response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.direct_passthrough
+                or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or not 200 <= response.status_code < 300):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        encoding = choose_encoding(request.accept_encodings, available_encodings())
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+## Precompressed uploads ##
+
+def compressed_variants(file_path, data, level=None):
+    # {encoding: compressed data} for the copies of an upload worth keeping
+    level = level or {'gzip': 9, 'br': 11}  # done once per upload, so use the best ratio
+    if file_path.rsplit('.', 1)[-1].lower() not in PRECOMPRESS_EXTENSIONS:
+        return {}
+    variants = {}
+    for encoding in available_encodings():
+        compressed = compress(data, encoding, level)
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            variants[encoding] = compressed
+    return variants
+
+
+def write_variants(file_path, level=None):
+    # Write (or refresh) the compressed copies of an uploaded file
+    remove_variants(file_path)
+    with open(file_path, 'rb') as f:
+        variants = compressed_variants(file_path, f.read(), level)
+    for encoding, compressed in variants.items():
+        with open(file_path + VARIANT_SUFFIXES[encoding], 'wb') as f:
+            f.write(compressed)
+    return list(variants)
+
+
+def remove_variants(file_path):
+    for suffix in VARIANT_SUFFIXES.values():
+        try:
+            os.remove(file_path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def material_variant(directory, filename, accept_encodings):
+    # (path, encoding of the stored variant to send or None, whether variants exist)
+    path = safe_join(directory, filename)
+    variants = [e for e in available_encodings()
+                if path is not None and _is_fresh(path + VARIANT_SUFFIXES[e], path)]
+    encoding = choose_encoding(accept_encodings, variants)
+    return path, encoding, bool(variants)
+
+
+def send_material(directory, filename):
+    # send_from_directory(), but serves a stored variant when the client accepts one
+    _, encoding, variants = material_variant(directory, filename, request.accept_encodings)
+    if encoding is None:
+        response = send_from_directory(directory, filename)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(directory, filename + VARIANT_SUFFIXES[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    if variants:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def _is_fresh(variant_path, path):
+    # A re-upload under the same name makes the old variant stale until it is reprocessed
+    try:
+        return os.path.getmtime(variant_path) >= os.path.getmtime(path)
+    except OSError:
+        return False
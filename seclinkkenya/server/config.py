@@ -4,17 +4,175 @@ from dotenv import load_dotenv
 # Load the environment variables from the .env file
 load_dotenv()
 
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ['true', '1', 't']
+
+
+# SQLAlchemy engine options for the configured database, tuned from the environment
+def engine_options(database_uri):
+    # One pool per worker process; gunicorn.conf.py sizes it to the worker's thread count
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+    }
+
+    if database_uri.startswith('postgresql'):
+        options.update({
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True),
+        })
+        connect_args = {'application_name': os.getenv('DB_APPLICATION_NAME', 'seclinkkenya')}
+
+        if env_bool('DB_PGBOUNCER', False):
+            # PgBouncer in transaction mode does the pooling and rejects the `options` startup
+            # parameter, so keep only a handful of idle connections to it and set
+            # statement_timeout on the database role instead
+            # (ALTER ROLE ... SET statement_timeout = ...).
+            options.update({
+                'pool_size': int(os.getenv('DB_POOL_SIZE', 2)),
+                'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+                'pool_pre_ping': False,
+            })
+        else:
+            statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+
+        options['connect_args'] = connect_args
+
+    return options
+
+
+# engine_options() for the asyncio engine of asgi.py (asyncpg or aiosqlite)
+def async_engine_options(database_uri):
+    options = engine_options(database_uri)
+    if database_uri.startswith('sqlite'):
+        # aiosqlite defaults to no pool; keep connections (and their pragmas) like the sync engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+        options['poolclass'] = AsyncAdaptedQueuePool
+    connect_args = options.pop('connect_args', None)
+    if connect_args:
+        # asyncpg takes the session settings as server_settings rather than `options`
+        server_settings = {'application_name': connect_args['application_name']}
+        if env_bool('DB_PGBOUNCER', False):
+            # No prepared statements either: a transaction-mode pool can't keep them
+            options['connect_args'] = {'server_settings': server_settings, 'statement_cache_size': 0}
+        else:
+            server_settings['statement_timeout'] = os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000')
+            options['connect_args'] = {'server_settings': server_settings}
+    return options
+
+
+# Pragmas applied to every new SQLite connection (ignored on other databases)
+def sqlite_pragmas():
+    if not env_bool('SQLITE_TUNING', True):
+        return {}
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -20000)),  # negative means KiB, i.e. 20 MB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 268435456)),
+    }
+
+
 class Config:
+    # Signs login tokens; the same value on every worker and server (see routes/auth.py).
+    # Only FLASK_ENV=development may leave it unset.
     JWT_SECRET_KEY = os.getenv('SECRET_KEY')
+    FLASK_ENV = os.getenv('FLASK_ENV', 'production')
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///seclinkkenya.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Read replicas (comma separated URIs) used for reads during GET requests
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+    # After a write, the client reads from the primary for this long (read-your-writes)
+    REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+    # Schools: where rows go when no school is set, and (PostgreSQL) whether schools
+    # created with `flask create-school --schema` use their own schema
+    DEFAULT_SCHOOL_ID = int(os.getenv('DEFAULT_SCHOOL_ID', 1))
+    TENANCY_SCHEMAS = env_bool('TENANCY_SCHEMAS', False)
+    SQLITE_PRAGMAS = sqlite_pragmas()
+    # Let only one thread per process write to SQLite at a time; readers are not blocked
+    SQLITE_SERIALIZE_WRITES = env_bool('SQLITE_SERIALIZE_WRITES', True)
+    # Uploads (see storage.py): `local` keeps them in UPLOAD_FOLDER (default instance/uploads),
+    # `s3` in an S3 bucket (S3_ENDPOINT_URL for MinIO and other S3-compatible stores)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER')
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'materials/')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+    S3_REGION = os.getenv('S3_REGION')
+    # How long download links to S3 stay valid
+    S3_PRESIGN_SECONDS = int(os.getenv('S3_PRESIGN_SECONDS', 300))
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
+    # Rate limits (see ratelimit.py); memory:// keeps buckets per worker process
+    RATELIMIT_ENABLED = env_bool('RATELIMIT_ENABLED', True)
+    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMIT_LOGIN_IP = os.getenv('RATELIMIT_LOGIN_IP', '20/minute')
+    RATELIMIT_LOGIN_USERNAME = os.getenv('RATELIMIT_LOGIN_USERNAME', '5/minute')
+    RATELIMIT_SIGNUP_IP = os.getenv('RATELIMIT_SIGNUP_IP', '5/minute')
+    RATELIMIT_PASSWORD_RESET_IP = os.getenv('RATELIMIT_PASSWORD_RESET_IP', '10/minute')
+    RATELIMIT_PASSWORD_RESET_EMAIL = os.getenv('RATELIMIT_PASSWORD_RESET_EMAIL', '3/hour')
+    # Idempotency-Key replays (see idempotency.py): where keys live, how long responses are kept,
+    # how long a claim outlives a crashed request, and how long a duplicate waits for the first
+    IDEMPOTENCY_STORAGE_URL = os.getenv('IDEMPOTENCY_STORAGE_URL', RATELIMIT_STORAGE_URL)
+    IDEMPOTENCY_TTL_HOURS = float(os.getenv('IDEMPOTENCY_TTL_HOURS', 24))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 60))
+    IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', 10))
+    # /batch: sub-requests per batch and maximum body size
+    BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_BYTES', 1024 * 1024))
+    # /parent/feed: how far back "new" materials go, and whether to keep built feeds in parent_feeds
+    FEED_MATERIAL_DAYS = int(os.getenv('FEED_MATERIAL_DAYS', 30))
+    PARENT_FEED_CACHE = env_bool('PARENT_FEED_CACHE', False)
+    PARENT_FEED_MAX_AGE = int(os.getenv('PARENT_FEED_MAX_AGE', 3600))
+    # Notifications (monthly partitions on PostgreSQL): how far back the feed and /notifications
+    # read by default, partitions made ahead, and months kept before `flask notification-partitions` archives them
+    NOTIFICATION_RECENT_DAYS = int(os.getenv('NOTIFICATION_RECENT_DAYS', 90))
+    NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv('NOTIFICATION_PARTITIONS_AHEAD', 3))
+    NOTIFICATION_RETENTION_MONTHS = int(os.getenv('NOTIFICATION_RETENTION_MONTHS', 12))
+    # Longest wait of GET /notifications/poll, and how often waiting polls look for new ones
+    NOTIFICATION_POLL_TIMEOUT = float(os.getenv('NOTIFICATION_POLL_TIMEOUT', 25))
+    NOTIFICATION_POLL_INTERVAL = float(os.getenv('NOTIFICATION_POLL_INTERVAL', 1.0))
+    # /sync: most changed rows returned per call
+    SYNC_BATCH_SIZE = int(os.getenv('SYNC_BATCH_SIZE', 500))
+    # Audit trail: entries per insert, seconds between writes (0 = in the same transaction)
+    # and the most entries kept in memory while the database is unreachable
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+    AUDIT_MAX_BUFFER = int(os.getenv('AUDIT_MAX_BUFFER', 10000))
+    # Compress JSON responses of at least this many bytes (gzip, or brotli when installed)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 6))
+    # Threads per worker process extracting text/previews from uploads (0 = inline)
+    MATERIAL_WORKERS = int(os.getenv('MATERIAL_WORKERS', 2))
+    # Report cards: school name printed on them, processes rendering a batch (1 = in the
+    # request's own process) and where rendered cards are cached (default instance/report_cards)
+    SCHOOL_NAME = os.getenv('SCHOOL_NAME', 'SecLink Kenya')
+    REPORT_CARD_WORKERS = int(os.getenv('REPORT_CARD_WORKERS', os.cpu_count() or 1))
+    REPORT_CARD_CACHE_DIR = os.getenv('REPORT_CARD_CACHE_DIR')
+    # Timetables: days a week, periods a day, and how many seconds generating one may search
+    TIMETABLE_DAYS = int(os.getenv('TIMETABLE_DAYS', 5))
+    TIMETABLE_PERIODS = int(os.getenv('TIMETABLE_PERIODS', 8))
+    TIMETABLE_TIME_LIMIT = float(os.getenv('TIMETABLE_TIME_LIMIT', 30))
+    # asgi.py: threads running the Flask app for the routes it doesn't serve itself
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 8))
     PORT = int(os.getenv('PORT', 5555))
     
     # Mail server settings
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
-    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'True').lower() in ['true', '1', 't']
+    MAIL_USE_TLS = env_bool('MAIL_USE_TLS', True)
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    # Threads sending mail off the request path (0 = inline)
+    MAIL_WORKERS = int(os.getenv('MAIL_WORKERS', 1))
+
+    # Password reset links point at the React app and stay valid this long
+    FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
+    PASSWORD_RESET_TOKEN_MINUTES = int(os.getenv('PASSWORD_RESET_TOKEN_MINUTES', 60))
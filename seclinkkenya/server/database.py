@@ -0,0 +1,120 @@
+import threading
+import time
+from flask import request
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from config import engine_options
+from models import db
+from replicas import PIN_COOKIE, READ_METHODS, ReplicaSet
+
+# Engine-level tuning applied by the app factory once the database is initialized.
+
+
+def init_database(app):
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        pragmas = app.config.get('SQLITE_PRAGMAS', {})
+        configure_sqlite(engine, pragmas)
+        if app.config.get('SQLITE_SERIALIZE_WRITES'):
+            serialize_writes(engine, SQLiteWriteLock(timeout=pragmas.get('busy_timeout', 5000) / 1000))
+    if app.config.get('SQLALCHEMY_REPLICA_URIS'):
+        init_replicas(app)
+
+
+## Read replicas ##
+
+def init_replicas(app):
+    engines = []
+    for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+        engine = create_engine(uri, **engine_options(uri))
+        if engine.dialect.name == 'sqlite':
+            configure_sqlite(engine, app.config.get('SQLITE_PRAGMAS', {}))
+        engines.append(engine)
+
+    replicas = ReplicaSet(engines,
+                          max_lag=app.config['REPLICA_MAX_LAG_SECONDS'],
+                          check_interval=app.config['REPLICA_CHECK_INTERVAL'])
+    app.extensions['replicas'] = replicas
+
+    for engine in engines:
+        @event.listens_for(engine, 'handle_error')
+        def take_out_of_rotation(context, engine=engine):
+            if isinstance(context.original_exception, engine.dialect.loaded_dbapi.OperationalError):
+                replicas.mark_down(engine)
+
+    pin_seconds = app.config['REPLICA_PIN_SECONDS']
+
+    # Read-your-writes: after a write, keep this client on the primary until the replicas catch up
+    @app.after_request
+    def pin_to_primary(response):
+        if request.method not in READ_METHODS or db.session.info.get('wrote'):
+            response.set_cookie(PIN_COOKIE, str(time.time() + pin_seconds),
+                                max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+# Anything that writes sends the rest of the request's queries to the primary
+@event.listens_for(db.session, 'after_flush')
+def mark_flush_as_write(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+## SQLite ##
+
+def configure_sqlite(engine, pragmas):
+    # Run the PRAGMAs on every new DB-API connection, before the pool hands it out
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+class SQLiteWriteLock:
+    # SQLite allows a single writer at a time. Instead of letting every thread race for the
+    # database lock (and fail with "database is locked" once busy_timeout runs out), writers
+    # in this process queue here from their first write statement until the transaction ends.
+    # Readers never take the lock, so with WAL they keep reading while a write is in progress.
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self._lock.acquire(timeout=self.timeout):
+            raise SQLAlchemyTimeoutError(f'Timed out after {self.timeout}s waiting for the SQLite write lock')
+
+    def release(self):
+        self._lock.release()
+
+
+def serialize_writes(engine, lock):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def acquire_write_lock(conn, cursor, statement, parameters, context, executemany):
+        if 'write_lock' in conn.info or statement.lstrip()[:6].upper() in ('SELECT', 'PRAGMA'):
+            return
+        lock.acquire()
+        conn.info['write_lock'] = lock
+
+    # Release once the connection goes back to the pool, i.e. after COMMIT or ROLLBACK has
+    # completed (the engine-level commit event fires before the COMMIT is sent). A connection
+    # that is invalidated, closed or detached instead never gets a reset, so release there too,
+    # or every later write in the process would wait on it forever.
+    @event.listens_for(engine, 'reset')
+    def release_write_lock(dbapi_connection, connection_record, reset_state):
+        # No record once detached; the lock was released on `detach`
+        if connection_record is not None and 'write_lock' in connection_record.info:
+            connection_record.info.pop('write_lock').release()
+
+    def release_write_lock_on_discard(dbapi_connection, connection_record, exception=None):
+        release_write_lock(dbapi_connection, connection_record, None)
+
+    for name in ('checkin', 'invalidate', 'soft_invalidate', 'close', 'detach'):
+        event.listen(engine, name, release_write_lock_on_discard)
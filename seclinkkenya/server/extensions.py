@@ -0,0 +1,70 @@
+# Flask extensions that are expensive to import (Flask-Mail, Flask-Bcrypt, Flask-Migrate/Alembic).
+# They are created on first use instead of at import time, so workers, tests and
+# CLI commands that never send mail or run migrations don't pay for them.
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+_mail = None
+_bcrypt = None
+
+_mail_executor = None
+_mail_executor_pid = None
+_mail_executor_lock = threading.Lock()
+
+
+def get_mail():
+    global _mail
+    if _mail is None:
+        from flask_mail import Mail
+        _mail = Mail()
+    if 'mail' not in current_app.extensions:
+        _mail.init_app(current_app)
+    return _mail
+
+
+def send_mail(msg):
+    # Sends from a background thread, so the request never waits on the SMTP server (which
+    # can take seconds). MAIL_WORKERS = 0 sends inline instead (handy for tests and scripts).
+    app = current_app._get_current_object()
+    workers = app.config.get('MAIL_WORKERS', 1)
+    if workers <= 0:
+        _send(app, msg)
+        return
+    global _mail_executor, _mail_executor_pid
+    with _mail_executor_lock:
+        # Again after a fork, since threads don't survive into gunicorn workers
+        if _mail_executor is None or _mail_executor_pid != os.getpid():
+            _mail_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mail')
+            _mail_executor_pid = os.getpid()
+    _mail_executor.submit(_send, app, msg)
+
+
+def _send(app, msg):
+    with app.app_context():
+        try:
+            get_mail().send(msg)
+        except Exception:
+            logger.exception('Could not send %r to %s', msg.subject, ', '.join(msg.recipients))
+
+
+def get_bcrypt():
+    global _bcrypt
+    if _bcrypt is None:
+        from flask_bcrypt import Bcrypt
+        _bcrypt = Bcrypt()
+    if 'bcrypt' not in current_app.extensions:
+        _bcrypt.init_app(current_app)
+        current_app.extensions['bcrypt'] = _bcrypt
+    return _bcrypt
+
+
+def init_migrate(app, db):
+    # Only needed by the `flask db` commands
+    from flask_migrate import Migrate
+    from partitions import include_in_migrations
+    Migrate(app, db, include_name=include_in_migrations)
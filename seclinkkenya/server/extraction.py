@@ -0,0 +1,84 @@
+import html
+import re
+import zipfile
+from collections import namedtuple
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF text extraction is optional
+    PdfReader = None
+
+# Plain-text extraction from uploaded learning materials (PDF, DOCX, PPTX, TXT).
+# Legacy binary .doc/.ppt files are not parsed and yield no text.
+
+XML_TEXT = re.compile(r'<(?:w|a):t(?: [^>]*)?>([^<]*)</(?:w|a):t>')
+XML_PARAGRAPH = re.compile(r'</(?:w|a):p>')
+DOCX_PAGES = re.compile(r'<Pages>(\d+)</Pages>')
+
+# page_count is None when the format doesn't say (e.g. a DOCX never opened in Word)
+Extraction = namedtuple('Extraction', ['text', 'page_count', 'first_page'])
+
+
+def extract(file_path):
+    # Raises on damaged or unreadable files; use extract_text() to get '' instead
+    extension = file_path.rsplit('.', 1)[-1].lower()
+    if extension == 'pdf':
+        pages, page_count = _pdf_pages(file_path)
+    elif extension == 'docx':
+        pages, page_count = _docx_pages(file_path)
+    elif extension == 'pptx':
+        pages = _office_text(file_path, lambda name: re.fullmatch(r'ppt/slides/slide\d+\.xml', name))
+        page_count = len(pages)
+    elif extension == 'txt':
+        with open(file_path, encoding='utf-8', errors='ignore') as f:
+            pages, page_count = [f.read()], None
+    else:
+        return Extraction('', None, '')
+    return Extraction('\n'.join(pages), page_count, pages[0] if pages else '')
+
+
+def extract_text(file_path):
+    try:
+        return extract(file_path).text
+    except Exception:
+        # A damaged or unreadable upload must never break the caller
+        return ''
+
+
+def _pdf_pages(file_path):
+    if PdfReader is None:
+        return [], None
+    reader = PdfReader(file_path)
+    return [page.extract_text() or '' for page in reader.pages], len(reader.pages)
+
+
+def _docx_pages(file_path):
+    # Word stores the page count it last laid out in docProps/app.xml
+    text = '\n'.join(_office_text(file_path, lambda name: name == 'word/document.xml'))
+    with zipfile.ZipFile(file_path) as archive:
+        try:
+            match = DOCX_PAGES.search(archive.read('docProps/app.xml').decode('utf-8', errors='ignore'))
+        except KeyError:
+            match = None
+    return [text], int(match.group(1)) if match else None
+
+
+def _office_text(file_path, wanted):
+    # DOCX/PPTX are ZIP archives of XML parts; the text lives in <w:t>/<a:t> runs.
+    # Returns one string per matching part (one per slide for PPTX).
+    parts = []
+    with zipfile.ZipFile(file_path) as archive:
+        names = sorted((n for n in archive.namelist() if wanted(n)), key=_natural_key)
+        for name in names:
+            xml = archive.read(name).decode('utf-8', errors='ignore')
+            lines = []
+            for paragraph in XML_PARAGRAPH.split(xml):
+                line = ''.join(html.unescape(run) for run in XML_TEXT.findall(paragraph))
+                if line:
+                    lines.append(line)
+            parts.append('\n'.join(lines))
+    return parts
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
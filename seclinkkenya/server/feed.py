@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload
+from models import Grade, LearningMaterial, Notifications, ParentFeed, Student, Subject, db
+from partitions import recent_since
+
+# A parent's home feed: their children with each child's latest grade per subject, unread
+# notifications and new materials for the children or their classes' subjects.
+# Built with four queries however many children there are.
+#
+# With PARENT_FEED_CACHE on, the built feed is stored in `parent_feeds`. Every write that
+# changes a parent's feed bumps the row's `version` in the same transaction, and a feed is
+# only stored (or served) if it was built from the current version, so a feed built while
+# a write was committing is never kept.
+
+FEED_NOTIFICATIONS = 50
+FEED_MATERIALS = 20
+
+
+def build_feed(parent_id):
+    children = Student.query.filter_by(parent_id=parent_id).order_by(Student.id).all()
+    child_ids = [child.id for child in children]
+
+    grades, materials = [], []
+    if child_ids:
+        # Grades have no date, so the latest grade per subject is the one added last
+        latest = (db.session.query(func.max(Grade.id))
+                  .filter(Grade.student_id.in_(child_ids))
+                  .group_by(Grade.student_id, Grade.subject_id))
+        grades = (Grade.query.options(joinedload(Grade.subject))
+                  .filter(Grade.id.in_(latest.scalar_subquery()))
+                  .order_by(Grade.student_id, Grade.subject_id).all())
+
+        since = datetime.utcnow() - timedelta(days=current_app.config.get('FEED_MATERIAL_DAYS', 30))
+        class_subjects = select(Subject.id).where(Subject.class_id.in_({child.class_id for child in children}))
+        materials = (LearningMaterial.query
+                     .filter(or_(LearningMaterial.student_id.in_(child_ids),
+                                 LearningMaterial.subject_id.in_(class_subjects)))
+                     .filter(LearningMaterial.upload_date >= since)
+                     .order_by(LearningMaterial.upload_date.desc(), LearningMaterial.id.desc())
+                     .limit(FEED_MATERIALS).all())
+
+    # Bounded on created_at so only the recent monthly partitions are read
+    notifications = (Notifications.query.filter_by(parent_id=parent_id, read_at=None)
+                     .filter(Notifications.created_at >= recent_since())
+                     .order_by(Notifications.created_at.desc(), Notifications.id.desc())
+                     .limit(FEED_NOTIFICATIONS).all())
+
+    grades_by_child = {}
+    for grade in grades:
+        grades_by_child.setdefault(grade.student_id, []).append(grade.to_dict())
+
+    return {
+        'parent_id': parent_id,
+        'generated_at': datetime.utcnow(),
+        'children': [dict(child.to_dict(), latest_grades=grades_by_child.get(child.id, [])) for child in children],
+        'unread_notifications': [notification.to_dict() for notification in notifications],
+        'new_materials': [material.to_dict() for material in materials],
+    }
+
+
+def get_feed_json(parent_id):
+    # The feed as a JSON string, from parent_feeds when the cache is on and the row is current
+    if not current_app.config.get('PARENT_FEED_CACHE'):
+        return current_app.json.dumps(build_feed(parent_id))
+
+    max_age = timedelta(seconds=current_app.config.get('PARENT_FEED_MAX_AGE', 3600))
+    row = db.session.get(ParentFeed, parent_id)
+    if (row is not None and row.payload is not None and row.built_version == row.version
+            and row.built_at > datetime.utcnow() - max_age):
+        return row.payload
+
+    version = row.version if row is not None else 0
+    payload = current_app.json.dumps(build_feed(parent_id))
+    built = {'built_version': version, 'payload': payload, 'built_at': datetime.utcnow()}
+    # Always on the primary: with read replicas this GET's reads may be on a replica. If that
+    # one is behind, `version` is stale and the upsert matches no row, so nothing is cached.
+    _upsert(db.session.connection(bind_arguments={'bind': db.engine}), dict(built, parent_id=parent_id, version=0),
+            built, where=ParentFeed.__table__.c.version == version)
+    db.session.commit()
+    return payload
+
+
+## Invalidation ##
+
+def invalidate_feeds(connection, parent_ids):
+    parent_ids = {parent_id for parent_id in parent_ids if parent_id is not None}
+    if not parent_ids:
+        return
+    # One statement for all of them, in a fixed order so concurrent writers can't deadlock
+    rows = [{'parent_id': parent_id, 'version': 1} for parent_id in sorted(parent_ids)]
+    _upsert(connection, rows, {'version': ParentFeed.__table__.c.version + 1})
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidate_changed_feeds(session, flush_context):
+    if not current_app.config.get('PARENT_FEED_CACHE'):
+        return
+    parent_ids, student_ids, subject_ids, class_ids = set(), set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Student, Notifications)):
+            parent_ids.update(_values(obj, 'parent_id'))
+        elif isinstance(obj, Grade):
+            student_ids.update(_values(obj, 'student_id'))
+        elif isinstance(obj, LearningMaterial):
+            student_ids.update(_values(obj, 'student_id'))
+            subject_ids.update(_values(obj, 'subject_id'))
+        elif isinstance(obj, Subject):
+            # Its name is on the grades, and its class's children see its materials
+            class_ids.update(_values(obj, 'class_id'))
+    student_ids.discard(None)
+    subject_ids.discard(None)
+    class_ids.discard(None)
+
+    connection = session.connection()
+    if student_ids:
+        parent_ids.update(connection.execute(
+            select(Student.parent_id).where(Student.id.in_(student_ids))).scalars())
+    if subject_ids:
+        parent_ids.update(connection.execute(
+            select(Student.parent_id).join(Subject, Subject.class_id == Student.class_id)
+            .where(Subject.id.in_(subject_ids))).scalars())
+    if class_ids:
+        parent_ids.update(connection.execute(
+            select(Student.parent_id).where(Student.class_id.in_(class_ids))).scalars())
+    invalidate_feeds(connection, parent_ids)
+
+
+def _values(obj, attribute):
+    # Current and previous values, so moving a row also refreshes the feed it left
+    history = inspect(obj).attrs[attribute].history
+    return set(history.added) | set(history.unchanged) | set(history.deleted)
+
+
+def _upsert(connection, values, set_, where=None):
+    if connection.dialect.name == 'postgresql':
+        statement = postgresql_insert(ParentFeed.__table__)
+    elif connection.dialect.name == 'sqlite':
+        statement = sqlite_insert(ParentFeed.__table__)
+    else:
+        return  # the cache needs INSERT ... ON CONFLICT; other databases just rebuild every time
+    statement = statement.values(values).on_conflict_do_update(index_elements=['parent_id'], set_=set_, where=where)
+    connection.execute(statement)
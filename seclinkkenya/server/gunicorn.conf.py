@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+# Gunicorn settings for serving SecLink Kenya in production.
+# Run with: gunicorn -c gunicorn.conf.py wsgi:app
+# Every value can be overridden from the environment (or the .env file loaded by your process manager).
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5555)}"
+
+# Workers and threads derived from the CPU count
+workers = int(os.getenv('WEB_CONCURRENCY', cpu_count * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Load the app once in the master so workers share its memory copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() in ['true', '1', 't']
+
+# Keep-alive tuned for clients on slow mobile links behind a proxy
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then to cap memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+# Each worker owns its own connection pool: one connection per thread is enough
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while preloading must not be shared with the forked workers
+    if not server.cfg.preload_app:
+        return
+    from wsgi import app
+    from models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,252 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from functools import wraps
+from flask import current_app, jsonify, request
+from audit import current_actor
+from ratelimit import client_ip
+from tenancy import current_school_id
+
+# Idempotency keys for the POST routes a flaky connection makes clients retry (a new
+# student, a notification, an upload). A client sends `Idempotency-Key: <uuid>` and sends
+# the same key again when it retries:
+#   - the first request with a key claims it and runs; its response (status, type and body)
+#     is kept for IDEMPOTENCY_TTL_HOURS;
+#   - a retry gets that response back, marked `Idempotent-Replayed: true`, without the view
+#     running again (no second row, no second file);
+#   - a retry that arrives while the first is still running waits up to IDEMPOTENCY_WAIT
+#     seconds for its response, then gets 409 and should retry later. Only one ever runs.
+# Keys are per school and user (per client address on routes without a login), and a key reused for a
+# different request body gets 422. A request that fails with a 5xx or an exception frees
+# its key, as nothing was saved, so the retry runs. A claim left by a crashed worker
+# expires after IDEMPOTENCY_LOCK_SECONDS.
+#
+# IDEMPOTENCY_STORAGE_URL picks where keys live, as for rate limits (ratelimit.py):
+#   memory://            this process only (single worker)
+#   redis://host:6379/0  shared by every worker and server (needs the `redis` package)
+#   fake://              an in-process stand-in for Redis, to run the shared code path locally
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+## Stores ##
+# Values are strings. add() only sets a key that is absent (or expired) and says whether it
+# did; release() deletes a key only while it still holds the given value.
+
+class MemoryStore:
+    def __init__(self, shards=16, sweep_every=1000):
+        self.shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.sweep_every = sweep_every
+        self._operations = 0
+
+    def _shard(self, key):
+        return self.shards[zlib.crc32(key.encode()) % len(self.shards)]
+
+    def _live(self, entries, key, now):
+        value, expires = entries.get(key, (None, 0))
+        return value if expires > now else None
+
+    def add(self, key, value, ttl):
+        entries, lock = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            self._operations += 1
+            if self._operations % self.sweep_every == 0:
+                self._sweep(entries, now)
+            if self._live(entries, key, now) is not None:
+                return False
+            entries[key] = (value, now + ttl)
+            return True
+
+    def get(self, key):
+        entries, lock = self._shard(key)
+        with lock:
+            return self._live(entries, key, time.monotonic())
+
+    def set(self, key, value, ttl):
+        entries, lock = self._shard(key)
+        with lock:
+            entries[key] = (value, time.monotonic() + ttl)
+
+    def release(self, key, value):
+        entries, lock = self._shard(key)
+        with lock:
+            if self._live(entries, key, time.monotonic()) == value:
+                del entries[key]
+
+    def _sweep(self, entries, now):
+        for key, (_, expires) in list(entries.items()):
+            if expires <= now:
+                del entries[key]
+
+
+# Runs atomically on the Redis server
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SharedStore:
+    # Keys in Redis, shared by all workers. If the server can't be reached, keys fall back to
+    # this process for a few seconds, like the rate limits.
+    def __init__(self, client, prefix='idempotency:', retry_interval=5):
+        self.client = client
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.fallback = MemoryStore()
+        self._retry_at = 0.0
+
+    def _call(self, name, key, *args):
+        if time.monotonic() >= self._retry_at:
+            try:
+                return getattr(self, '_' + name)(self.prefix + key, *args)
+            except Exception as e:
+                logger.warning('Idempotency store unavailable (%s), using per-process keys for %ss',
+                               e, self.retry_interval)
+                self._retry_at = time.monotonic() + self.retry_interval
+        return getattr(self.fallback, name)(key, *args)
+
+    def add(self, key, value, ttl):
+        return self._call('add', key, value, ttl)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, value, ttl):
+        return self._call('set', key, value, ttl)
+
+    def release(self, key, value):
+        return self._call('release', key, value)
+
+    def _add(self, key, value, ttl):
+        return bool(self.client.set(key, value, nx=True, px=int(ttl * 1000)))
+
+    def _get(self, key):
+        value = self.client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def _set(self, key, value, ttl):
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def _release(self, key, value):
+        self.client.eval(RELEASE_SCRIPT, 1, key, value)
+
+
+class FakeRedis:
+    # Just enough of a Redis client to run SharedStore in one process, without a server
+    def __init__(self):
+        self.memory = MemoryStore(shards=1)
+
+    def set(self, name, value, nx=False, px=None):
+        if nx:
+            return self.memory.add(name, value, px / 1000)
+        self.memory.set(name, value, px / 1000)
+        return True
+
+    def get(self, name):
+        return self.memory.get(name)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        if script != RELEASE_SCRIPT:
+            raise NotImplementedError('FakeRedis only runs the release script')
+        key, value = keys_and_args
+        self.memory.release(key, value)
+
+
+def create_store(url):
+    if url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith('fake://'):
+        return SharedStore(FakeRedis())
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis  # only needed for a shared store
+        return SharedStore(redis.Redis.from_url(url, socket_timeout=0.5))
+    raise ValueError(f'Unsupported IDEMPOTENCY_STORAGE_URL {url!r}')
+
+
+def init_idempotency(app):
+    app.extensions['idempotency'] = create_store(app.config.get('IDEMPOTENCY_STORAGE_URL', 'memory://'))
+
+
+## Decorator ##
+
+def fingerprint():
+    # What makes two requests with one key "the same request"
+    digest = hashlib.sha256(f'{request.method} {request.path}?{request.query_string.decode()}'.encode())
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        # Fields and file names rather than the raw body, which would hold whole uploads in memory
+        digest.update(json.dumps([sorted(request.form.items(multi=True)),
+                                  sorted((name, file.filename) for name, file in request.files.items(multi=True))])
+                      .encode())
+    else:
+        digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def replay(record):
+    response = current_app.response_class(base64.b64decode(record['body']), status=record['status'],
+                                          content_type=record['content_type'])
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    # For views that create something on POST; other methods run as they are
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            store = current_app.extensions.get('idempotency')
+            idempotency_key = request.headers.get(HEADER)
+            if store is None or request.method != 'POST' or idempotency_key is None:
+                return f(*args, **kwargs)
+            if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH or not idempotency_key.isprintable():
+                return jsonify({'message': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} printable characters'}), 400
+
+            role, user_id = current_actor()
+            owner = f'{role}:{user_id}' if user_id is not None else f'ip:{client_ip()}'
+            key = f'{scope}:{current_school_id()}:{owner}:{idempotency_key}'
+            config = current_app.config
+            claim = json.dumps({'state': 'running', 'claim': uuid.uuid4().hex, 'fingerprint': fingerprint()})
+
+            deadline = time.monotonic() + config.get('IDEMPOTENCY_WAIT', 10)
+            while not store.add(key, claim, config.get('IDEMPOTENCY_LOCK_SECONDS', 60)):
+                value = store.get(key)
+                if value is None:
+                    continue  # freed or expired just now: try to claim it again
+                record = json.loads(value)
+                if record['fingerprint'] != json.loads(claim)['fingerprint']:
+                    return jsonify({'message': f'This {HEADER} was already used for a different request'}), 422
+                if record['state'] == 'done':
+                    return replay(record)
+                if time.monotonic() >= deadline:
+                    response = jsonify({'message': 'A request with this Idempotency-Key is still in progress'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                time.sleep(0.05)
+
+            try:
+                response = current_app.make_response(f(*args, **kwargs))
+            except BaseException:
+                store.release(key, claim)
+                raise
+            if response.status_code >= 500 or response.is_streamed:
+                store.release(key, claim)
+                return response
+            store.set(key, json.dumps({
+                'state': 'done', 'fingerprint': json.loads(claim)['fingerprint'], 'status': response.status_code,
+                'content_type': response.content_type, 'body': base64.b64encode(response.get_data()).decode()
+            }), config.get('IDEMPOTENCY_TTL_HOURS', 24) * 3600)
+            return response
+        return decorated
+    return decorator
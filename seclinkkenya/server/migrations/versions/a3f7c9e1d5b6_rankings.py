@@ -0,0 +1,52 @@
+"""Rankings: forms of classes and students' positions in their stream and form
+
+Revision ID: a3f7c9e1d5b6
+Revises: e7c3a9d1f5b2
+Create Date: 2026-10-23 11:18:45.603127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f7c9e1d5b6'
+down_revision = 'e7c3a9d1f5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('form', sa.Integer(), nullable=True))
+
+    op.create_table('rankings',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('class_id', sa.Integer(), nullable=False),
+    sa.Column('form', sa.Integer(), nullable=True),
+    sa.Column('subjects', sa.Integer(), nullable=False),
+    sa.Column('mean_points', sa.Float(), nullable=False),
+    sa.Column('stream_position', sa.Integer(), nullable=False),
+    sa.Column('stream_size', sa.Integer(), nullable=False),
+    sa.Column('form_position', sa.Integer(), nullable=False),
+    sa.Column('form_size', sa.Integer(), nullable=False),
+    sa.Column('percentile', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], name=op.f('fk_rankings_class_id'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], name=op.f('fk_rankings_student_id'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', name=op.f('pk_rankings'))
+    )
+    with op.batch_alter_table('rankings', schema=None) as batch_op:
+        batch_op.create_index('ix_rankings_class_id_stream_position', ['class_id', 'stream_position'], unique=False)
+        batch_op.create_index('ix_rankings_school_id_form_form_position', ['school_id', 'form', 'form_position'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('rankings', schema=None) as batch_op:
+        batch_op.drop_index('ix_rankings_school_id_form_form_position')
+        batch_op.drop_index('ix_rankings_class_id_stream_position')
+
+    op.drop_table('rankings')
+    with op.batch_alter_table('classes', schema=None) as batch_op:
+        batch_op.drop_column('form')
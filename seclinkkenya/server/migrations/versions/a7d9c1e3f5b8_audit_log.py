@@ -0,0 +1,44 @@
+"""Audit log
+
+Revision ID: a7d9c1e3f5b8
+Revises: f4c6e8a0b2d7
+Create Date: 2026-10-19 22:58:14.730162
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d9c1e3f5b8'
+down_revision = 'f4c6e8a0b2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('actor_type', sa.String(length=20), nullable=True),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=10), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=True),
+    sa.Column('changes', sa.Text(), nullable=False),
+    sa.Column('request', sa.String(length=250), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_audit_log'))
+    )
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_log_actor_type_actor_id', ['actor_type', 'actor_id'], unique=False)
+        batch_op.create_index('ix_audit_log_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_audit_log_table_name_row_id', ['table_name', 'row_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_table_name_row_id')
+        batch_op.drop_index('ix_audit_log_created_at')
+        batch_op.drop_index('ix_audit_log_actor_type_actor_id')
+
+    op.drop_table('audit_log')
@@ -0,0 +1,82 @@
+"""Schools: school_id on every tenant table, per-school unique usernames and emails
+
+Revision ID: b1e3d5f7a9c2
+Revises: a7d9c1e3f5b8
+Create Date: 2026-10-20 09:12:45.381027
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1e3d5f7a9c2'
+down_revision = 'a7d9c1e3f5b8'
+branch_labels = None
+depends_on = None
+
+# Table -> composite index added with school_id (None: school_id alone needs no index)
+TENANT_TABLES = {
+    'teachers': None,
+    'parents': None,
+    'students': ('ix_students_school_id_class_id', ['school_id', 'class_id']),
+    'grades': ('ix_grades_school_id_student_id', ['school_id', 'student_id']),
+    'classes': ('ix_classes_school_id_teacher_id', ['school_id', 'teacher_id']),
+    'subjects': ('ix_subjects_school_id_class_id', ['school_id', 'class_id']),
+    'notifications': ('ix_notifications_school_id_parent_id', ['school_id', 'parent_id']),
+    'learning_material': ('ix_learning_material_school_id_upload_date', ['school_id', 'upload_date']),
+    'password_reset_tokens': None,
+    'change_log': ('ix_change_log_school_id_id', ['school_id', 'id']),
+    'audit_log': ('ix_audit_log_school_id_id', ['school_id', 'id']),
+}
+
+
+def upgrade():
+    schools = op.create_table('schools',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('code', sa.String(length=50), nullable=False),
+    sa.Column('schema_name', sa.String(length=63), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_schools')),
+    sa.UniqueConstraint('code', name=op.f('uq_schools_code'))
+    )
+    # Existing data becomes school 1, the default school
+    op.bulk_insert(schools, [{'name': 'SecLink Kenya', 'code': 'default', 'created_at': datetime.utcnow()}])
+
+    for table, index in TENANT_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('school_id', sa.Integer(), nullable=False, server_default='1'))
+            if index:
+                batch_op.create_index(index[0], index[1], unique=False)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('school_id', server_default=None)
+
+    for table in ('teachers', 'parents'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'uq_{table}_username', type_='unique')
+            batch_op.drop_constraint(f'uq_{table}_email', type_='unique')
+            batch_op.create_unique_constraint(f'uq_{table}_school_id_username', ['school_id', 'username'])
+            batch_op.create_unique_constraint(f'uq_{table}_school_id_email', ['school_id', 'email'])
+            batch_op.create_index(f'ix_{table}_username', ['username'], unique=False)
+            batch_op.create_index(f'ix_{table}_email', ['email'], unique=False)
+
+
+def downgrade():
+    for table in ('parents', 'teachers'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_email')
+            batch_op.drop_index(f'ix_{table}_username')
+            batch_op.drop_constraint(f'uq_{table}_school_id_email', type_='unique')
+            batch_op.drop_constraint(f'uq_{table}_school_id_username', type_='unique')
+            batch_op.create_unique_constraint(f'uq_{table}_email', ['email'])
+            batch_op.create_unique_constraint(f'uq_{table}_username', ['username'])
+
+    for table, index in reversed(list(TENANT_TABLES.items())):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if index:
+                batch_op.drop_index(index[0])
+            batch_op.drop_column('school_id')
+
+    op.drop_table('schools')
@@ -0,0 +1,35 @@
+"""Learning material subject and full-text search index
+
+Revision ID: b7d1f0c9e2a4
+Revises: 43a423f55afd
+Create Date: 2026-10-19 15:52:10.114521
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from search import create_search_index, drop_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d1f0c9e2a4'
+down_revision = '43a423f55afd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('subject_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key(batch_op.f('fk_learning_material_subject_id'), 'subjects', ['subject_id'], ['id'])
+
+    # tsvector + GIN index on PostgreSQL, FTS5 table on SQLite.
+    # Existing materials are indexed with `flask reindex-materials`.
+    create_search_index(op.get_bind())
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
+
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_learning_material_subject_id'), type_='foreignkey')
+        batch_op.drop_column('subject_id')
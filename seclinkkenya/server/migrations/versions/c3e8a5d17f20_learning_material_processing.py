@@ -0,0 +1,35 @@
+"""Learning material processing status, size, page count and preview
+
+Revision ID: c3e8a5d17f20
+Revises: b7d1f0c9e2a4
+Create Date: 2026-10-19 17:08:41.530218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a5d17f20'
+down_revision = 'b7d1f0c9e2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start as pending; run `flask process-materials` to fill them in
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('processing_status', sa.String(length=20), nullable=False, server_default='pending'))
+        batch_op.add_column(sa.Column('file_size', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('page_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('preview', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('processed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.drop_column('processed_at')
+        batch_op.drop_column('preview')
+        batch_op.drop_column('page_count')
+        batch_op.drop_column('file_size')
+        batch_op.drop_column('processing_status')
@@ -0,0 +1,87 @@
+"""Notifications partitioned by month on PostgreSQL
+
+Revision ID: c4f8a2d6e0b3
+Revises: b1e3d5f7a9c2
+Create Date: 2026-10-21 10:04:17.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from partitions import create_partitions, month_of, setting, upcoming_months
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a2d6e0b3'
+down_revision = 'b1e3d5f7a9c2'
+branch_labels = None
+depends_on = None
+
+COLUMNS = 'id, message, created_at, updated_at, read_at, parent_id, school_id'
+INDEXES = {
+    'ix_notifications_parent_id_read_at': ['parent_id', 'read_at'],
+    'ix_notifications_school_id_parent_id': ['school_id', 'parent_id'],
+}
+
+
+def create_notifications(partitioned):
+    # id keeps drawing from the existing sequence, so ids carry on where they were
+    primary_key = ['id', 'created_at'] if partitioned else ['id']
+    kw = {'postgresql_partition_by': 'RANGE (created_at)'} if partitioned else {}
+    op.create_table('notifications',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('notifications_id_seq')"), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=not partitioned),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.Column('parent_id', sa.Integer(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['parent_id'], ['parents.id'], name=op.f('fk_notifications_parent_id')),
+    sa.PrimaryKeyConstraint(*primary_key, name=op.f('pk_notifications')),
+    **kw
+    )
+
+
+def replace_table(partitioned):
+    # A table can't be (un)partitioned in place: rename it, create the new one and copy the rows over
+    op.rename_table('notifications', 'notifications_old')
+    op.execute('ALTER TABLE notifications_old RENAME CONSTRAINT pk_notifications TO pk_notifications_old')
+    for index in INDEXES:
+        op.drop_index(index, table_name='notifications_old')
+
+    create_notifications(partitioned)
+    for index, columns in INDEXES.items():
+        op.create_index(index, 'notifications', columns, unique=False)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Partitions go by created_at, so every row needs one
+    op.execute('UPDATE notifications SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('notifications', schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        return
+
+    replace_table(partitioned=True)
+    # A partition for every month with notifications, plus the coming months
+    months = [month_of(day) for day in bind.execute(sa.text(
+        "SELECT DISTINCT date_trunc('month', created_at) FROM notifications_old")).scalars()]
+    create_partitions(bind, months + upcoming_months(setting('NOTIFICATION_PARTITIONS_AHEAD', 3)))
+
+    op.execute(f'INSERT INTO notifications ({COLUMNS}) SELECT {COLUMNS} FROM notifications_old')
+    op.execute('ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id')
+    op.drop_table('notifications_old')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('notifications', schema=None) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+        return
+
+    # Archived months are left in the archive schema
+    replace_table(partitioned=False)
+    op.execute(f'INSERT INTO notifications ({COLUMNS}) SELECT {COLUMNS} FROM notifications_old')
+    op.execute('ALTER SEQUENCE notifications_id_seq OWNED BY notifications.id')
+    op.drop_table('notifications_old')  # and its partitions
@@ -0,0 +1,51 @@
+"""Attendance: class registers and roll call bitmaps
+
+Revision ID: d2a6f8b0c4e1
+Revises: c4f8a2d6e0b3
+Create Date: 2026-10-21 15:37:02.918244
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a6f8b0c4e1'
+down_revision = 'c4f8a2d6e0b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('class_register',
+    sa.Column('class_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], name=op.f('fk_class_register_class_id')),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], name=op.f('fk_class_register_student_id'), ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('class_id', 'position', name=op.f('pk_class_register')),
+    sa.UniqueConstraint('class_id', 'student_id', name='uq_class_register_class_id_student_id')
+    )
+    op.create_table('attendance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('class_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('lesson', sa.SmallInteger(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=True),
+    sa.Column('teacher_id', sa.Integer(), nullable=True),
+    sa.Column('recorded', sa.LargeBinary(), nullable=False),
+    sa.Column('present', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], name=op.f('fk_attendance_class_id')),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], name=op.f('fk_attendance_subject_id')),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id'], name=op.f('fk_attendance_teacher_id')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_attendance')),
+    sa.UniqueConstraint('class_id', 'date', 'lesson', name='uq_attendance_class_id_date_lesson')
+    )
+
+
+def downgrade():
+    op.drop_table('attendance')
+    op.drop_table('class_register')
@@ -0,0 +1,66 @@
+"""Parent feed: notification read status, feed indexes and cached feeds
+
+Revision ID: d5a1c7e9b3f2
+Revises: c3e8a5d17f20
+Create Date: 2026-10-19 18:21:07.264410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a1c7e9b3f2'
+down_revision = 'c3e8a5d17f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('read_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_notifications_parent_id_read_at', ['parent_id', 'read_at'], unique=False)
+
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.create_index('ix_students_parent_id', ['parent_id'], unique=False)
+
+    with op.batch_alter_table('grades', schema=None) as batch_op:
+        batch_op.create_index('ix_grades_student_id_subject_id', ['student_id', 'subject_id'], unique=False)
+
+    with op.batch_alter_table('subjects', schema=None) as batch_op:
+        batch_op.create_index('ix_subjects_class_id', ['class_id'], unique=False)
+
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.create_index('ix_learning_material_student_id', ['student_id'], unique=False)
+        batch_op.create_index('ix_learning_material_subject_id_upload_date', ['subject_id', 'upload_date'], unique=False)
+
+    op.create_table('parent_feeds',
+    sa.Column('parent_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('built_version', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.Text(), nullable=True),
+    sa.Column('built_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['parents.id'], name=op.f('fk_parent_feeds_parent_id'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('parent_id', name=op.f('pk_parent_feeds'))
+    )
+
+
+def downgrade():
+    op.drop_table('parent_feeds')
+
+    with op.batch_alter_table('learning_material', schema=None) as batch_op:
+        batch_op.drop_index('ix_learning_material_subject_id_upload_date')
+        batch_op.drop_index('ix_learning_material_student_id')
+
+    with op.batch_alter_table('subjects', schema=None) as batch_op:
+        batch_op.drop_index('ix_subjects_class_id')
+
+    with op.batch_alter_table('grades', schema=None) as batch_op:
+        batch_op.drop_index('ix_grades_student_id_subject_id')
+
+    with op.batch_alter_table('students', schema=None) as batch_op:
+        batch_op.drop_index('ix_students_parent_id')
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_parent_id_read_at')
+        batch_op.drop_column('read_at')
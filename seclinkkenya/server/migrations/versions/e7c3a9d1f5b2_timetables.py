@@ -0,0 +1,57 @@
+"""Timetables: periods per week of subjects, teacher unavailability and timetable slots
+
+Revision ID: e7c3a9d1f5b2
+Revises: d2a6f8b0c4e1
+Create Date: 2026-10-22 09:41:26.104873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a9d1f5b2'
+down_revision = 'd2a6f8b0c4e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subjects', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('periods_per_week', sa.Integer(), nullable=True))
+
+    op.create_table('teacher_unavailability',
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('period', sa.SmallInteger(), autoincrement=False, nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id'], name=op.f('fk_teacher_unavailability_teacher_id'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('teacher_id', 'day', 'period', name=op.f('pk_teacher_unavailability'))
+    )
+    op.create_table('timetable_slots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('class_id', sa.Integer(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.SmallInteger(), nullable=False),
+    sa.Column('period', sa.SmallInteger(), nullable=False),
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['class_id'], ['classes.id'], name=op.f('fk_timetable_slots_class_id')),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], name=op.f('fk_timetable_slots_subject_id'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teachers.id'], name=op.f('fk_timetable_slots_teacher_id')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_timetable_slots')),
+    sa.UniqueConstraint('class_id', 'day', 'period', name='uq_timetable_slots_class_id_day_period'),
+    sa.UniqueConstraint('teacher_id', 'day', 'period', name='uq_timetable_slots_teacher_id_day_period')
+    )
+    with op.batch_alter_table('timetable_slots', schema=None) as batch_op:
+        batch_op.create_index('ix_timetable_slots_school_id_day_period', ['school_id', 'day', 'period'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('timetable_slots', schema=None) as batch_op:
+        batch_op.drop_index('ix_timetable_slots_school_id_day_period')
+
+    op.drop_table('timetable_slots')
+    op.drop_table('teacher_unavailability')
+    with op.batch_alter_table('subjects', schema=None) as batch_op:
+        batch_op.drop_column('periods_per_week')
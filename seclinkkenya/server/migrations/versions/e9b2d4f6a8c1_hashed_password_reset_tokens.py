@@ -0,0 +1,48 @@
+"""Store password reset tokens as SHA-256 digests
+
+Revision ID: e9b2d4f6a8c1
+Revises: d5a1c7e9b3f2
+Create Date: 2026-10-19 19:02:33.817740
+
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b2d4f6a8c1'
+down_revision = 'd5a1c7e9b3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_hash', sa.String(length=64), nullable=True))
+
+    # Hash the tokens already handed out, so their links keep working
+    tokens = sa.table('password_reset_tokens', sa.column('id', sa.Integer), sa.column('token', sa.String),
+                      sa.column('token_hash', sa.String))
+    connection = op.get_bind()
+    for token_id, token in connection.execute(sa.select(tokens.c.id, tokens.c.token)).all():
+        connection.execute(tokens.update().where(tokens.c.id == token_id)
+                           .values(token_hash=hashlib.sha256(token.encode()).hexdigest()))
+
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.alter_column('token_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_unique_constraint(batch_op.f('uq_password_reset_tokens_token_hash'), ['token_hash'])
+        batch_op.drop_constraint('uq_password_reset_tokens_token', type_='unique')
+        batch_op.drop_column('token')
+        batch_op.create_index('ix_password_reset_tokens_expiry_date', ['expiry_date'], unique=False)
+
+
+def downgrade():
+    # Digests can't be turned back into tokens, so outstanding reset links are dropped
+    op.execute('DELETE FROM password_reset_tokens')
+    with op.batch_alter_table('password_reset_tokens', schema=None) as batch_op:
+        batch_op.drop_index('ix_password_reset_tokens_expiry_date')
+        batch_op.add_column(sa.Column('token', sa.String(length=100), nullable=False))
+        batch_op.create_unique_constraint(batch_op.f('uq_password_reset_tokens_token'), ['token'])
+        batch_op.drop_constraint('uq_password_reset_tokens_token_hash', type_='unique')
+        batch_op.drop_column('token_hash')
@@ -1,13 +1,14 @@
+import json
 import re
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy_serializer import SerializerMixin
 # from werkzeug.security import generate_password_hash, check_password_hash
-from flask_bcrypt import generate_password_hash, check_password_hash
 from datetime import datetime
 from sqlalchemy.orm import validates
 from sqlalchemy import MetaData
 from sqlalchemy.orm import relationship
+from replicas import RoutingSession
 
 
 metadata = MetaData(naming_convention={
@@ -17,7 +18,7 @@ metadata = MetaData(naming_convention={
     "ck": "ck_%(table_name)s_%(constraint_name)s"
 })
 
-db = SQLAlchemy(metadata=metadata)
+db = SQLAlchemy(metadata=metadata, session_options={'class_': RoutingSession})
 
 # Define the association table for students and subjects
 student_subject = db.Table('student_subject',
@@ -27,12 +28,34 @@ student_subject = db.Table('student_subject',
     db.Column('subject_id', db.Integer, db.ForeignKey('subjects.id'))
 )
 
+class School(db.Model):
+    # A school hosted on this server. Everything else belongs to one school (see tenancy.py)
+    __tablename__ = 'schools'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    code = db.Column(db.String(50), nullable=False, unique=True)  # given at login and signup
+    schema_name = db.Column(db.String(63), nullable=True)  # own PostgreSQL schema, if any
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'code': self.code,
+        }
+
+# Rows of one school; queries are scoped to the current school automatically (tenancy.py).
+# No foreign key to schools, so the tables can also live in a per-school schema.
+class TenantMixin:
+    school_id = db.Column(db.Integer, nullable=False)
+
 # Base class for common user functionality
-class BaseUser(db.Model, SerializerMixin):
+class BaseUser(TenantMixin, db.Model, SerializerMixin):
     __abstract__ = True
     name = db.Column(db.String(100), nullable=False)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    # Unique within a school (see Teacher and Parent)
+    username = db.Column(db.String(80), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
     password = db.Column(db.String(128), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -57,6 +80,13 @@ class BaseUser(db.Model, SerializerMixin):
 
 class Teacher(BaseUser):
     __tablename__ = 'teachers'
+    __table_args__ = (
+        db.UniqueConstraint('school_id', 'username', name='uq_teachers_school_id_username'),
+        db.UniqueConstraint('school_id', 'email', name='uq_teachers_school_id_email'),
+        # Login and password resets may not know the school yet
+        db.Index('ix_teachers_username', 'username'),
+        db.Index('ix_teachers_email', 'email'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     subject = db.Column(db.String(50))
     
@@ -78,6 +108,13 @@ class Teacher(BaseUser):
 
 class Parent(BaseUser):
     __tablename__ = 'parents'
+    __table_args__ = (
+        db.UniqueConstraint('school_id', 'username', name='uq_parents_school_id_username'),
+        db.UniqueConstraint('school_id', 'email', name='uq_parents_school_id_email'),
+        # Login and password resets may not know the school yet
+        db.Index('ix_parents_username', 'username'),
+        db.Index('ix_parents_email', 'email'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     
     # Relationships
@@ -95,8 +132,12 @@ class Parent(BaseUser):
             'notifications': [notification.to_dict() for notification in self.notifications]
         }
 
-class Student(db.Model, SerializerMixin):
+class Student(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'students'
+    __table_args__ = (
+        db.Index('ix_students_parent_id', 'parent_id'),
+        db.Index('ix_students_school_id_class_id', 'school_id', 'class_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     dob = db.Column(db.String, nullable=False)
@@ -126,8 +167,12 @@ class Student(db.Model, SerializerMixin):
         }
 
 
-class Grade(db.Model, SerializerMixin):
+class Grade(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'grades'
+    __table_args__ = (
+        db.Index('ix_grades_student_id_subject_id', 'student_id', 'subject_id'),
+        db.Index('ix_grades_school_id_student_id', 'school_id', 'student_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     grade = db.Column(db.String(2), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
@@ -144,12 +189,14 @@ class Grade(db.Model, SerializerMixin):
             'subject': self.subject.subject_name
         }
 
-class Class(db.Model, SerializerMixin):
+class Class(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'classes'
+    __table_args__ = (db.Index('ix_classes_school_id_teacher_id', 'school_id', 'teacher_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     class_name = db.Column(db.String(50), nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
+    form = db.Column(db.Integer, nullable=True)  # e.g. 2 for the Form 2 streams; students are ranked across a form
 
     subjects = db.relationship('Subject', backref='classes')
     students = db.relationship('Student', back_populates='classes')  # Ensure back_populates points to class_
@@ -159,16 +206,22 @@ class Class(db.Model, SerializerMixin):
             'id': self.id,
             'class_name': self.class_name,
             'teacher_id': self.teacher_id,
+            'form': self.form,
             'subjects': [subject.to_dict() for subject in self.subjects]
         }
 
-class Subject(db.Model, SerializerMixin):
+class Subject(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'subjects'
+    __table_args__ = (
+        db.Index('ix_subjects_class_id', 'class_id'),
+        db.Index('ix_subjects_school_id_class_id', 'school_id', 'class_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     subject_name = db.Column(db.String(100), nullable=False)
     subject_code = db.Column(db.String(10), nullable=False)
     class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
+    periods_per_week = db.Column(db.Integer, nullable=True)  # lessons in the timetable, see timetable.py
 
     def to_dict(self):
         return {
@@ -176,15 +229,23 @@ class Subject(db.Model, SerializerMixin):
             'subject_name': self.subject_name,
             'subject_code': self.subject_code,
             'class_id': self.class_id,
-            'teacher_id': self.teacher_id
+            'teacher_id': self.teacher_id,
+            'periods_per_week': self.periods_per_week
         }
 
-class Notifications(db.Model, SerializerMixin):
+class Notifications(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_parent_id_read_at', 'parent_id', 'read_at'),
+        db.Index('ix_notifications_school_id_parent_id', 'school_id', 'parent_id'),
+        # Monthly partitions on PostgreSQL, see partitions.py
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    read_at = db.Column(db.DateTime, nullable=True)
     parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), nullable=False)
 
     parent = db.relationship('Parent', back_populates='notifications')
@@ -193,34 +254,179 @@ class Notifications(db.Model, SerializerMixin):
         return {
             'id': self.id,
             'message': self.message,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'read_at': self.read_at,
             'parent_id': self.parent_id
         }
 
-class LearningMaterial(db.Model, SerializerMixin):
+class LearningMaterial(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'learning_material'
+    __table_args__ = (
+        db.Index('ix_learning_material_student_id', 'student_id'),
+        db.Index('ix_learning_material_subject_id_upload_date', 'subject_id', 'upload_date'),
+        db.Index('ix_learning_material_school_id_upload_date', 'school_id', 'upload_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     file_path = db.Column(db.String(200), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('students.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=True)
+
+    # Filled in by processing.py after upload
+    processing_status = db.Column(db.String(20), nullable=False, default='pending')
+    file_size = db.Column(db.Integer, nullable=True)
+    page_count = db.Column(db.Integer, nullable=True)
+    preview = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    subject = db.relationship('Subject', backref='learning_materials')
 
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'file_path': self.file_path,
-            'upload_date': self.upload_date.isoformat(),
+            'upload_date': self.upload_date,
             'teacher_id': self.teacher_id,
-            'student_id': self.student_id
+            'student_id': self.student_id,
+            'subject_id': self.subject_id,
+            'processing_status': self.processing_status,
+            'file_size': self.file_size,
+            'page_count': self.page_count,
+            'preview': self.preview
+        }
+
+class ClassRegister(TenantMixin, db.Model):
+    # A student's place in a class register: their bit in that class's attendance bitmaps.
+    # Places are never reused, so a student who left keeps theirs (see attendance.py)
+    __tablename__ = 'class_register'
+    __table_args__ = (db.UniqueConstraint('class_id', 'student_id', name='uq_class_register_class_id_student_id'),)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='SET NULL'), nullable=True)
+
+class Attendance(TenantMixin, db.Model):
+    # One roll call of a class: its morning register (lesson 0) or a lesson. Bit n of each
+    # bitmap is the student at position n of the class register (see attendance.py)
+    __tablename__ = 'attendance'
+    __table_args__ = (db.UniqueConstraint('class_id', 'date', 'lesson', name='uq_attendance_class_id_date_lesson'),)
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    lesson = db.Column(db.SmallInteger, nullable=False, default=0)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=True)  # who took it last
+    recorded = db.Column(db.LargeBinary, nullable=False)  # students whose attendance was taken
+    present = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TeacherUnavailability(TenantMixin, db.Model):
+    # Periods of the week a teacher can't teach, kept free in their timetable
+    __tablename__ = 'teacher_unavailability'
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)  # 0 is Monday
+    period = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)  # 0 is the first
+
+class TimetableSlot(TenantMixin, db.Model):
+    # A lesson of the school's current timetable (see timetable.py). The unique constraints
+    # keep it clash-free
+    __tablename__ = 'timetable_slots'
+    __table_args__ = (
+        db.UniqueConstraint('class_id', 'day', 'period', name='uq_timetable_slots_class_id_day_period'),
+        db.UniqueConstraint('teacher_id', 'day', 'period', name='uq_timetable_slots_teacher_id_day_period'),
+        db.Index('ix_timetable_slots_school_id_day_period', 'school_id', 'day', 'period'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=False)
+    day = db.Column(db.SmallInteger, nullable=False)
+    period = db.Column(db.SmallInteger, nullable=False)
+
+class Ranking(TenantMixin, db.Model):
+    # A student's mean grade and position in their stream (class) and form, kept up to date
+    # by rankings.py
+    __tablename__ = 'rankings'
+    __table_args__ = (
+        db.Index('ix_rankings_class_id_stream_position', 'class_id', 'stream_position'),
+        db.Index('ix_rankings_school_id_form_form_position', 'school_id', 'form', 'form_position'),
+    )
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id', ondelete='CASCADE'), primary_key=True)
+    class_id = db.Column(db.Integer, db.ForeignKey('classes.id', ondelete='CASCADE'), nullable=False)
+    form = db.Column(db.Integer, nullable=True)
+    subjects = db.Column(db.Integer, nullable=False)
+    mean_points = db.Column(db.Float, nullable=False)
+    stream_position = db.Column(db.Integer, nullable=False)
+    stream_size = db.Column(db.Integer, nullable=False)
+    form_position = db.Column(db.Integer, nullable=False)
+    form_size = db.Column(db.Integer, nullable=False)
+    percentile = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ParentFeed(db.Model):
+    # Cached /parent/feed payloads, see feed.py
+    __tablename__ = 'parent_feeds'
+    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    built_version = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.Text, nullable=True)
+    built_at = db.Column(db.DateTime, nullable=True)
+
+class ChangeLog(TenantMixin, db.Model):
+    # One row per insert/update/delete of a synced table, for GET /sync (see changelog.py)
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('ix_change_log_created_at', 'created_at'),
+        db.Index('ix_change_log_school_id_id', 'school_id', 'id'),
+        {'sqlite_autoincrement': True},  # ids are sync positions, so never reuse them
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class AuditLog(TenantMixin, db.Model):
+    # Who changed what, written in batches by audit.py
+    __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_school_id_id', 'school_id', 'id'),
+        db.Index('ix_audit_log_table_name_row_id', 'table_name', 'row_id'),
+        db.Index('ix_audit_log_actor_type_actor_id', 'actor_type', 'actor_id'),
+        db.Index('ix_audit_log_created_at', 'created_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    actor_type = db.Column(db.String(20), nullable=True)  # 'Teacher', 'Parent', or empty for scripts
+    actor_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(10), nullable=False)  # 'create', 'update' or 'delete'
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=True)
+    changes = db.Column(db.Text, nullable=False)  # JSON, see audit.py
+    request = db.Column(db.String(250), nullable=True)  # e.g. 'PATCH /students/4'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at,
+            'school_id': self.school_id,
+            'actor_type': self.actor_type,
+            'actor_id': self.actor_id,
+            'action': self.action,
+            'table_name': self.table_name,
+            'row_id': self.row_id,
+            'changes': json.loads(self.changes),
+            'request': self.request,
         }
 
-class PasswordResetToken(db.Model, SerializerMixin):
+class PasswordResetToken(TenantMixin, db.Model, SerializerMixin):
     __tablename__ = 'password_reset_tokens'
+    __table_args__ = (db.Index('ix_password_reset_tokens_expiry_date', 'expiry_date'),)
     id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String(100), nullable=False, unique=True)
+    # SHA-256 hex digest of the token; the token itself is only ever in the reset email
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
     expiry_date = db.Column(db.DateTime, nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), nullable=True)
     teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), nullable=True)
@@ -233,8 +439,7 @@ class PasswordResetToken(db.Model, SerializerMixin):
     def to_dict(self):
         return {
             'id': self.id,
-            'token': self.token,
-            'expiry_date': self.expiry_date.isoformat(),
+            'expiry_date': self.expiry_date,
             'parent_id': self.parent_id,
             'teacher_id': self.teacher_id,
             'student_id': self.student_id
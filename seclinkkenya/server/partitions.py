@@ -0,0 +1,158 @@
+import re
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import PrimaryKeyConstraint, event, text
+from sqlalchemy.ext.compiler import compiles
+from models import Notifications
+from search import SEARCH_TABLES
+
+# Notifications are only ever added, so on PostgreSQL `notifications` is range-partitioned
+# by month of created_at: notifications_y2026m10 holds October 2026. Queries bounded on
+# created_at (the feed, /notifications) only read the months in range, and old months are
+# removed by detaching their partition instead of deleting rows.
+#   - Partitions are made NOTIFICATION_PARTITIONS_AHEAD months ahead, when the table is
+#     created and by `flask notification-partitions` (run it daily, e.g. from cron). Rows
+#     for a month without a partition go to notifications_default and are moved into their
+#     month's partition when it is made.
+#   - The same command detaches months older than NOTIFICATION_RETENTION_MONTHS and moves
+#     them to the `archive` schema (or drops them with --drop).
+# SQLite keeps a plain table.
+
+PARTITION_NAME = re.compile(r'notifications_y(\d{4})m(\d{2})')
+
+# pg_advisory_xact_lock key, so two runs don't create the same partition
+PARTITION_LOCK = 0x5ec11d
+
+
+# A partitioned table's primary key has to include the partition key. The ORM still
+# identifies notifications by id alone, which stays unique as it comes from one sequence.
+@compiles(PrimaryKeyConstraint, 'postgresql')
+def _notifications_primary_key(constraint, compiler, **kw):
+    if constraint.table is not Notifications.__table__:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    columns = [*constraint.columns, Notifications.__table__.c.created_at]
+    return 'CONSTRAINT %s PRIMARY KEY (%s)' % (
+        compiler.preparer.format_constraint(constraint),
+        ', '.join(compiler.preparer.quote(column.name) for column in columns))
+
+
+def month_of(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    month_index = month.month - 1 + months
+    return date(month.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'notifications_y{month.year}m{month.month:02d}'
+
+
+def upcoming_months(months_ahead):
+    this_month = month_of(datetime.utcnow())
+    return [add_months(this_month, i) for i in range(months_ahead + 1)]
+
+
+def include_in_migrations(name, type_, parent_names):
+    # For alembic autogenerate: partitions are made at runtime and the search index by
+    # search.py, not by migrations
+    return not (type_ == 'table' and (PARTITION_NAME.fullmatch(name) or name == 'notifications_default'
+                                      or name in SEARCH_TABLES))
+
+
+def setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+
+def recent_since():
+    # Lower bound on created_at for the hot paths, so they only read recent partitions
+    return datetime.utcnow() - timedelta(days=setting('NOTIFICATION_RECENT_DAYS', 90))
+
+
+## PostgreSQL partitions ##
+
+def is_partitioned(connection):
+    # `notifications` is looked up through the search_path, so this also works per school schema
+    return connection.dialect.name == 'postgresql' and connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('notifications'))"
+    )).scalar()
+
+
+def attached_partitions(connection):
+    # {first day of the month: partition name}
+    names = connection.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass('notifications')
+    """)).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.fullmatch(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return months
+
+
+def create_partition(connection, month):
+    name, bounds = partition_name(month), {'start': month, 'end': add_months(month, 1)}
+    # Bounds have to be literals; they are dates, so safe to format in
+    values = f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    in_default = connection.execute(text(
+        'SELECT EXISTS (SELECT 1 FROM notifications_default WHERE created_at >= :start AND created_at < :end)'
+    ), bounds).scalar()
+    if not in_default:
+        connection.execute(text(f'CREATE TABLE {name} PARTITION OF notifications {values}'))
+        return
+    # PostgreSQL refuses a partition whose rows are in the default one, so move them first
+    connection.execute(text(f'CREATE TABLE {name} (LIKE notifications INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    connection.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM notifications_default WHERE created_at >= :start AND created_at < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    connection.execute(text(f'ALTER TABLE notifications ATTACH PARTITION {name} {values}'))
+
+
+def create_partitions(connection, months):
+    # The default partition and any of `months` not there yet; returns the new partitions' names
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK})
+    connection.execute(text('CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT'))
+    attached = attached_partitions(connection)
+    created = []
+    for month in sorted(set(months)):
+        if month not in attached:
+            create_partition(connection, month)
+            created.append(partition_name(month))
+    return created
+
+
+def archive_partitions(connection, retention_months, drop=False):
+    # Detach the months that ended more than retention_months months ago; returns their names
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': PARTITION_LOCK})
+    cutoff = add_months(month_of(datetime.utcnow()), -retention_months)
+    schema = connection.execute(text('SELECT current_schema()')).scalar()
+    archived = []
+    for month, name in sorted(attached_partitions(connection).items()):
+        if add_months(month, 1) > cutoff:
+            continue
+        connection.execute(text(f'ALTER TABLE notifications DETACH PARTITION {name}'))
+        if drop:
+            connection.execute(text(f'DROP TABLE {name}'))
+        else:
+            # Schools share the archive schema, so a school schema's months are prefixed with its name
+            if schema != 'public':
+                connection.execute(text(f'ALTER TABLE {name} RENAME TO {schema}_{name}'))
+                name = f'{schema}_{name}'
+            connection.execute(text('CREATE SCHEMA IF NOT EXISTS archive'))
+            connection.execute(text(f'ALTER TABLE {name} SET SCHEMA archive'))
+        archived.append(name)
+    return archived
+
+
+# db.create_all() (seed.py, new school schemas) makes the partitioned table; add its partitions
+@event.listens_for(Notifications.__table__, 'after_create')
+def _create_partitions(target, connection, **kw):
+    if is_partitioned(connection):
+        create_partitions(connection, upcoming_months(setting('NOTIFICATION_PARTITIONS_AHEAD', 3)))
@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from extraction import extract
+from models import LearningMaterial, db
+from search import index_material
+from storage import get_storage
+from tenancy import current_school_id, school_scope
+
+# Post-upload processing of learning materials, off the request path: extract the text,
+# page count and a first-page preview, store them on the row, update the search index and
+# write the precompressed copies served by downloads.
+# Listings expose the results, so parents can decide before downloading a whole file.
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_CHARS = 500
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    # Created lazily, and again after a fork, since threads don't survive into gunicorn workers
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='materials')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit_material(material_id):
+    # Queue a material for processing once the upload request has committed it.
+    # MATERIAL_WORKERS = 0 processes it inline instead (handy for tests and scripts).
+    app = current_app._get_current_object()
+    workers = app.config.get('MATERIAL_WORKERS', 2)
+    if workers <= 0:
+        process_material(material_id)
+        return
+    _get_executor(workers).submit(_process_in_app_context, app, current_school_id(), material_id)
+
+
+def _process_in_app_context(app, school_id, material_id):
+    with app.app_context(), school_scope(school_id):
+        process_material(material_id)
+
+
+def process_material(material_id):
+    material = db.session.get(LearningMaterial, material_id)
+    if material is None:
+        return
+    try:
+        storage = get_storage()
+        # A local copy when the file is in object storage
+        with storage.local_path(material.file_path) as path:
+            extraction = extract(path)
+            material.file_size = os.path.getsize(path)
+            material.page_count = extraction.page_count
+            material.preview = preview_snippet(extraction.first_page)
+            material.processing_status = 'ready'
+            index_material(material, body=extraction.text)
+            storage.write_variants(material.file_path, path)
+    except Exception:
+        logger.exception('Could not process learning material %s', material_id)
+        db.session.rollback()
+        material = db.session.get(LearningMaterial, material_id)
+        if material is None:
+            return
+        material.processing_status = 'failed'
+    material.processed_at = datetime.utcnow()
+    db.session.commit()
+
+
+def preview_snippet(text):
+    # Collapse whitespace and cut at a word boundary
+    text = ' '.join(text.split())
+    if len(text) <= PREVIEW_CHARS:
+        return text
+    return text[:PREVIEW_CHARS].rsplit(' ', 1)[0] + '...'
@@ -0,0 +1,142 @@
+from datetime import datetime
+from sqlalchemy import case, delete, event, func, insert, inspect, literal, or_, select, tuple_
+from models import Class, Grade, Ranking, Student, db
+
+# Class rankings. A student's mean is the average points of their latest grade in each
+# subject (KCSE scale, A = 12 down to E = 1), and students are ranked on it, highest first,
+# equal means sharing a position (1, 2, 2, 4):
+#   - in their stream: the students of their class;
+#   - in their form: the students of every class with the same `form` in the school (a
+#     class without a form is a form of its own).
+# The percentile is the share of the form with a mean no higher than theirs (CUME_DIST),
+# so the top student is at 100.
+#
+# It is all worked out by the database with window functions, one INSERT ... SELECT per
+# refresh, into `rankings`. A flush that changes a grade, moves a student or changes a
+# class's form refreshes the forms it touched, in the same transaction; nothing else is
+# recomputed. `flask refresh-rankings` builds the lot, e.g. after migrating.
+
+POINTS = {'A': 12, 'A-': 11, 'B+': 10, 'B': 9, 'B-': 8, 'C+': 7, 'C': 6, 'C-': 5,
+          'D+': 4, 'D': 3, 'D-': 2, 'E': 1}
+GRADES = {points: grade for grade, points in POINTS.items()}
+
+
+def mean_grade(mean_points):
+    # The grade of a mean, rounded half up as KCSE does (7.5 is a B-)
+    return GRADES.get(int(mean_points + 0.5))
+
+
+def form_classes(connection, class_ids, forms=()):
+    # Every class ranked together with `class_ids`, plus those of the (school id, form) pairs
+    # in `forms` (for a class that just left a form)
+    class_ids = set(class_ids)
+    forms = set(forms)
+    if class_ids:
+        for class_id, school_id, form in connection.execute(
+                select(Class.id, Class.school_id, Class.form).where(Class.id.in_(class_ids))):
+            if form is not None:
+                forms.add((school_id, form))
+    if forms:
+        class_ids.update(connection.execute(
+            select(Class.id).where(tuple_(Class.school_id, Class.form).in_(forms))).scalars())
+    return class_ids
+
+
+def ranked(class_ids):
+    # SELECT of the rankings of the students of `class_ids`, whole forms at a time
+    points = case(POINTS, value=Grade.grade)
+    latest = (select(func.max(Grade.id))
+              .join(Student, Student.id == Grade.student_id)
+              .where(Student.class_id.in_(class_ids), Grade.grade.in_(POINTS))
+              .group_by(Grade.student_id, Grade.subject_id))
+    means = (select(Student.id.label('student_id'), Student.school_id, Student.class_id, Class.form,
+                    func.count().label('subjects'),
+                    (func.sum(points) * 1.0 / func.count()).label('mean_points'))
+             .join(Class, Class.id == Student.class_id)
+             .join(Grade, Grade.student_id == Student.id)
+             .where(Grade.id.in_(latest))
+             .group_by(Student.id, Student.school_id, Student.class_id, Class.form)
+             .subquery())
+
+    stream = {'partition_by': means.c.class_id}
+    form = {'partition_by': [means.c.school_id, means.c.form,
+                             case((means.c.form.is_(None), means.c.class_id))]}
+    highest_first = means.c.mean_points.desc()
+    return select(
+        means.c.student_id, means.c.school_id, means.c.class_id, means.c.form, means.c.subjects,
+        means.c.mean_points,
+        func.rank().over(order_by=highest_first, **stream).label('stream_position'),
+        func.count().over(**stream).label('stream_size'),
+        func.rank().over(order_by=highest_first, **form).label('form_position'),
+        func.count().over(**form).label('form_size'),
+        (func.cume_dist().over(order_by=means.c.mean_points, **form) * 100).label('percentile'),
+        literal(datetime.utcnow()).label('updated_at'))
+
+
+def refresh_rankings(connection, class_ids, forms=()):
+    # Recomputes the rankings of the forms of `class_ids` (and `forms`). Returns the number
+    # of students ranked.
+    class_ids = set(class_ids)
+    classes = form_classes(connection, class_ids, forms)
+    if not classes and not class_ids:
+        return 0
+    if classes and connection.dialect.name == 'postgresql':
+        # Two refreshes of one form wait for each other instead of both writing it
+        connection.execute(select(Class.id).where(Class.id.in_(classes)).order_by(Class.id).with_for_update())
+
+    # Classes deleted or gone from the form leave nothing behind either
+    connection.execute(delete(Ranking).where(or_(Ranking.class_id.in_(classes | class_ids),
+                                                 Ranking.student_id.in_(
+                                                     select(Student.id).where(Student.class_id.in_(classes))))))
+    if not classes:
+        return 0
+    statement = ranked(classes)
+    return connection.execute(insert(Ranking).from_select(
+        [column.name for column in statement.selected_columns], statement)).rowcount
+
+
+def refresh_all(session):
+    # Every ranking of the current school (or of every school without one)
+    class_ids = session.execute(select(Class.id)).scalars().all()
+    return refresh_rankings(session.connection(), class_ids)
+
+
+## Keeping rankings current ##
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_changed_rankings(session, flush_context):
+    class_ids, student_ids, forms = set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Grade):
+            if _changed(session, obj, 'grade', 'student_id', 'subject_id'):
+                student_ids.update(_values(obj, 'student_id'))
+        elif isinstance(obj, Student):
+            if _changed(session, obj, 'class_id'):
+                class_ids.update(_values(obj, 'class_id'))
+        elif isinstance(obj, Class):
+            if _changed(session, obj, 'form'):
+                class_ids.add(obj.id)
+                forms.update((obj.school_id, form) for form in _values(obj, 'form') if form is not None)
+    student_ids.discard(None)
+    class_ids.discard(None)
+    if not (class_ids or student_ids or forms):
+        return
+
+    connection = session.connection()
+    if student_ids:
+        class_ids.update(connection.execute(
+            select(Student.class_id).where(Student.id.in_(student_ids))).scalars())
+    refresh_rankings(connection, class_ids, forms)
+
+
+def _changed(session, obj, *attributes):
+    if obj in session.new or obj in session.deleted:
+        return True
+    state = inspect(obj)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+def _values(obj, attribute):
+    # Current and previous values, so a student moving class also re-ranks the one they left
+    history = inspect(obj).attrs[attribute].history
+    return set(history.added) | set(history.unchanged) | set(history.deleted)
@@ -0,0 +1,182 @@
+import logging
+import math
+import threading
+import time
+import zlib
+from functools import wraps
+from flask import current_app, jsonify, request
+
+# Token-bucket rate limiting for the expensive unauthenticated routes (/login, /signup,
+# password resets). A bucket holds up to `capacity` tokens and refills at `rate` tokens a
+# second; each request takes one. Limits are checked before the view runs, so a burst of
+# guesses is turned away with 429 before any password hashing happens.
+#
+# RATELIMIT_STORAGE_URL picks where buckets live:
+#   memory://            this process only (single worker, or limits per worker)
+#   redis://host:6379/0  shared by every worker and server (needs the `redis` package)
+#   fake://              an in-process stand-in for Redis, to run the shared code path locally
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    # '20/minute' -> (capacity 20, refilling 20 tokens per minute)
+    count, _, period = limit.partition('/')
+    if period not in PERIODS or not count.strip().isdigit() or int(count) < 1:
+        raise ValueError(f'Invalid rate limit {limit!r}, expected e.g. "20/minute"')
+    return int(count), int(count) / PERIODS[period]
+
+
+def take_token(tokens, updated, now, capacity, rate, cost=1):
+    # Returns (tokens left, allowed, seconds until `cost` tokens are available)
+    if tokens is None:
+        tokens, updated = capacity, now
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / rate
+
+
+## Stores ##
+
+class MemoryStore:
+    # Buckets in this process, split over shards so concurrent requests rarely share a lock
+    def __init__(self, shards=16, sweep_every=1000):
+        self.shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.sweep_every = sweep_every
+        self._operations = 0
+
+    def consume(self, key, capacity, rate, cost=1):
+        buckets, lock = self.shards[zlib.crc32(key.encode()) % len(self.shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.get(key, (None, None))[:2]
+            tokens, allowed, retry_after = take_token(tokens, updated, now, capacity, rate, cost)
+            buckets[key] = (tokens, now, capacity, rate)
+            self._operations += 1
+            if self._operations % self.sweep_every == 0:
+                self._sweep(buckets, now)
+        return allowed, retry_after
+
+    def _sweep(self, buckets, now):
+        # Forget buckets that have refilled; they behave exactly like a new bucket
+        for key, (tokens, updated, capacity, rate) in list(buckets.items()):
+            if tokens + (now - updated) * rate >= capacity:
+                del buckets[key]
+
+
+# Runs atomically on the Redis server, using its clock so every worker agrees on time
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class SharedStore:
+    # Buckets in Redis (or anything with redis-py's `eval`), shared by all workers.
+    # If the server can't be reached, limits fall back to this process for a few seconds
+    # rather than locking everyone out or waiting on a dead connection every request.
+    def __init__(self, client, prefix='ratelimit:', retry_interval=5):
+        self.client = client
+        self.prefix = prefix
+        self.retry_interval = retry_interval
+        self.fallback = MemoryStore()
+        self._retry_at = 0.0
+
+    def consume(self, key, capacity, rate, cost=1):
+        if time.monotonic() < self._retry_at:
+            return self.fallback.consume(key, capacity, rate, cost)
+        try:
+            allowed, retry_after = self.client.eval(TOKEN_BUCKET_SCRIPT, 1, self.prefix + key, capacity, rate, cost)
+        except Exception as e:
+            logger.warning('Rate limit store unavailable (%s), using per-process limits for %ss', e, self.retry_interval)
+            self._retry_at = time.monotonic() + self.retry_interval
+            return self.fallback.consume(key, capacity, rate, cost)
+        return bool(int(allowed)), float(retry_after)
+
+
+class FakeRedis:
+    # Just enough of a Redis client to run SharedStore in one process, without a server
+    def __init__(self):
+        self.memory = MemoryStore(shards=1)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        if script != TOKEN_BUCKET_SCRIPT:
+            raise NotImplementedError('FakeRedis only runs the token bucket script')
+        key, capacity, rate, cost = keys_and_args
+        allowed, retry_after = self.memory.consume(key, capacity, rate, cost)
+        return [int(allowed), str(retry_after)]
+
+
+def create_store(url):
+    if url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith('fake://'):
+        return SharedStore(FakeRedis())
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        import redis  # only needed for a shared store
+        return SharedStore(redis.Redis.from_url(url, socket_timeout=0.5))
+    raise ValueError(f'Unsupported RATELIMIT_STORAGE_URL {url!r}')
+
+
+def init_rate_limiting(app):
+    app.extensions['ratelimit'] = create_store(app.config.get('RATELIMIT_STORAGE_URL', 'memory://'))
+
+
+## Decorator ##
+
+def client_ip():
+    # Behind a reverse proxy, wrap the app in werkzeug's ProxyFix so this is the client's address
+    return request.remote_addr or 'unknown'
+
+
+def json_field(name):
+    def key():
+        value = (request.get_json(silent=True) or {}).get(name)
+        return value.strip().lower() if isinstance(value, str) and value.strip() else None
+    return key
+
+
+def rate_limit(scope, **limits):
+    # limits: bucket name -> (config key holding e.g. '20/minute', function returning the
+    # bucket's key for this request, or None to skip it). Buckets are taken in order and
+    # the first empty one rejects the request.
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            store = current_app.extensions.get('ratelimit')
+            if store is None or not current_app.config.get('RATELIMIT_ENABLED', True):
+                return f(*args, **kwargs)
+            for name, (config_key, key_function) in limits.items():
+                key = key_function()
+                if key is None:
+                    continue
+                capacity, rate = parse_limit(current_app.config[config_key])
+                allowed, retry_after = store.consume(f'{scope}:{name}:{key}', capacity, rate)
+                if not allowed:
+                    response = jsonify({'message': 'Too many requests. Please try again later.'})
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response, 429
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
@@ -0,0 +1,95 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+from itertools import starmap
+from sqlalchemy import func, select
+from models import LearningMaterial, Notifications, Student, db
+from partitions import recent_since
+
+# Read models for the list endpoints. Loading a model object per row (identity map, change
+# tracking, relationship loaders) only to turn it into a dict right away is most of the cost
+# of a long list, so these select just the columns the response has and keep each row in a
+# small dataclass. They are encoded as JSON objects like to_dict() output (orjson encodes
+# dataclasses natively, see serialization.py). Not slots=True: orjson encodes slotted
+# dataclasses about 3x slower, which costs more than the few MiB per 100k rows they save.
+#
+# The statements are run through db.session, so they are still scoped to the request's
+# school (tenancy.py). The rows are not ORM objects: nothing is tracked or lazy loaded.
+
+
+@dataclass
+class StudentRow:
+    id: int
+    name: str
+    dob: str
+    class_id: int
+    teacher_id: int
+    parent_id: int
+    overall_grade: str | None
+
+
+@dataclass
+class NotificationRow:
+    id: int
+    message: str
+    created_at: datetime
+    updated_at: datetime | None
+    read_at: datetime | None
+    parent_id: int
+
+
+@dataclass
+class LearningMaterialRow:
+    id: int
+    title: str
+    file_path: str
+    upload_date: datetime
+    teacher_id: int
+    student_id: int
+    subject_id: int | None
+    processing_status: str
+    file_size: int | None
+    page_count: int | None
+    preview: str | None
+
+
+def select_rows(row_class, model):
+    # SELECT of the row class's columns; add where/order_by/limit, then fetch()
+    return select(*(getattr(model, field.name) for field in fields(row_class)))
+
+
+def fetch(row_class, statement):
+    return list(starmap(row_class, db.session.execute(statement).tuples()))
+
+
+def student_rows():
+    return fetch(StudentRow, select_rows(StudentRow, Student).order_by(Student.id))
+
+
+def notification_rows(parent_id, since, before=None, limit=50):
+    # Newest first; `before` (an id) for the next page
+    statement = (select_rows(NotificationRow, Notifications)
+                 .where(Notifications.parent_id == parent_id, Notifications.created_at >= since))
+    if before:
+        statement = statement.where(Notifications.id < before)
+    return fetch(NotificationRow, statement.order_by(Notifications.id.desc()).limit(limit))
+
+
+## Long polls of notifications; statements, as the async path (asyncapp.py) runs them too ##
+# The async path doesn't go through db.session, so these filter by school themselves
+
+def notifications_after(parent_id, school_id, after, limit=200):
+    # Oldest first: the ones a client that has up to `after` (an id) hasn't seen
+    return (select_rows(NotificationRow, Notifications)
+            .where(Notifications.parent_id == parent_id, Notifications.school_id == school_id,
+                   Notifications.id > after, Notifications.created_at >= recent_since())
+            .order_by(Notifications.id).limit(limit))
+
+
+def latest_notification_id(parent_id, school_id):
+    return (select(func.max(Notifications.id))
+            .where(Notifications.parent_id == parent_id, Notifications.school_id == school_id,
+                   Notifications.created_at >= recent_since()))
+
+
+def learning_material_rows():
+    return fetch(LearningMaterialRow, select_rows(LearningMaterialRow, LearningMaterial).order_by(LearningMaterial.id))
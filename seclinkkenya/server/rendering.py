@@ -0,0 +1,51 @@
+import hashlib
+import os
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+# Report card rendering. Runs in the report card process pool (see reportcards.py), so it
+# works on plain dicts and imports nothing from the app or the database: spawned workers
+# start quickly. fpdf2 is only needed for PDFs.
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+TEMPLATES = {'html': 'report_card.html', 'pdf': 'report_card_body.html'}
+
+_environment = None
+
+
+def environment():
+    global _environment
+    if _environment is None:
+        _environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(['html']))
+    return _environment
+
+
+def template_version():
+    # Changes whenever a template does, so cached cards are re-rendered after a redesign
+    digest = hashlib.sha256()
+    for name in sorted(set(TEMPLATES.values())):
+        with open(os.path.join(TEMPLATE_DIR, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def render_card(card, fmt):
+    if fmt == 'html':
+        return environment().get_template(TEMPLATES['html']).render(card=card).encode('utf-8')
+
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font('helvetica', size=11)
+    # The built-in PDF fonts only cover Latin-1
+    pdf.write_html(environment().get_template(TEMPLATES['pdf']).render(card=_latin1(card)))
+    return bytes(pdf.output())
+
+
+def _latin1(value):
+    if isinstance(value, str):
+        return value.encode('latin-1', 'replace').decode('latin-1')
+    if isinstance(value, dict):
+        return {key: _latin1(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_latin1(item) for item in value]
+    return value
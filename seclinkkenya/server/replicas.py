@@ -0,0 +1,94 @@
+import itertools
+import threading
+import time
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+# Read-replica routing. Reads made while handling a GET/HEAD request go to one of the
+# replicas in Config.SQLALCHEMY_REPLICA_URIS; writes, other requests, CLI commands and
+# clients that wrote in the last few seconds (see PIN_COOKIE) use the primary.
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'seclink_primary_pin'
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything it received
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+class ReplicaSet:
+    def __init__(self, engines, max_lag, check_interval):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(self.replicas)
+
+    # Next healthy replica in round-robin order, or None to fall back to the primary
+    def choose(self):
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if self.is_available(replica):
+                return replica.engine
+        return None
+
+    def is_available(self, replica):
+        # Re-check at most every check_interval seconds, from one thread at a time
+        if time.monotonic() - replica.checked_at >= self.check_interval and replica.lock.acquire(blocking=False):
+            try:
+                replica.healthy = self.check(replica.engine)
+                replica.checked_at = time.monotonic()
+            finally:
+                replica.lock.release()
+        return replica.healthy
+
+    def check(self, engine):
+        try:
+            with engine.connect() as conn:
+                if engine.dialect.name == 'postgresql':
+                    lag = conn.execute(LAG_QUERY).scalar()
+                    return lag is None or lag <= self.max_lag
+                conn.execute(text('SELECT 1'))
+            return True
+        except Exception:
+            return False
+
+    # Called when a query on a replica fails; it stays out of rotation until the next check
+    def mark_down(self, engine):
+        for replica in self.replicas:
+            if replica.engine is engine:
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+
+
+def reads_from_replica(session):
+    if 'replicas' not in current_app.extensions or session.info.get('wrote'):
+        return False
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    try:
+        pinned_until = float(request.cookies.get(PIN_COOKIE, 0))
+    except ValueError:
+        pinned_until = 0
+    return pinned_until < time.time()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and reads_from_replica(self):
+            engine = current_app.extensions['replicas'].choose()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from flask import current_app
+from sqlalchemy import func, select
+from werkzeug.utils import secure_filename
+from models import Class, Grade, School, Student, Subject, db
+from rendering import render_card, template_version
+
+# Report cards: one per student with the latest grade per subject and the overall grade.
+# Data for a whole class or school is loaded in four queries; rendering (the slow part)
+# runs in a process pool. Rendered cards are cached on disk under a fingerprint of
+# everything shown on them, so a card is only re-rendered after its grades (or the
+# template) change, and a stale card can never be served.
+
+FORMATS = {'html': 'text/html', 'pdf': 'application/pdf'}
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+## Data ##
+
+def load_cards(term='', class_id=None, student_id=None):
+    conditions = []
+    if class_id is not None:
+        conditions.append(Student.class_id == class_id)
+    if student_id is not None:
+        conditions.append(Student.id == student_id)
+    students = Student.query.filter(*conditions).order_by(Student.class_id, Student.name, Student.id).all()
+    if not students:
+        return []
+
+    class_names = dict(db.session.query(Class.id, Class.class_name)
+                       .filter(Class.id.in_({student.class_id for student in students})))
+
+    # Latest grade per student and subject, as on the parent feed
+    latest = (select(func.max(Grade.id))
+              .join(Student, Grade.student_id == Student.id)
+              .where(*conditions)
+              .group_by(Grade.student_id, Grade.subject_id))
+    grades = {}
+    for student, grade, subject, code in (db.session.query(Grade.student_id, Grade.grade, Subject.subject_name,
+                                                           Subject.subject_code)
+                                          .join(Subject, Grade.subject_id == Subject.id)
+                                          .filter(Grade.id.in_(latest))
+                                          .order_by(Grade.student_id, Subject.subject_name)):
+        grades.setdefault(student, []).append({'subject': subject, 'code': code, 'grade': grade})
+
+    schools = dict(db.session.query(School.id, School.name)
+                   .filter(School.id.in_({student.school_id for student in students})))
+    return [{
+        'school': schools.get(student.school_id) or current_app.config.get('SCHOOL_NAME', ''),
+        'term': term,
+        'student': {'id': student.id, 'name': student.name, 'dob': student.dob},
+        'class_name': class_names.get(student.class_id),
+        'overall_grade': student.overall_grade,
+        'grades': grades.get(student.id, []),
+    } for student in students]
+
+
+def fingerprint(card, fmt, version):
+    data = json.dumps([version, fmt, card], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def card_filename(card, fmt):
+    name = secure_filename(f"{card['student']['name']}-{card['student']['id']}") or str(card['student']['id'])
+    folder = secure_filename(card['class_name'] or '') or 'no-class'
+    return f'{folder}/{name}.{fmt}'
+
+
+## Cache ##
+
+class CardCache:
+    # Rendered cards on disk, named by fingerprint. Entries never go stale (a changed card
+    # has a new fingerprint); old ones are removed by `flask purge-report-cards`.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, f'{key}.{fmt}')
+
+    def get(self, key, fmt):
+        try:
+            with open(self.path(key, fmt), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(self.path(key, fmt))  # mark as recently used for the purge
+        return data
+
+    def put(self, key, fmt, data):
+        # Write then rename, so a concurrent reader never sees half a file
+        temporary = f'{self.path(key, fmt)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, self.path(key, fmt))
+
+
+def get_cache():
+    return CardCache(current_app.config.get('REPORT_CARD_CACHE_DIR')
+                     or os.path.join(current_app.instance_path, 'report_cards'))
+
+
+## Rendering ##
+
+def _get_pool(workers):
+    # spawn, not fork: forking a multi-threaded gunicorn worker is unsafe
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def render_cards(cards, fmt, cache, workers):
+    # Yields (card, rendered bytes) in the order given, rendering cache misses in parallel
+    version = template_version()
+    keys = [fingerprint(card, fmt, version) for card in cards]
+    cached = [cache.get(key, fmt) for key in keys]
+    misses = [card for card, data in zip(cards, cached) if data is None]
+    if len(misses) > 1 and workers > 1:
+        chunksize = max(1, len(misses) // (workers * 4))
+        rendered = _get_pool(workers).map(render_card, misses, repeat(fmt), chunksize=chunksize)
+    else:
+        rendered = map(render_card, misses, repeat(fmt))
+
+    for card, key, data in zip(cards, keys, cached):
+        if data is None:
+            data = next(rendered)
+            cache.put(key, fmt, data)
+        yield card, data
+
+
+## ZIP streaming ##
+
+class _Chunks:
+    # A write-only "file" for ZipFile; each finished entry is handed on and forgotten,
+    # so the archive is sent while it is being built rather than assembled in memory
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def zip_cards(rendered, fmt):
+    # PDFs are compressed already, so only HTML is deflated
+    compress_type = zipfile.ZIP_DEFLATED if fmt == 'html' else zipfile.ZIP_STORED
+    date_time = datetime.now().timetuple()[:6]
+    out = _Chunks()
+    with zipfile.ZipFile(out, 'w') as archive:
+        for card, data in rendered:
+            info = zipfile.ZipInfo(card_filename(card, fmt), date_time=date_time)
+            info.compress_type = compress_type
+            archive.writestr(info, data)
+            yield out.take()
+    yield out.take()
@@ -0,0 +1,31 @@
+import importlib
+
+# Route modules registered by the app factory, each exposing a `bp` blueprint.
+# They are imported when the app is created, not when this package is imported.
+BLUEPRINT_MODULES = [
+    'routes.home',
+    'routes.auth',
+    'routes.school',
+    'routes.passwordreset',
+    'routes.student',
+    'routes.learningmaterial',
+    'routes.learningmaterialdownload',
+    'routes.search',
+    'routes.notification',
+    'routes.feed',
+    'routes.reportcard',
+    'routes.attendance',
+    'routes.timetable',
+    'routes.ranking',
+    'routes.class1',
+    'routes.subject',
+    'routes.sync',
+    'routes.audit',
+    'routes.batch',
+]
+
+
+def register_blueprints(app):
+    for module_name in BLUEPRINT_MODULES:
+        module = importlib.import_module(module_name)
+        app.register_blueprint(module.bp)
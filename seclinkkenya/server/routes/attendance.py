@@ -0,0 +1,85 @@
+from flask import Blueprint, jsonify, request
+from models import Parent, Student, Teacher, db
+from routes.utils import token_required
+from attendance import (class_attendance, class_roll_calls, parse_date, record_roll_calls, roll_call_dict,
+                        register_students, student_attendance)
+
+bp = Blueprint('attendance', __name__)
+
+
+def term_dates():
+    # (from, to) of the query string, both required and inclusive, e.g. a term's first and last day
+    start = parse_date(request.args.get('from'), 'from')
+    end = parse_date(request.args.get('to'), 'to')
+    if end < start:
+        raise ValueError('to must not be before from')
+    return start, end
+
+
+## Roll calls (teachers) ##
+@bp.route('/attendance', methods=['POST'])
+@token_required
+def submit_attendance(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can take attendance.'}), 403
+
+    # One roll call, or {"roll_calls": [...]} for several (e.g. a day's lessons sent at once)
+    data = request.get_json(silent=True)
+    roll_calls = data.get('roll_calls', [data]) if isinstance(data, dict) else None
+    if not isinstance(roll_calls, list) or not roll_calls:
+        return jsonify({'message': 'Send a roll call, or a list of them as roll_calls'}), 400
+    try:
+        rows = record_roll_calls(roll_calls, current_user.id)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    db.session.commit()
+
+    registers = {}
+    for row in rows:
+        if row.class_id not in registers:
+            registers[row.class_id] = register_students(row.class_id)
+    return jsonify({
+        'message': 'Attendance recorded',
+        'roll_calls': [roll_call_dict(row, registers[row.class_id]) for row in rows],
+    }), 200
+
+
+@bp.route('/attendance/classes/<int:class_id>', methods=['GET'])
+@token_required
+def get_roll_calls(current_user, class_id):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        day = parse_date(request.args.get('date'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(class_roll_calls(class_id, day)), 200
+
+
+## Absence rates over a period: a class (teachers), a student (teachers, or the student's parent) ##
+@bp.route('/attendance/classes/<int:class_id>/summary', methods=['GET'])
+@token_required
+def class_summary(current_user, class_id):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        start, end = term_dates()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(class_attendance(class_id, start, end, request.args.get('subject_id', type=int))), 200
+
+
+@bp.route('/attendance/students/<int:student_id>', methods=['GET'])
+@token_required
+def student_summary(current_user, student_id):
+    student = db.session.get(Student, student_id)
+    if student is None:
+        return jsonify({'message': 'Student not found'}), 404
+    if isinstance(current_user, Parent) and student.parent_id != current_user.id:
+        return jsonify({'message': 'Unauthorized. You can only view your own children.'}), 403
+    try:
+        start, end = term_dates()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(student_attendance(student_id, start, end)), 200
@@ -0,0 +1,51 @@
+from datetime import datetime
+from flask import Blueprint, jsonify, request
+from models import AuditLog, Teacher
+from routes.utils import token_required
+
+bp = Blueprint('audit', __name__)
+
+
+def parse_time(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+## Audit trail, newest first (teachers only) ##
+@bp.route('/audit-log', methods=['GET'])
+@token_required
+def audit_log(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can view the audit log.'}), 403
+
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+    try:
+        since, until = parse_time('since'), parse_time('until')
+    except ValueError:
+        return jsonify({'message': 'since and until must be ISO 8601 dates, e.g. 2025-01-31T08:00:00'}), 400
+
+    query = AuditLog.query
+    for name in ('table_name', 'action', 'actor_type'):
+        if request.args.get(name):
+            query = query.filter(getattr(AuditLog, name) == request.args[name])
+    for name in ('row_id', 'actor_id'):
+        if request.args.get(name, type=int) is not None:
+            query = query.filter(getattr(AuditLog, name) == request.args.get(name, type=int))
+    if since:
+        query = query.filter(AuditLog.created_at >= since)
+    if until:
+        query = query.filter(AuditLog.created_at < until)
+
+    # Pages follow on from the last id seen rather than counting rows, so deep pages
+    # of a large table stay as cheap as the first
+    before = request.args.get('before', type=int)
+    if before:
+        query = query.filter(AuditLog.id < before)
+    entries = query.order_by(AuditLog.id.desc()).limit(per_page + 1).all()
+
+    has_more = len(entries) > per_page
+    entries = entries[:per_page]
+    return jsonify({
+        'entries': [entry.to_dict() for entry in entries],
+        'next_before': entries[-1].id if has_more else None,
+    }), 200
@@ -1,79 +1,145 @@
-# from flask import request, session, jsonify, current_app as app
-# from flask_restful import Resource
-# import jwt
-# from seclinkkenya.server.models import Teacher, Parent, User, db
-# from routes.utils import login_required 
-# from flask_bcrypt import Bcrypt # type: ignore
-# import datetime
-
-# bcrypt = Bcrypt()
-
-# class Signup(Resource):
-#     def post(self):
-#         data = request.get_json()
-#         username = data.get('username')
-#         password = data.get('password')
-#         role = data.get('role')
-
-#         if role == 'teacher':
-#             new_user = Teacher(username=username)
-#         elif role == 'parent':
-#             new_user = Parent(username=username)
-#         else:
-#             return jsonify({'message': 'Invalid role.'}), 400
-
-#         # Hash the password before storing
-#         hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-#         new_user.password = hashed_password
-
-#         # Add the new user to the database
-#         db.session.add(new_user)
-#         db.session.commit()
-
-#         return jsonify({'message': f'{role.capitalize()} registered successfully.'}), 201
-
-# class Login(Resource):
-#     def post(self):
-#         data = request.get_json()
-#         username = data.get('username')
-#         password = data.get('password')
-
-#         user = User.query.filter_by(username=username).first()
-
-#         if user and bcrypt.check_password_hash(user.password, password):
-#             session['user_id'] = user.id
-#             session['role'] = user.role  # Store user role in session
-
-#             # Generate a JWT token for authentication
-#             token = jwt.encode(
-#                 {"user_id": user.id, "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=1)},
-#                 app.config['SECRET_KEY'],
-#                 algorithm="HS256"
-#             )
-
-#             return jsonify({
-#                 'id': user.id,
-#                 'username': user.username,
-#                 'role': user.role,
-#                 'token': token
-#             }), 200
+import os
+import base64
+import logging
+from datetime import datetime, timedelta
+import jwt
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import get_jwt, jwt_required
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import db, Teacher, Parent
+from ratelimit import client_ip, json_field, rate_limit
+from tenancy import any_school, default_school_id, enter_school, school_by_code
+
+bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
+
+
+## Signing key ##
+# Tokens are signed with JWT_SECRET_KEY (SECRET_KEY in the environment), so they are accepted
+# by every worker and server and survive restarts. Without it, only development (FLASK_ENV=
+# development) starts, with a key of this process that no other process accepts.
+def init_secret_key(app):
+    if app.config.get('JWT_SECRET_KEY'):
+        return
+    if app.config.get('FLASK_ENV') != 'development':
+        raise RuntimeError('SECRET_KEY is not set. Set it to the same random value on every server '
+                           '(e.g. python -c "import secrets; print(secrets.token_urlsafe(32))").')
+    logger.warning('SECRET_KEY is not set; tokens will only be accepted by this process')
+    app.config['JWT_SECRET_KEY'] = base64.b64encode(os.urandom(24)).decode('utf-8')
+
+
+def secret_key():
+    return current_app.config['JWT_SECRET_KEY']
+
+
+# Signup Endpoint
+@bp.route('/signup', methods=['POST'])
+@rate_limit('signup', ip=('RATELIMIT_SIGNUP_IP', client_ip))
+def signup():
+    data = request.get_json()
+
+    # Extract the fields from the request data
+    name = data.get('name')
+    username = data.get('username')
+    password = data.get('password')  # Raw password from request
+    email = data.get('email')
+    subject = data.get('subject')  # Subject is only used if the user is a teacher
+    role = data.get('role')  # Either 'Teacher' or 'Parent'
+
+    # Check if all required fields are provided
+    if not all([name, username, password, email, role]):
+        return jsonify({'message': 'All fields are required'}), 400
+
+    # The school's code; without one, the user joins the default school
+    school = school_by_code(data.get('school'))
+    if data.get('school') and not school:
+        return jsonify({'message': 'Unknown school'}), 400
+    school_id = school.id if school else default_school_id()
+    enter_school(school_id)
+
+    # Hash the password using bcrypt
+    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+
+    # Handle role-based registration
+    if role.lower() == 'teacher':
+        # Check if the subject is provided for the Teacher role
+        if not subject:
+            return jsonify({'message': 'Subject is required for Teacher role'}), 400
         
-#         return jsonify({'error': 'Invalid credentials'}), 401
-
-# class CheckSession(Resource):
-#     @login_required
-#     def get(self):
-#         user_id = session.get('user_id')
-#         user = User.query.get(user_id)
-#         if user:
-#             return {'id': user.id, 'username': user.username, 'role': user.role}, 200  # Include role in response
-#         return jsonify({'error': 'User not found'}), 404
-    
-# class Logout(Resource):
-#     def delete(self):
-#         if session.get('user_id') is None:
-#             return jsonify({'error': 'Unauthorized'}), 401  # Return 401 when no active session
-#         session.pop('user_id', None)
-#         session.pop('role', None)  # Remove the role from session
-#         return {}, 204
+        # Create a new Teacher user
+        new_user = Teacher(name=name, username=username, email=email, password=hashed_password, subject=subject)
+
+    elif role.lower() == 'parent':
+        # Create a new Parent user
+        new_user = Parent(name=name, username=username, email=email, password=hashed_password)
+
+    else:
+        return jsonify({'message': 'Invalid role'}), 400
 
+    # Add the new user to the database
+    db.session.add(new_user)
+    db.session.commit()
+
+    # Return success message
+    return jsonify({'message': 'User registered successfully'}), 201
+
+
+# Login Endpoint
+@bp.route('/login', methods=['POST'])
+@rate_limit('login', ip=('RATELIMIT_LOGIN_IP', client_ip), username=('RATELIMIT_LOGIN_USERNAME', json_field('username')))
+def login():
+    data = request.get_json()
+
+    # Ensure required fields are present
+    username = data.get('username')
+    password = data.get('password')
+
+    if not all([username, password]):
+        return jsonify({"message": "Missing required fields"}), 400
+
+    # Usernames are unique per school; `school` (its code) picks one when several schools have it
+    filters = {'username': username}
+    if data.get('school'):
+        school = school_by_code(data['school'])
+        if not school:
+            return jsonify({"message": "Invalid credentials"}), 401
+        filters['school_id'] = school.id
+        enter_school(school.id)
+
+    # Query both Teacher and Parent tables for the user (in every school, without a code)
+    with any_school():
+        users = Teacher.query.filter_by(**filters).limit(2).all() + Parent.query.filter_by(**filters).limit(2).all()
+    if len(users) > 1:
+        return jsonify({"message": "Several schools have this username. Please include your school's code."}), 400
+    user = users[0] if users else None
+
+    if user and check_password_hash(user.password, password):   
+        expiration_time = datetime.utcnow() + timedelta(hours=3)
+        
+        # The role tells token_required which table user_id refers to; school_id scopes every request
+        token = jwt.encode({'user_id': user.id, 'role': type(user).__name__, 'school_id': user.school_id,
+                            'exp': expiration_time}, secret_key(), algorithm='HS256')
+        
+        return jsonify({'token': token, 'message': 'Login Successful'}), 200
+    else:
+        return jsonify({"message": "Invalid credentials"}), 401  # If username or password is incorrect
+
+
+# Token decoding helper function
+def decode_token(token):
+    try:
+        payload = jwt.decode(token, secret_key(), algorithms=['HS256'])
+        return payload
+    except jwt.ExpiredSignatureError:
+        return {'message': 'Token has expired'}, 401  # Token expired
+    except jwt.InvalidTokenError:
+        return {'message': 'Invalid token'}, 401  # Invalid token
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required()  # Ensure the user is logged in
+def logout():
+    # Here we can optionally blacklist the token or just return a success message
+    jti = get_jwt()["jti"]  # JWT ID (jti) is unique identifier for the token
+    
+    
+    return jsonify({"message": "Logged out successfully"}), 200
@@ -0,0 +1,85 @@
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+from models import db
+
+bp = Blueprint('batch', __name__)
+
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+# Headers passed on from the batch request to each sub-request
+FORWARDED_HEADERS = ['Authorization', 'Cookie', 'Accept-Language']
+
+
+## Run several API requests in one HTTP round trip ##
+# Body: {"requests": [{"method": "GET", "path": "/students"}, {"method": "POST", "path": "/add-student", "body": {...}}]}
+# Sub-requests run in order, inside this request's app context, so they share one database
+# session and one token check. Each one commits (or fails) on its own, as it would standalone.
+@bp.route('/batch', methods=['POST'])
+def batch():
+    max_bytes = current_app.config.get('BATCH_MAX_BYTES', 1024 * 1024)
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'message': f'Batch body is larger than {max_bytes} bytes'}), 413
+
+    data = request.get_json(silent=True) or {}
+    sub_requests = data.get('requests')
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({'message': 'requests must be a non-empty list'}), 400
+
+    max_requests = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+    if len(sub_requests) > max_requests:
+        return jsonify({'message': f'A batch can hold at most {max_requests} requests'}), 400
+
+    # Validate everything up front, so a bad entry doesn't leave half a batch applied
+    for index, sub_request in enumerate(sub_requests):
+        error = validate_sub_request(sub_request)
+        if error:
+            return jsonify({'message': f'Request {index}: {error}'}), 400
+
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    return jsonify({'responses': [dispatch(sub_request, headers) for sub_request in sub_requests]}), 200
+
+
+def validate_sub_request(sub_request):
+    if not isinstance(sub_request, dict):
+        return 'must be an object'
+    if str(sub_request.get('method', 'GET')).upper() not in BATCH_METHODS:
+        return f"method must be one of {', '.join(sorted(BATCH_METHODS))}"
+    path = sub_request.get('path')
+    if not isinstance(path, str) or not path.startswith('/'):
+        return 'path must start with /'
+    if path.split('?', 1)[0].rstrip('/') == '/batch':
+        return 'batches cannot be nested'
+    return None
+
+
+def dispatch(sub_request, headers):
+    app = current_app._get_current_object()
+    builder = EnvironBuilder(
+        path=sub_request['path'],
+        method=str(sub_request.get('method', 'GET')).upper(),
+        headers=headers,
+        json=sub_request.get('body'),
+        base_url=request.host_url,
+        # Same client address, so per-IP rate limits can't be dodged by batching
+        environ_overrides={'REMOTE_ADDR': request.remote_addr},
+    )
+    # Pushing a request context onto the current app context keeps g and db.session shared
+    with app.request_context(builder.get_environ()):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as e:
+            db.session.rollback()
+            response = app.make_response(app.handle_exception(e))
+        # Discard what the sub-request left uncommitted, e.g. a change made before it answered
+        # with an error, or the next sub-request's commit would save it. Committed work stays.
+        db.session.rollback()
+        result = {'status': response.status_code, 'body': response_body(response)}
+        response.close()
+    return result
+
+
+def response_body(response):
+    if response.is_json:
+        return response.get_json()
+    if response.mimetype.startswith('text/'):
+        return response.get_data(as_text=True)
+    return None  # files and other binary bodies must be fetched on their own
@@ -1,20 +1,114 @@
-# from flask import jsonify
-# from flask_restful import Resource
-# from models import Class,  db
-# from routes.utils import token_required, login_required  # type: ignore
-
-
-# class Class(Resource):
-#     @token_required 
-#     @login_required
-#     def get(self, class_id=None):
-#         if class_id:
-#             # Fetch the class by class_id
-#             class_obj = Class.query.get(class_id)
-#             if not class_obj:
-#                 return jsonify({'message': 'Class not found.'}), 404
-#             return jsonify(class_obj.to_dict()), 200
-#         else:
-#             # Fetch all classes if no class_id is provided
-#             classes = Class.query.all()
-#             return jsonify([class_obj.to_dict() for class_obj in classes]), 200
+from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+from models import Class, Subject, Teacher, db
+from routes.utils import token_required
+from tenancy import in_school
+
+bp = Blueprint('class1', __name__)
+
+
+##  Route To Manage Classes ##
+
+@bp.route('/class', methods=['POST'])
+@token_required
+def add_class(current_user):
+    # Teachers only: a class's form decides who its students are ranked against
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can create classes.'}), 403
+    data = request.get_json()
+
+    # Extract the fields from the request data
+    class_name = data.get('class_name')
+    teacher_id = data.get('teacher_id')
+    form = data.get('form')  # optional: the form this stream belongs to, e.g. 2
+
+    # Check if all required fields are provided
+    if not all([class_name, teacher_id]):
+        return jsonify({'message': 'All fields are required'}), 400
+    if form is not None and (not isinstance(form, int) or isinstance(form, bool) or form < 1):
+        return jsonify({'message': 'form must be a positive whole number'}), 400
+
+    # Check if the teacher exists in this school
+    try:
+        teacher = in_school(Teacher, teacher_id)
+    except SQLAlchemyError as e:
+        return jsonify({'message': 'Database lookup failed', 'error': str(e)}), 500
+
+    if not teacher:
+        return jsonify({'message': f'Teacher with id {teacher_id} not found'}), 404
+
+    # Create a new Class
+    new_class = Class(
+        class_name=class_name,
+        teacher_id=teacher_id,
+        form=form,
+    )
+
+    #Add the new class to the database with error handling
+    try:
+        db.session.add(new_class)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to create a class', 'error': str(e)}), 500
+
+    return jsonify({'message': 'Class created successfully', 'class': new_class.to_dict()}), 201
+
+    # #Return success message
+    # return jsonify({'message': 'Class created successfully'}), 200
+    # elif request.method == 'PUT':
+    #     # Handle class update
+    #     class_id = request.args.get('class_id')
+    #     if not class_id:
+    #         return jsonify({'message': 'Class ID is required for update'}), 400
+
+    #     class_to_update = Class.query.get_or_404(class_id)
+
+    #     # Ensure that the teacher who created the class or an Admin is updating
+    #     if class_to_update.teacher_id != identity['id'] and identity['role'] != 'Admin':
+    #         return jsonify({'message': 'Unauthorized to update this class'}), 403
+
+    #     data = request.get_json()
+    #     class_name = data.get('class_name')
+    #     if class_name:
+    #         class_to_update.class_name = class_name
+
+    #     db.session.commit()
+    #     return jsonify({'message': 'Class updated successfully', 'class': class_to_update.to_dict()}), 200
+
+    # elif request.method == 'DELETE':
+    #     # Handle class deletion
+    #     class_id = request.args.get('class_id')
+    #     if not class_id:
+    #         return jsonify({'message': 'Class ID is required for deletion'}), 400
+
+    #     class_to_delete = Class.query.get_or_404(class_id)
+
+    #     # Ensure that the teacher who created the class or an Admin is deleting
+    #     if class_to_delete.teacher_id != identity['id'] and identity['role'] != 'Admin':
+    #         return jsonify({'message': 'Unauthorized to delete this class'}), 403
+
+    #     db.session.delete(class_to_delete)
+    #     db.session.commit()
+    #     return jsonify({'message': 'Class deleted successfully'}), 200
+
+    # return jsonify({'message': 'Invalid request method'}), 405  # Invalid HTTP method
+
+@bp.route('/classes', methods=['GET'])
+@token_required
+def get_classes(current_user):
+    # Allow teachers to view their own classes
+    if isinstance(current_user, Teacher):
+        classes = Class.query.filter_by(teacher_id=current_user.id).all()
+        return jsonify([c.to_dict() for c in classes]), 200
+
+    return jsonify({'message': 'Unauthorized'}), 403
+
+@bp.route('/class/<int:class_id>/subjects', methods=['GET'])
+@token_required
+def get_subjects_for_class(current_user, class_id):
+    # Only the teacher who teaches the class can view the subjects for that class
+    if isinstance(current_user, Teacher):
+        subjects = Subject.query.filter_by(class_id=class_id, teacher_id=current_user.id).all()
+        return jsonify([subject.to_dict() for subject in subjects]), 200
+    return jsonify({'message': 'Unauthorized'}), 403
@@ -0,0 +1,52 @@
+from datetime import datetime
+from flask import Blueprint, current_app, jsonify, request
+from models import Notifications, Parent, db
+from routes.utils import token_required
+from feed import get_feed_json, invalidate_feeds
+from changelog import record_changes
+from serialization import wants_msgpack
+from partitions import recent_since
+
+bp = Blueprint('feed', __name__)
+
+
+## A parent's home screen in one request: children, latest grades, unread notifications, new materials ##
+@bp.route('/parent/feed', methods=['GET'])
+@token_required
+def parent_feed(current_user):
+    if not isinstance(current_user, Parent):
+        return jsonify({'message': 'Unauthorized. Only parents have a feed.'}), 403
+    payload = get_feed_json(current_user.id)
+    if wants_msgpack():
+        # Feeds are built (and cached) as JSON; repacked for MessagePack clients
+        return jsonify(current_app.json.loads(payload))
+    response = current_app.response_class(payload, mimetype='application/json')
+    response.vary.add('Accept')
+    return response
+
+
+## Mark notifications as read (all unread ones unless notification_ids is given) ##
+@bp.route('/parent/feed/read', methods=['POST'])
+@token_required
+def mark_notifications_read(current_user):
+    if not isinstance(current_user, Parent):
+        return jsonify({'message': 'Unauthorized. Only parents can read notifications.'}), 403
+
+    data = request.get_json(silent=True) or {}
+    # Older notifications are no longer in the feed, and the bound keeps this to recent partitions
+    query = (Notifications.query.filter_by(parent_id=current_user.id, read_at=None)
+             .filter(Notifications.created_at >= recent_since()))
+    if 'notification_ids' in data:
+        if not isinstance(data['notification_ids'], list):
+            return jsonify({'message': 'notification_ids must be a list'}), 400
+        query = query.filter(Notifications.id.in_(data['notification_ids']))
+
+    notification_ids = [notification_id for notification_id, in query.with_entities(Notifications.id)]
+    count = (query.filter(Notifications.id.in_(notification_ids))
+             .update({'read_at': datetime.utcnow()}, synchronize_session=False))
+    # Bulk updates skip the flush events, so refresh the cached feed and the change log here
+    if current_app.config.get('PARENT_FEED_CACHE'):
+        invalidate_feeds(db.session.connection(), [current_user.id])
+    record_changes(db.session.connection(), Notifications.__tablename__, notification_ids)
+    db.session.commit()
+    return jsonify({'message': f'{count} notifications marked as read'}), 200
@@ -1,7 +1,8 @@
-# from flask import jsonify
-# from flask_restful import Resource
+from flask import Blueprint, jsonify
 
+bp = Blueprint('home', __name__)
 
-# class Welcome(Resource):
-#     def get(self):
-#         return jsonify({"message": "Welcome to SecLink"}), 200
\ No newline at end of file
+
+@bp.route('/')
+def welcome():
+    return jsonify({"message": "Welcome to SecLink Kenya"}), 200
@@ -1,23 +1,173 @@
-# from flask import jsonify
-# from flask_restful import Resource
-# from models import LearningMaterial,Student, db
-# from routes.utils import token_required, login_required  # type: ignore
-
-
-
-# class LearningMaterial(Resource):
-#     @login_required
-#     @token_required
-#     def get(self, learning_material_id=None):
-#         if learning_material_id:
-#             learning_material = LearningMaterial.query.get_or_404(learning_material_id)
-#             return learning_material.to_dict(), 200
-#         learning_materials = LearningMaterial.query.all()
-#         return jsonify([learning_material.to_dict() for learning_material in learning_materials]), 200
-
-#     @login_required
-#     def delete(self, learning_material_id):
-#         learning_material = LearningMaterial.query.get_or_404(learning_material_id)
-#         db.session.delete(learning_material)
-#         db.session.commit()
-#         return '', 204
\ No newline at end of file
+import logging
+import click
+from flask import Blueprint, jsonify, request
+from sqlalchemy.exc import SQLAlchemyError
+from models import LearningMaterial, Parent, Student, Subject, Teacher, db
+from routes.utils import allowed_file, token_required
+from idempotency import idempotent
+from processing import process_material, submit_material
+from search import remove_material
+from storage import get_storage, storage_name
+from readmodels import learning_material_rows
+from tenancy import in_school
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('learningmaterial', __name__, cli_group=None)
+
+
+##  Routes to Manage Learning Materials ##
+@bp.route('/learning-material', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@token_required
+@idempotent('learning-material')
+def manage_learning_material(current_user):
+    if request.method == 'GET':
+        # Handle retrieving learning materials (Parents only)
+        if isinstance(current_user, Parent):
+            return jsonify(learning_material_rows()), 200
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    elif request.method == 'POST':
+        # Handle file upload for new learning material (Teachers only)
+        if not isinstance(current_user, Teacher):
+            return jsonify({"message": "Unauthorized access. Only teachers can upload materials."}), 403
+
+        if 'file' not in request.files or not request.files['file']:
+            return jsonify({'message': 'No file provided'}), 400
+
+        file = request.files['file']
+
+        # Check the form before the file is stored, so a bad request leaves nothing behind
+        title = request.form.get('title')
+        student_id = request.form.get('student_id', type=int)
+        subject_id = request.form.get('subject_id', type=int)
+        if not title or not student_id:
+            return jsonify({'message': 'Title and a numeric student_id are required'}), 400
+        if not in_school(Student, student_id):
+            return jsonify({'message': f'Student with id {student_id} not found'}), 404
+        if subject_id and not in_school(Subject, subject_id):
+            return jsonify({'message': f'Subject with id {subject_id} not found'}), 404
+
+        # Validate file type using allowed_file function
+        if file and allowed_file(file.filename):
+            # Save the file to storage (local disk or S3, see storage.py) under a name of its own
+            try:
+                file_path = get_storage().save(file, storage_name(file.filename))
+            except Exception as e:
+                return jsonify({'message': f'File could not be saved: {str(e)}'}), 500
+
+            # Create a new LearningMaterial entry in the database
+            learning_material = LearningMaterial(
+                title=title,
+                file_path=file_path,
+                teacher_id=current_user.id,
+                student_id=student_id,
+                subject_id=subject_id
+            )
+            try:
+                db.session.add(learning_material)
+                db.session.commit()
+            except SQLAlchemyError as e:
+                # No row points at the file, so don't keep it
+                db.session.rollback()
+                get_storage().delete(file_path)
+                return jsonify({'message': 'Failed to add learning material', 'error': str(e)}), 500
+
+            # Extract text, page count and preview in the background
+            submit_material(learning_material.id)
+
+            return jsonify({'message': 'Learning material uploaded successfully', 'file_path': file_path}), 200
+        else:
+            return jsonify({'message': 'Invalid file type'}), 400
+
+    elif request.method == 'PUT':
+        # Handle updating an existing learning material (Teachers only)
+        if not isinstance(current_user, Teacher):
+            return jsonify({"message": "Unauthorized access. Only teachers can update materials."}), 403
+
+        if 'id' not in request.form:
+            return jsonify({'message': 'Material ID is required'}), 400
+
+        # Find the material by ID
+        learning_material = LearningMaterial.query.get(request.form['id'])
+        if not learning_material:
+            return jsonify({'message': 'Learning material not found'}), 404
+
+        # Ensure the teacher updating the material is the one who uploaded it
+        if learning_material.teacher_id != current_user.id:
+            return jsonify({'message': 'Unauthorized. You can only update your own materials.'}), 403
+
+        # Update the title if provided
+        if 'title' in request.form:
+            learning_material.title = request.form['title']
+
+        # Handle file update if a file is provided
+        replaced_path = None
+        if 'file' in request.files and allowed_file(request.files['file'].filename):
+            file = request.files['file']
+
+            try:
+                new_path = get_storage().save(file, storage_name(file.filename))
+            except Exception as e:
+                return jsonify({'message': f'File could not be saved: {str(e)}'}), 500
+            replaced_path, learning_material.file_path = learning_material.file_path, new_path
+
+        learning_material.processing_status = 'pending'
+        db.session.commit()
+        submit_material(learning_material.id)
+
+        # The new file has a new name, so the old one is no longer used
+        if replaced_path:
+            try:
+                get_storage().delete(replaced_path)
+            except Exception:
+                logger.warning('Could not delete replaced file %s', replaced_path, exc_info=True)
+        return jsonify({'message': 'Learning material updated successfully'}), 200
+
+    elif request.method == 'DELETE':
+        # Handle deleting an existing learning material (Teachers only)
+        if not isinstance(current_user, Teacher):
+            return jsonify({"message": "Unauthorized access. Only teachers can delete materials."}), 403
+
+        material_id = request.form.get('id')  # Assuming 'id' is sent in the form data
+
+        if not material_id:
+            return jsonify({'message': 'Material ID is required'}), 400
+
+        # Find the learning material by ID
+        learning_material = LearningMaterial.query.get(material_id)
+        if not learning_material:
+            return jsonify({'message': 'Learning material not found'}), 404
+
+        # Ensure the teacher deleting the material is the one who uploaded it
+        if learning_material.teacher_id != current_user.id:
+            return jsonify({'message': 'Unauthorized. You can only delete your own materials.'}), 403
+
+        # Delete the file (and its compressed copies) from storage
+        try:
+            get_storage().delete(learning_material.file_path)
+        except Exception as e:
+            return jsonify({'message': f'File could not be deleted: {str(e)}'}), 500
+
+        # Delete the record from the database
+        remove_material(learning_material.id)
+        db.session.delete(learning_material)
+        db.session.commit()
+
+        return jsonify({'message': 'Learning material deleted successfully'}), 200
+
+    return jsonify({'message': 'Invalid request method'}), 405  # Handle unsupported methods
+
+
+## Reprocess uploads that are still pending (e.g. after a restart) or that failed ##
+@bp.cli.command('process-materials')
+@click.option('--failed', is_flag=True, help='Also retry materials whose processing failed.')
+def process_materials(failed):
+    statuses = ['pending', 'failed'] if failed else ['pending']
+    ids = [material_id for (material_id,) in db.session.query(LearningMaterial.id)
+           .filter(LearningMaterial.processing_status.in_(statuses))
+           .order_by(LearningMaterial.id)]
+    for material_id in ids:
+        process_material(material_id)
+    click.echo(f'Processed {len(ids)} learning materials')
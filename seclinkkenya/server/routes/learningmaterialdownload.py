@@ -1,24 +1,22 @@
-# import os
-# from flask import jsonify, send_from_directory, current_app as app
-# from flask_restful import Resource
-# from models import LearningMaterial,  db
-# from routes.utils import token_required, login_required  # type: ignore
+from flask import Blueprint, jsonify
+from sqlalchemy import select
+from models import LearningMaterial, db
+from routes.utils import token_required
+from storage import get_storage
 
+bp = Blueprint('learningmaterialdownload', __name__)
 
 
-# class LearningMaterialDownload(Resource):
-#     @login_required
-#     @token_required
-#     def get(self, learning_material_id):
-#         # Fetch the learning material by ID
-#         learning_material = LearningMaterial.query.get_or_404(learning_material_id)
-
-#         # Extract the file path stored in the database
-#         file_path = learning_material.file_path
-#         file_name = os.path.basename(file_path)
-
-#         # Send the file to the user for download
-#         try:
-#             return send_from_directory(app.config['UPLOAD_FOLDER'], file_name, as_attachment=True)
-#         except FileNotFoundError:
-#             return jsonify({"error": "File not found"}), 404
\ No newline at end of file
+# Served by the app from local storage; a redirect to a short-lived presigned URL from S3.
+# Only files of a material in the user's school (the query is scoped to it).
+@bp.route('/download/<filename>', methods=['GET'])
+@token_required
+def download_file(current_user, filename):
+    storage = get_storage()
+    if db.session.execute(select(LearningMaterial.id)
+                          .where(LearningMaterial.file_path == storage.location(filename))).first() is None:
+        return jsonify({"error": "File not found"}), 404
+    try:
+        return storage.download(filename)
+    except FileNotFoundError:
+        return jsonify({"error": "File not found"}), 404
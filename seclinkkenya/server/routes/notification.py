@@ -1,32 +1,120 @@
-# from flask import request, jsonify
-# from flask_restful import Resource
-# from models import Notifications, db
-# from utils import token_required, login_required  # type: ignore
-
-
-# class Notifications(Resource):
-#     @login_required
-#     @token_required
-#     def get(self, notification_id=None):
-#         if notification_id:
-#             notification = Notifications.query.get_or_404(notification_id)
-#             return notification.to_dict(), 200
-#         notifications = Notifications.query.all()
-#         return jsonify([notification.to_dict() for notification in notifications]), 200
-
-#     @login_required
-#     def post(self):
-#         data = request.get_json()
-#         notification = Notifications(
-#             message=data.get('message'),
-#         )
-#         db.session.add(notification)
-#         db.session.commit()
-#         return notification.to_dict(), 201
-
-#     @login_required
-#     def delete(self, notification_id):
-#         notification = Notifications.query.get_or_404(notification_id)
-#         db.session.delete(notification)
-#         db.session.commit()
-#         return '', 204
\ No newline at end of file
+import time
+from datetime import datetime
+import click
+from flask import Blueprint, current_app, jsonify, request
+from models import Notifications, Parent, School, Teacher, db
+from partitions import archive_partitions, create_partitions, is_partitioned, recent_since, upcoming_months
+from routes.utils import token_required
+from idempotency import idempotent
+from tenancy import in_school, use_schema
+from readmodels import NotificationRow, fetch, latest_notification_id, notification_rows, notifications_after
+
+bp = Blueprint('notification', __name__, cli_group=None)
+
+
+# Route to Hanndle Notification ##
+@bp.route('/notifications', methods=['POST', 'GET'])
+@token_required
+@idempotent('notifications')
+def manage_notifications(current_user):
+    if request.method == 'POST':
+        # Handle adding a notification (Teacher only)
+        if isinstance(current_user, Teacher):
+            data = request.get_json()
+            # Only to parents of the teacher's own school
+            if not in_school(Parent, data.get('parent_id')):
+                return jsonify({'message': f"Parent with id {data.get('parent_id')} not found"}), 404
+            notification = Notifications(
+                message=data['message'],
+                parent_id=data['parent_id']
+            )
+            db.session.add(notification)
+            db.session.commit()
+
+            return jsonify({'message': 'Notification sent'}), 200
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    elif request.method == 'GET':
+        # Handle getting notifications (Parent only), newest first. Only the last
+        # NOTIFICATION_RECENT_DAYS unless `since` asks for more, so only those partitions are read;
+        # `before` (the last id received) gets the next page.
+        if isinstance(current_user, Parent):
+            try:
+                since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else recent_since()
+            except ValueError:
+                return jsonify({'message': 'since must be an ISO 8601 date, e.g. 2025-01-31'}), 400
+            per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+            notifications = notification_rows(
+                current_user.id, since, before=request.args.get('before', type=int), limit=per_page)
+            return jsonify(notifications), 200
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify({'message': 'Invalid request method'}), 405  # Handle unsupported methods
+
+
+def poll_args(args, longest):
+    # (after, timeout) of a long poll; no `after` means "newer than the newest one now"
+    try:
+        after = int(args['after']) if args.get('after') else None
+        timeout = float(args['timeout']) if args.get('timeout') else longest
+    except ValueError:
+        raise ValueError('after must be a notification id and timeout a number of seconds')
+    return after, min(max(timeout, 0), longest)
+
+
+## Long poll: waits up to `timeout` seconds for notifications newer than `after` (Parent only) ##
+# This one holds a worker thread for the whole wait; asgi.py serves the same route from an
+# event loop, where a waiting poll costs no thread.
+@bp.route('/notifications/poll', methods=['GET'])
+@token_required
+def poll_notifications(current_user):
+    if not isinstance(current_user, Parent):
+        return jsonify({'message': 'Unauthorized'}), 403
+    try:
+        after, timeout = poll_args(request.args, current_app.config['NOTIFICATION_POLL_TIMEOUT'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    parent_id = current_user.id
+    if after is None:
+        after = db.session.execute(latest_notification_id(parent_id, current_user.school_id)).scalar() or 0
+    deadline = time.monotonic() + timeout
+    while True:
+        notifications = fetch(NotificationRow, notifications_after(parent_id, current_user.school_id, after))
+        # Ends the transaction, so the connection goes back to the pool while waiting
+        db.session.commit()
+        if notifications or time.monotonic() >= deadline:
+            break
+        time.sleep(min(current_app.config['NOTIFICATION_POLL_INTERVAL'], deadline - time.monotonic()))
+    return jsonify({'notifications': notifications,
+                    'after': notifications[-1].id if notifications else after}), 200
+
+
+## Monthly partitions of notifications (PostgreSQL): make the coming months', archive old ones ##
+@bp.cli.command('notification-partitions')
+@click.option('--drop', is_flag=True, help='Drop old months instead of moving them to the archive schema.')
+def notification_partitions(drop):
+    ahead = current_app.config.get('NOTIFICATION_PARTITIONS_AHEAD', 3)
+    retention = current_app.config.get('NOTIFICATION_RETENTION_MONTHS', 12)
+    if db.engine.dialect.name != 'postgresql':
+        click.echo('Notifications are only partitioned on PostgreSQL; nothing to do')
+        return
+
+    schemas = [None]
+    if current_app.config.get('TENANCY_SCHEMAS'):
+        schemas += [schema for schema, in db.session.query(School.schema_name).filter(School.schema_name.isnot(None))]
+    for schema in schemas:
+        # One transaction per schema, so a failure leaves the others done
+        with db.engine.begin() as connection:
+            if schema:
+                use_schema(connection, schema)
+            if not is_partitioned(connection):
+                click.echo(f'{schema or "public"}: notifications is not partitioned, run `flask db upgrade`')
+                continue
+            created = create_partitions(connection, upcoming_months(ahead))
+            archived = archive_partitions(connection, retention, drop=drop)
+        click.echo(f'{schema or "public"}: created {", ".join(created) or "no partitions"}; '
+                   f'{"dropped" if drop else "archived"} {", ".join(archived) or "none"}')
@@ -1,63 +1,152 @@
-# from flask import request, jsonify, current_app as app
-# from flask_restful import Resource
-# from models import User, PasswordResetToken, db
-# from werkzeug.security import generate_password_hash
-# import datetime
-# import secrets
-# from flask_mail import Message
+import hashlib
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import delete, select
+from werkzeug.security import generate_password_hash
+from extensions import send_mail
+from models import Parent, PasswordResetToken, Teacher, db
+from ratelimit import client_ip, json_field, rate_limit
+from tenancy import any_school, enter_school, school_by_code
 
+bp = Blueprint('passwordreset', __name__, cli_group=None)
 
-# class RequestPasswordReset(Resource):
-#     def post(self):
-#         data = request.get_json()
-#         email = data.get('email')
+logger = logging.getLogger(__name__)
 
-#         # Check if the user exists
-#         user = User.query.filter_by(email=email).first()
-#         if not user:
-#             return jsonify({'message': 'User not found'}), 404
 
-#         # Generate a unique reset token
-#         token = secrets.token_urlsafe(20)  # A secure random token
-#         expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)  # Token valid for 1 hour
+# Only the SHA-256 digest of a token is stored, so a leaked table can't be used to reset
+# passwords. Tokens are 256 random bits, so an unsalted fast hash is enough.
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
 
-#         # Save the token in the database
-#         reset_token = PasswordResetToken(user_id=user.id, token=token, expiry_date=expiry)
-#         db.session.add(reset_token)
-#         db.session.commit()
 
-#         # Send reset token via email
-#         reset_link = f"{app.config['FRONTEND_URL']}/reset-password?token={token}"
-#         msg = Message('Password Reset Request', recipients=[email])
-#         msg.body = f"Use the following link to reset your password: {reset_link}"
-#         email.send(msg)
+def owner_column(user):
+    return PasswordResetToken.teacher_id if isinstance(user, Teacher) else PasswordResetToken.parent_id
 
-#         return jsonify({'message': 'Password reset link sent to your email.'}), 200
 
+## Request a password reset link by email ##
+@bp.route('/password-reset-request', methods=['POST'])
+@rate_limit('password-reset', ip=('RATELIMIT_PASSWORD_RESET_IP', client_ip),
+            email=('RATELIMIT_PASSWORD_RESET_EMAIL', json_field('email')))
+def request_password_reset():
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    if not email:
+        return jsonify({'message': 'Email is required'}), 400
 
-# class PasswordResetConfirm(Resource):
-#     def post(self):
-#         data = request.get_json()
-#         token = data.get('token')
-#         new_password = data.get('new_password')
+    # The same answer whether or not the email is registered, so this can't be used to
+    # find out who has an account
+    message = {'message': 'If that email is registered, a password reset link has been sent.'}
 
-#         # Find the token in the database
-#         reset_token = PasswordResetToken.query.filter_by(token=token).first()
+    # Emails are unique per school; `school` (its code) picks one when several schools have it
+    filters = {'email': email}
+    if data.get('school'):
+        school = school_by_code(data['school'])
+        if not school:
+            return jsonify(message), 200
+        filters['school_id'] = school.id
+        enter_school(school.id)
+    with any_school():
+        user = Teacher.query.filter_by(**filters).first() or Parent.query.filter_by(**filters).first()
+    if not user:
+        return jsonify(message), 200
+    if not data.get('school'):
+        enter_school(user.school_id)
 
-#         if not reset_token:
-#             return jsonify({'message': 'Invalid or expired token'}), 400
+    # Prefixed with the school, so the confirmation can be scoped to it without a login
+    token = f'{user.school_id}.{secrets.token_urlsafe(32)}'
+    expiry = datetime.utcnow() + timedelta(minutes=current_app.config['PASSWORD_RESET_TOKEN_MINUTES'])
 
-#         # Check if the token is expired
-#         if reset_token.expiry_date < datetime.datetime.utcnow():
-#             return jsonify({'message': 'Token has expired'}), 400
+    # One live token per user: a new request replaces any earlier link
+    column = owner_column(user)
+    db.session.execute(delete(PasswordResetToken).where(column == user.id))
+    db.session.add(PasswordResetToken(token_hash=hash_token(token), expiry_date=expiry, school_id=user.school_id,
+                                      **{column.key: user.id}))
+    db.session.commit()
 
-#         # Update the user's password
-#         user = User.query.get(reset_token.user_id)
-#         user.password = generate_password_hash(new_password)
-#         db.session.commit()
+    send_reset_email(email, token)
+    return jsonify(message), 200
 
-#         # Delete the token after use
-#         db.session.delete(reset_token)
-#         db.session.commit()
 
-#         return jsonify({'message': 'Password has been updated successfully.'}), 200
+def send_reset_email(email, token):
+    reset_link = f"{current_app.config['FRONTEND_URL']}/reset-password?token={token}"
+    if not current_app.config.get('MAIL_USERNAME'):
+        logger.warning('MAIL_USERNAME is not set; password reset email to %s not sent', email)
+        return
+    from flask_mail import Message
+    msg = Message('Password Reset Request', sender=current_app.config['MAIL_USERNAME'], recipients=[email])
+    msg.body = f"Use the following link to reset your password: {reset_link}"
+    send_mail(msg)
+
+
+## Set a new password with a reset token ##
+@bp.route('/password-reset-confirm', methods=['POST'])
+@rate_limit('password-reset-confirm', ip=('RATELIMIT_PASSWORD_RESET_IP', client_ip))
+def confirm_password_reset():
+    data = request.get_json(silent=True) or {}
+    token = data.get('token')
+    new_password = data.get('new_password')
+    if not token or not new_password:
+        return jsonify({'message': 'Token and new password are required'}), 400
+
+    school_id, _, _ = token.partition('.')
+    if not school_id.isdigit():
+        return jsonify({'message': 'Invalid or expired token'}), 400
+    enter_school(int(school_id))
+
+    token_hash = hash_token(token)
+    now = datetime.utcnow()
+    valid = (PasswordResetToken.token_hash == token_hash) & (PasswordResetToken.expiry_date > now)
+
+    # Cheap check first, so a bad token never costs a password hash
+    if db.session.execute(select(PasswordResetToken.id).where(valid)).first() is None:
+        return jsonify({'message': 'Invalid or expired token'}), 400
+    hashed_password = generate_password_hash(new_password, method='pbkdf2:sha256')
+
+    # Verify and consume in one statement: of two concurrent requests with the same
+    # token, only one gets the row back
+    consumed = db.session.execute(
+        delete(PasswordResetToken).where(valid)
+        .returning(PasswordResetToken.parent_id, PasswordResetToken.teacher_id)
+    ).first()
+    if consumed is None:
+        db.session.rollback()
+        return jsonify({'message': 'Invalid or expired token'}), 400
+
+    user = db.session.get(Teacher, consumed.teacher_id) if consumed.teacher_id else \
+        db.session.get(Parent, consumed.parent_id)
+    if not user:
+        db.session.rollback()
+        return jsonify({'message': 'Invalid or expired token'}), 400
+
+    user.password = hashed_password
+    db.session.commit()
+    return jsonify({'message': 'Password has been updated successfully.'}), 200
+
+
+## Delete expired reset tokens (run periodically, e.g. from cron) ##
+@bp.cli.command('purge-reset-tokens')
+@click.option('--batch-size', default=1000, show_default=True, help='Tokens deleted per transaction.')
+@click.option('--pause', default=0.05, show_default=True, help='Seconds to wait between batches.')
+def purge_reset_tokens(batch_size, pause):
+    # Small batches, each in its own short transaction, so the purge never holds locks
+    # long enough to stall password resets (or, on SQLite, every other write)
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        expired = (select(PasswordResetToken.id)
+                   .where(PasswordResetToken.expiry_date <= now)
+                   .order_by(PasswordResetToken.expiry_date)
+                   .limit(batch_size))
+        deleted = db.session.execute(
+            delete(PasswordResetToken).where(PasswordResetToken.id.in_(expired.scalar_subquery()))
+        ).rowcount
+        db.session.commit()
+        total += deleted
+        if deleted < batch_size:
+            break
+        time.sleep(pause)
+    click.echo(f'Deleted {total} expired password reset tokens')
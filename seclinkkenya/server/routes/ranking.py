@@ -0,0 +1,85 @@
+import click
+from flask import Blueprint, jsonify, request
+from models import Class, Parent, Ranking, School, Student, Teacher, db
+from rankings import mean_grade, refresh_all
+from routes.utils import token_required
+from tenancy import school_by_code, school_scope
+
+bp = Blueprint('ranking', __name__, cli_group=None)
+
+
+def ranking_dict(ranking, name):
+    return {
+        'student_id': ranking.student_id,
+        'name': name,
+        'class_id': ranking.class_id,
+        'form': ranking.form,
+        'subjects': ranking.subjects,
+        'mean_points': round(ranking.mean_points, 3),
+        'mean_grade': mean_grade(ranking.mean_points),
+        'stream_position': ranking.stream_position,
+        'stream_size': ranking.stream_size,
+        'form_position': ranking.form_position,
+        'form_size': ranking.form_size,
+        'percentile': round(ranking.percentile, 1),
+        'updated_at': ranking.updated_at,
+    }
+
+
+## Leaderboard of a stream (?class_id=) or a whole form (?form=), best first (teachers only) ##
+@bp.route('/rankings', methods=['GET'])
+@token_required
+def get_rankings(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can view rankings.'}), 403
+
+    class_id = request.args.get('class_id', type=int)
+    form = request.args.get('form', type=int)
+    if (class_id is None) == (form is None):
+        return jsonify({'message': 'Give either class_id or form'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+    query = db.session.query(Ranking, Student.name).join(Student, Student.id == Ranking.student_id)
+    if class_id is not None:
+        query = query.filter(Ranking.class_id == class_id).order_by(Ranking.stream_position, Student.name)
+    else:
+        query = query.filter(Ranking.form == form).order_by(Ranking.form_position, Student.name)
+    total = query.order_by(None).count()
+    rankings = query.limit(per_page).offset((page - 1) * per_page)
+    return jsonify({'rankings': [ranking_dict(ranking, name) for ranking, name in rankings],
+                    'page': page, 'per_page': per_page, 'total': total}), 200
+
+
+## A student's ranking (teachers, or the student's parent) ##
+@bp.route('/students/<int:student_id>/ranking', methods=['GET'])
+@token_required
+def get_student_ranking(current_user, student_id):
+    student = db.session.get(Student, student_id)
+    if not student:
+        return jsonify({'message': 'Student not found'}), 404
+    if isinstance(current_user, Parent) and student.parent_id != current_user.id:
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    ranking = db.session.get(Ranking, student_id)
+    if not ranking:
+        return jsonify({'message': 'Student has no grades to rank'}), 404
+    return jsonify(ranking_dict(ranking, student.name)), 200
+
+
+## Rebuild every ranking, e.g. after migrating ##
+@bp.cli.command('refresh-rankings')
+@click.option('--school', 'school_code', help="The school's code (default: every school).")
+def refresh_rankings(school_code):
+    school = school_by_code(school_code)
+    if school_code and not school:
+        raise click.BadParameter(f'No school with code {school_code!r}', param_hint='--school')
+    schools = [school] if school else School.query.order_by(School.id).all()
+    db.session.commit()  # each school in its own transaction (and schema)
+
+    for school in schools:
+        with school_scope(school.id):
+            ranked = refresh_all(db.session)
+            classes = db.session.query(Class).count()
+            db.session.commit()
+        click.echo(f'{school.code}: ranked {ranked} students in {classes} classes')
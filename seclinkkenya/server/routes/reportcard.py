@@ -0,0 +1,94 @@
+import os
+import time
+import click
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from models import Class, Parent, Student, Teacher, db
+from routes.utils import token_required
+from reportcards import FORMATS, card_filename, get_cache, load_cards, render_cards, zip_cards
+from tenancy import school_by_code, school_scope
+
+bp = Blueprint('reportcard', __name__, cli_group=None)
+
+
+def card_options():
+    fmt = request.args.get('format', 'pdf').lower()
+    term = request.args.get('term', '')[:100]
+    return fmt, term
+
+
+## A student's report card (teachers, or the student's parent) ##
+@bp.route('/students/<int:student_id>/report-card', methods=['GET'])
+@token_required
+def student_report_card(current_user, student_id):
+    fmt, term = card_options()
+    if fmt not in FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    student = db.session.get(Student, student_id)
+    if not student:
+        return jsonify({'message': 'Student not found'}), 404
+    if isinstance(current_user, Parent) and student.parent_id != current_user.id:
+        return jsonify({'message': 'Unauthorized. You can only view your own children.'}), 403
+
+    cards = load_cards(term, student_id=student_id)
+    (card, data), = render_cards(cards, fmt, get_cache(), workers=1)
+    return Response(data, mimetype=FORMATS[fmt], headers={
+        'Content-Disposition': f'inline; filename="{os.path.basename(card_filename(card, fmt))}"'})
+
+
+## Report cards for a class, or the whole school, as a ZIP (teachers only) ##
+@bp.route('/report-cards', methods=['GET'])
+@token_required
+def report_cards(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can generate report cards.'}), 403
+
+    fmt, term = card_options()
+    if fmt not in FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(FORMATS)}"}), 400
+
+    class_id = request.args.get('class_id', type=int)
+    if class_id is not None and not db.session.get(Class, class_id):
+        return jsonify({'message': f'Class with id {class_id} not found'}), 404
+
+    # Load everything before streaming starts; rendering and zipping need no database
+    cards = load_cards(term, class_id=class_id)
+    rendered = render_cards(cards, fmt, get_cache(), current_app.config['REPORT_CARD_WORKERS'])
+    filename = f"report-cards-{class_id if class_id is not None else 'school'}.zip"
+    return Response(stream_with_context(zip_cards(rendered, fmt)), mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+## Term-end batch run from the command line ##
+@bp.cli.command('report-cards')
+@click.option('--school', 'school_code', help="The school's code (default: every school).")
+@click.option('--class-id', type=int, help='Only this class (default: the whole school).')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='pdf', show_default=True)
+@click.option('--term', default='', help='Term shown on the cards, e.g. "Term 1 2025".')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), required=True, help='ZIP file to write.')
+def generate_report_cards(school_code, class_id, fmt, term, output):
+    start = time.perf_counter()
+    school = school_by_code(school_code)
+    if school_code and not school:
+        raise click.BadParameter(f'No school with code {school_code!r}', param_hint='--school')
+    with school_scope(school.id if school else None):
+        cards = load_cards(term, class_id=class_id)
+        rendered = render_cards(cards, fmt, get_cache(), current_app.config['REPORT_CARD_WORKERS'])
+        with open(output, 'wb') as f:
+            for chunk in zip_cards(rendered, fmt):
+                f.write(chunk)
+    click.echo(f'Wrote {len(cards)} report cards to {output} in {time.perf_counter() - start:.1f}s')
+
+
+## Remove cached cards nobody has fetched for a while ##
+@bp.cli.command('purge-report-cards')
+@click.option('--days', default=30, show_default=True, help='Remove cards not used for this many days.')
+def purge_report_cards(days):
+    cache = get_cache()
+    cutoff = time.time() - days * 86400
+    removed = 0
+    for entry in os.scandir(cache.directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    click.echo(f'Removed {removed} cached report cards')
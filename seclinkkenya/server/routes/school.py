@@ -0,0 +1,38 @@
+import click
+from flask import Blueprint, jsonify
+from models import School, db
+from routes.utils import token_required
+from tenancy import create_school_schema
+
+bp = Blueprint('school', __name__, cli_group=None)
+
+
+## The logged-in user's school ##
+@bp.route('/school', methods=['GET'])
+@token_required
+def get_school(current_user):
+    school = db.session.get(School, current_user.school_id)
+    if not school:
+        return jsonify({'message': 'School not found'}), 404
+    return jsonify(school.to_dict()), 200
+
+
+## Add a school ##
+@bp.cli.command('create-school')
+@click.option('--name', required=True, help='The school\'s name, as printed on report cards.')
+@click.option('--code', required=True, help='Short code users give at signup and login, e.g. "kenyahigh".')
+@click.option('--schema', is_flag=True, help='Keep its tables in their own PostgreSQL schema (needs TENANCY_SCHEMAS).')
+def create_school(name, code, schema):
+    if School.query.filter_by(code=code).first():
+        raise click.BadParameter(f'A school with code {code!r} already exists', param_hint='--code')
+    school = School(name=name, code=code)
+    db.session.add(school)
+    db.session.flush()
+    if schema:
+        try:
+            create_school_schema(db.session.connection(), school)
+        except ValueError as e:
+            db.session.rollback()
+            raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f'Created school {school.id} ({code})' + (f' in schema {school.schema_name}' if schema else ''))
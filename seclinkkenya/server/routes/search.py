@@ -0,0 +1,48 @@
+import click
+from flask import Blueprint, jsonify, request
+from models import LearningMaterial, db
+from routes.utils import token_required
+from search import index_material, search_materials
+
+bp = Blueprint('search', __name__, cli_group=None)
+
+
+## Search learning materials by title, subject or content ##
+@bp.route('/learning-material/search', methods=['GET'])
+@token_required
+def search_learning_material(current_user):
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': 'Search query (q) is required'}), 400
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 50)
+
+    total, hits = search_materials(query, limit=per_page, offset=(page - 1) * per_page)
+
+    # Load the page's materials in one query and keep the ranked order
+    materials = {m.id: m for m in LearningMaterial.query.filter(LearningMaterial.id.in_([h[0] for h in hits]))}
+    results = []
+    for material_id, rank, snippet in hits:
+        material = materials.get(material_id)
+        if material:
+            results.append({**material.to_dict(), 'rank': rank, 'snippet': snippet})
+
+    return jsonify({'results': results, 'page': page, 'per_page': per_page, 'total': total}), 200
+
+
+@bp.cli.command('reindex-materials')
+def reindex_materials():
+    """Rebuild the search index entry of every learning material."""
+    last_id, count = 0, 0
+    while True:
+        batch = LearningMaterial.query.filter(LearningMaterial.id > last_id) \
+            .order_by(LearningMaterial.id).limit(200).all()
+        if not batch:
+            break
+        for material in batch:
+            index_material(material)
+        db.session.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+    click.echo(f'Indexed {count} learning materials')
@@ -1,16 +1,163 @@
-# from flask_restful import Resource
-# from models import Student
-# from flask import request, jsonify
-
-# class Student (Resource):
-#      def get(self, student_id=None):
-#         if student_id:
-#             # Get a single student by ID
-#             student = Student.query.get(student_id)
-#             if not student:
-#                 return jsonify({'message': 'Student not found'}), 404
-#             return jsonify(student.to_dict())  
-#         else:
-#             # Get all students
-#             students = Student.query.all()
-#             return jsonify([student.to_dict() for student in students])  
+from datetime import datetime
+from flask import Blueprint, jsonify, make_response, request
+from sqlalchemy.exc import SQLAlchemyError
+from models import Class, Student, db, Teacher, Parent
+from readmodels import student_rows
+from routes.utils import token_required
+from tenancy import in_school
+from idempotency import idempotent
+
+bp = Blueprint('student', __name__)
+
+
+## Route to manage students ##
+@bp.route('/add-student', methods=['POST'])
+@token_required
+@idempotent('add-student')
+def add_student(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can add students.'}), 403
+    data = request.get_json()
+
+    # Extract the fields from the request data
+    name = data.get('name')
+    dob = data.get('dob')  # Expected to be in string format
+    overall_grade = data.get('overall_grade')
+    class_id = data.get('class_id')
+    teacher_id = data.get('teacher_id')
+    parent_id = data.get('parent_id')
+
+    # Check if all required fields are provided
+    if not all([name, dob, overall_grade, class_id, teacher_id, parent_id]):
+        return jsonify({'message': 'All fields are required'}), 400
+
+    # Check if the class, teacher, and parent exist in this school
+    try:
+        student_class = in_school(Class, class_id)
+        teacher = in_school(Teacher, teacher_id)
+        parent = in_school(Parent, parent_id)
+    except SQLAlchemyError as e:
+        return jsonify({'message': 'Database lookup failed', 'error': str(e)}), 500
+
+    if not student_class:
+        return jsonify({'message': f'Class with id {class_id} not found'}), 404
+    if not teacher:
+        return jsonify({'message': f'Teacher with id {teacher_id} not found'}), 404
+    if not parent:
+        return jsonify({'message': f'Parent with id {parent_id} not found'}), 404
+
+    # Create a new Student
+    new_student = Student(
+        name=name,
+        dob=dob,  # dob remains in string format
+        overall_grade=overall_grade,
+        class_id=class_id,
+        teacher_id=teacher_id,
+        parent_id=parent_id,
+        created_at=datetime.utcnow()  # Automatically set created_at
+    )
+
+    # Add the new student to the database with error handling
+    try:
+        db.session.add(new_student)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({'message': 'Failed to add student', 'error': str(e)}), 500
+
+    # Return success message
+    return jsonify({'message': 'Student added successfully'}), 200
+
+@bp.route('/students/<int:id>', methods=['GET', 'PATCH', 'DELETE'])
+@token_required
+def studend_by_id(current_user, id):
+   student = Student.query.filter(Student.id == id).first()
+  
+   if student == None:
+       return jsonify({"message": "Student not found."}), 404
+   elif request.method != 'GET' and not isinstance(current_user, Teacher):
+       return jsonify({"message": "Unauthorized. Only teachers can change students."}), 403
+   else:       
+       if request.method == 'GET':
+           student_dict = {
+               "id": student.id,
+               "name": student.name,
+               "dob": student.dob,
+               "class_id": student.class_id,
+               "teacher_id": student.teacher_id,
+               "parent_id": student.parent_id,
+               "overall_grade": student.overall_grade
+              
+           }
+           return jsonify(student_dict), 200
+      
+       elif request.method == 'PATCH':
+           try:               
+               data = request.get_json()
+               name = data.get('name')
+               dob = data.get('dob')
+               class_id = data.get('class_id')
+               teacher_id = data.get('teacher_id')
+               parent_id = data.get('parent_id')
+               overall_grade = data.get('overall_grade')
+  
+               if not name and not dob and not class_id and not teacher_id and not parent_id and not overall_grade:
+                   return jsonify({"errors": "All fields are required."}), 400
+
+               # The class, teacher and parent must be in this school
+               for model, related_id in ((Class, class_id), (Teacher, teacher_id), (Parent, parent_id)):
+                   if related_id is not None and not in_school(model, related_id):
+                       return jsonify({"errors": [f"{model.__name__} with id {related_id} not found"]}), 404
+  
+               # Update the student data
+               student.name = name
+               student.dob = dob
+               student.class_id = class_id
+               student.teacher_id = teacher_id
+               student.parent_id = parent_id
+               student.overall_grade = overall_grade
+              
+               db.session.add(student)
+               db.session.commit()
+              
+               # Response after successful student update
+               updated_student_dict = {
+                   "id": student.id,
+                   "name": student.name,
+                   "dob": student.dob,
+                   "class_id":student.class_id,
+                   "teacher_id": student.teacher_id,
+                   "pranet_id": student.parent_id,
+                   "overall_grade": student.overall_grade,
+                   }
+               return jsonify(updated_student_dict), 200
+          
+           # Handle validation errors
+           except ValueError as ve:
+               return jsonify({"errors": [str(ve)]}), 400
+           
+           # Fetch the student by its id
+       elif request.method == 'DELETE':
+            student = Student.query.filter_by(id=id).first()
+
+
+            if not student:
+                return make_response(jsonify({"errors": ["Student not found"]}), 404)
+
+
+            try:
+                # Delete the student
+                db.session.delete(student)
+                db.session.commit()
+                return make_response(jsonify({"message": "Student deleted successfully"}), 200)
+
+
+            except Exception as e:
+                db.session.rollback() 
+                return make_response(jsonify({"errors": [str(e)]}), 500)
+
+@bp.route('/students', methods=['GET'])
+@token_required
+def get_students(current_user):
+    # Rows of just the listed columns, not Student objects (see readmodels.py)
+    return jsonify(student_rows()), 200
@@ -1,45 +1,92 @@
+from flask import Blueprint, jsonify, request
+from models import Class, Subject, Teacher, db
+from routes.utils import token_required
+from tenancy import in_school
 
-# from flask import request, jsonify
-# from flask_restful import Resource
-# from models import Subject, db
-# from routes.utils import token_required, login_required  # type: ignore
-
-
-# class Subject(Resource):
-#     @login_required
-#     @token_required
-#     def get(self, subject_id=None):
-#         if subject_id:
-#             subject = Subject.query.get_or_404(subject_id)
-#             return subject.to_dict(), 200
-#         subjects = Subject.query.all()
-#         return jsonify([subject.to_dict() for subject in subjects]), 200
-
-#     @login_required
-#     def post(self):
-#         data = request.get_json()
-#         subject = Subject(
-#             subject_name=data.get('subject_name'),
-#             subject_code=data.get('subject_code'),
-#             class_id=data.get('class_id'),
-#             teacher_id=data.get('teacher_id'),
-#         )
-#         db.session.add(subject)
-#         db.session.commit()
-#         return subject.to_dict(), 201
-
-#     @login_required
-#     def put(self, subject_id):
-#         data = request.get_json()
-#         subject = Subject.query.get_or_404(subject_id)
-#         subject.subject_name = data.get('subject_name')
-#         subject.subject_code = data.get('subject_code')
-#         db.session.commit()
-#         return subject.to_dict(), 200
-
-#     @login_required
-#     def delete(self, subject_id):
-#         subject = Subject.query.get_or_404(subject_id)
-#         db.session.delete(subject)
-#         db.session.commit()
-#         return '', 204
+bp = Blueprint('subject', __name__)
+
+
+def valid_periods(value):
+    # Lessons a week in the timetable; None leaves the subject out of it
+    return value is None or isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+@bp.route('/subject', methods=['POST', 'PUT', 'DELETE'])
+@token_required
+def manage_subject(current_user):
+
+    if request.method == 'POST':
+        # Handle creating a new subject (Teacher only)
+        if isinstance(current_user, Teacher):
+            data = request.get_json()
+            subject_name = data.get('subject_name')
+            subject_code = data.get('subject_code')
+            class_id = data.get('class_id')
+            periods_per_week = data.get('periods_per_week')
+
+            if not (subject_name and subject_code and class_id):
+                return jsonify({'message': 'Subject name, code, and class ID are required'}), 400
+            if not valid_periods(periods_per_week):
+                return jsonify({'message': 'periods_per_week must be a whole number of lessons a week'}), 400
+            if not in_school(Class, class_id):
+                return jsonify({'message': f'Class with id {class_id} not found'}), 404
+
+            new_subject = Subject(
+                subject_name=subject_name,
+                subject_code=subject_code,
+                class_id=class_id,
+                teacher_id=current_user.id,
+                periods_per_week=periods_per_week
+            )
+            db.session.add(new_subject)
+            db.session.commit()
+
+            return jsonify({'message': 'Subject created successfully', 'subject': new_subject.to_dict()}), 201
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    elif request.method == 'PUT':
+        # Handle updating a subject (Teacher only)
+        if isinstance(current_user, Teacher):
+            data = request.get_json()
+            subject_id = data.get('subject_id')  # Get subject ID from the request
+            subject_to_update = Subject.query.get_or_404(subject_id)
+
+            # Ensure that the teacher who created the subject is the one updating it
+            if subject_to_update.teacher_id != current_user.id:
+                return jsonify({'message': 'Unauthorized to update this subject'}), 403
+
+            subject_name = data.get('subject_name')
+            subject_code = data.get('subject_code')
+
+            if subject_name:
+                subject_to_update.subject_name = subject_name
+            if subject_code:
+                subject_to_update.subject_code = subject_code
+            if 'periods_per_week' in data:
+                if not valid_periods(data['periods_per_week']):
+                    return jsonify({'message': 'periods_per_week must be a whole number of lessons a week'}), 400
+                subject_to_update.periods_per_week = data['periods_per_week']
+
+            db.session.commit()
+            return jsonify({'message': 'Subject updated successfully', 'subject': subject_to_update.to_dict()}), 200
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    elif request.method == 'DELETE':
+        # Handle deleting a subject (Teacher only)
+        if isinstance(current_user, Teacher):
+            subject_id = request.args.get('subject_id')  # Get subject ID from the query string
+            subject_to_delete = Subject.query.get_or_404(subject_id)
+
+            # Ensure that the teacher who created the subject is the one deleting it
+            if subject_to_delete.teacher_id != current_user.id:
+                return jsonify({'message': 'Unauthorized to delete this subject'}), 403
+
+            db.session.delete(subject_to_delete)
+            db.session.commit()
+            return jsonify({'message': 'Subject deleted successfully'}), 200
+        else:
+            return jsonify({'message': 'Unauthorized'}), 403
+
+    return jsonify({'message': 'Invalid request method'}), 405  # Handle unsupported methods
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+import click
+from flask import Blueprint, current_app, jsonify, request
+from models import Teacher
+from routes.utils import token_required
+from changelog import changes_since, latest_position, oldest_position, purge_change_log
+
+bp = Blueprint('sync', __name__, cli_group=None)
+
+
+## Changes since a sync position, for offline clients (teachers only) ##
+@bp.route('/sync', methods=['GET'])
+@token_required
+def sync(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can sync.'}), 403
+
+    # Without `since`, just the current position: take it before a full reload, then sync from it
+    if 'since' not in request.args:
+        return jsonify({'changes': {}, 'next': latest_position(), 'has_more': False}), 200
+
+    since = request.args.get('since', type=int)
+    limit = request.args.get('limit', current_app.config['SYNC_BATCH_SIZE'], type=int)
+    if since is None or since < 0:
+        return jsonify({'message': 'since must be a sync position from an earlier /sync'}), 400
+    limit = max(1, min(limit, current_app.config['SYNC_BATCH_SIZE']))
+
+    # Entries after `since` have been purged: the client has to reload everything
+    oldest = oldest_position()
+    if oldest is not None and since < oldest:
+        return jsonify({'message': 'Changes since this position are no longer available. Reload and sync from next.',
+                        'next': latest_position()}), 410
+
+    changes, next_position, has_more = changes_since(since, limit)
+    return jsonify({'changes': changes, 'next': next_position, 'has_more': has_more}), 200
+
+
+## Delete old change log entries (run periodically, e.g. daily from cron) ##
+@bp.cli.command('purge-change-log')
+@click.option('--days', default=90, show_default=True, help='Keep entries from this many days.')
+def purge_change_log_command(days):
+    deleted = purge_change_log(datetime.utcnow() - timedelta(days=days))
+    click.echo(f'Deleted {deleted} change log entries')
@@ -0,0 +1,110 @@
+import time
+import click
+from flask import Blueprint, jsonify, request
+from models import School, Subject, Teacher, TeacherUnavailability, TimetableSlot, db
+from routes.utils import token_required
+from tenancy import school_by_code, school_scope
+from timetable import generate_timetable, grid
+
+bp = Blueprint('timetable', __name__, cli_group=None)
+
+
+def summary(solver, start):
+    return {
+        'lessons': len(solver.slot),
+        'clashes': solver.hard,
+        'crowded_days': solver.soft,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+## The timetable, by class, teacher, day or period (anyone logged in) ##
+@bp.route('/timetable', methods=['GET'])
+@token_required
+def get_timetable(current_user):
+    query = (db.session.query(TimetableSlot.day, TimetableSlot.period, TimetableSlot.class_id,
+                              TimetableSlot.subject_id, Subject.subject_name, TimetableSlot.teacher_id)
+             .join(Subject, Subject.id == TimetableSlot.subject_id))
+    for name in ('class_id', 'teacher_id', 'day', 'period'):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            query = query.filter(getattr(TimetableSlot, name) == value)
+    lessons = query.order_by(TimetableSlot.day, TimetableSlot.period, TimetableSlot.class_id)
+    return jsonify([lesson._asdict() for lesson in lessons]), 200
+
+
+## Generate the school's timetable from its subjects (teachers only) ##
+@bp.route('/timetable/generate', methods=['POST'])
+@token_required
+def generate(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized. Only teachers can generate the timetable.'}), 403
+
+    start = time.perf_counter()
+    try:
+        solver = generate_timetable()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if solver.hard:
+        db.session.rollback()
+        return jsonify(dict(summary(solver, start),
+                            message='No clash-free timetable found in time; the current one is kept')), 409
+    db.session.commit()
+    return jsonify(dict(summary(solver, start), message='Timetable generated')), 200
+
+
+## The periods the logged-in teacher can't teach; PUT replaces them ##
+@bp.route('/timetable/unavailable', methods=['GET', 'PUT'])
+@token_required
+def unavailable_periods(current_user):
+    if not isinstance(current_user, Teacher):
+        return jsonify({'message': 'Unauthorized'}), 403
+
+    if request.method == 'PUT':
+        days, periods = grid()
+        data = request.get_json(silent=True) or {}
+        unavailable = {(item.get('day'), item.get('period')) for item in data.get('periods', [])
+                       if isinstance(item, dict)}
+        if len(unavailable) != len(data.get('periods', [])) or not all(
+                isinstance(day, int) and isinstance(period, int) and 0 <= day < days and 0 <= period < periods
+                for day, period in unavailable):
+            return jsonify({'message': f'periods must be a list of {{"day": 0-{days - 1}, '
+                                       f'"period": 0-{periods - 1}}}, each once'}), 400
+        TeacherUnavailability.query.filter_by(teacher_id=current_user.id).delete()
+        db.session.add_all([TeacherUnavailability(teacher_id=current_user.id, day=day, period=period)
+                            for day, period in unavailable])
+        db.session.commit()
+
+    rows = (TeacherUnavailability.query.filter_by(teacher_id=current_user.id)
+            .order_by(TeacherUnavailability.day, TeacherUnavailability.period))
+    return jsonify({'periods': [{'day': row.day, 'period': row.period} for row in rows]}), 200
+
+
+## Generate timetables from the command line ##
+@bp.cli.command('generate-timetable')
+@click.option('--school', 'school_code', help="The school's code (default: every school).")
+@click.option('--time-limit', type=float, help='Seconds to search (default: TIMETABLE_TIME_LIMIT).')
+def generate_timetables(school_code, time_limit):
+    school = school_by_code(school_code)
+    if school_code and not school:
+        raise click.BadParameter(f'No school with code {school_code!r}', param_hint='--school')
+    schools = [school] if school else School.query.order_by(School.id).all()
+    db.session.commit()  # each school in its own transaction (and schema)
+
+    for school in schools:
+        start = time.perf_counter()
+        with school_scope(school.id):
+            try:
+                solver = generate_timetable(time_limit)
+            except ValueError as e:
+                db.session.rollback()
+                click.echo(f'{school.code}: {e}')
+                continue
+            if solver.hard:
+                db.session.rollback()
+            else:
+                db.session.commit()
+        result = summary(solver, start)
+        click.echo(f"{school.code}: {result['lessons']} lessons, {result['clashes']} clashes, "
+                   f"{result['crowded_days']} crowded days in {result['seconds']}s"
+                   + (' - not saved, the current timetable is kept' if solver.hard else ''))
@@ -1,45 +1,58 @@
-# from functools import wraps
-# import os
-# from flask import config, current_app, session, jsonify, request
-# import jwt  
-# from seclinkkenya.server.models import User, db
-# # from flask import current_app 
-
-
-# # Helper function to check if a user is logged in
-# def login_required(f):
-#     @wraps(f)
-#     def decorated_function(*args, **kwargs):
-#         if 'parent_id' not in session:
-#             return jsonify({"error": "Unauthorized access, please log"}), 401
-#         return f(*args, **kwargs)
-#     return decorated_function
-
-# # Token required decorator
-# def token_required(f):
-#     @wraps(f)
-#     def decorated(*args, **kwargs):
-#         token = request.headers.get('Authorization')
-        
-#         if not token or not token.startswith("Bearer "):
-#             return jsonify({'message': 'Token is missing or incorrect format!'}), 403
-        
-#         try:
-#             # Extract token part from 'Bearer <token>'
-#             token = token.split()[1]
-#             decoded_token = jwt.decode(token, config.SECRET_KEY, algorithms=['HS256'])
-#             current_user = User.query.get(decoded_token['user_id'])
-#             if not current_user:
-#                 return jsonify({'message': 'User not found!'}), 404
-#         except jwt.ExpiredSignatureError:
-#             return jsonify({'message': 'Token has expired!'}), 401
-#         except jwt.InvalidTokenError:
-#             return jsonify({'message': 'Invalid token!'}), 401
-#         except Exception as e:
-#             return jsonify({'message': f'Error processing token: {str(e)}'}), 400
-        
-#         return f(current_user, *args, **kwargs)
-    
-#     return decorated
+from functools import wraps
+import jwt
+from flask import g, jsonify, request
+from models import Parent, Teacher, db
+from routes.auth import secret_key
+from tenancy import any_school, current_school_id, enter_school
 
 
+# Helper function to check allowed file extensions
+def allowed_file(filename):
+    ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx'}
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+# Token required decorator: validates the token issued by /login and passes the
+# logged-in Teacher or Parent to the view as its first argument
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+
+        if not token or not token.startswith("Bearer "):
+            return jsonify({'message': 'Token is missing or incorrect format!'}), 403
+
+        # Sub-requests of a /batch share the app context (and g), so a token is checked
+        # and its user loaded once per batch
+        token_users = g.setdefault('token_users', {})
+        if token in token_users:
+            return f(scoped(token_users[token]), *args, **kwargs)
+
+        try:
+            # Extract token part from 'Bearer <token>'
+            decoded_token = jwt.decode(token.split()[1], secret_key(), algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token has expired!'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Invalid token!'}), 401
+
+        model = {'Teacher': Teacher, 'Parent': Parent}.get(decoded_token.get('role'))
+        # Tokens without a school (see scoped()) look the user up in every school
+        with any_school():
+            current_user = db.session.get(model, decoded_token.get('user_id')) if model else None
+        if not current_user:
+            return jsonify({'message': 'User not found!'}), 404
+
+        token_users[token] = current_user
+        return f(scoped(current_user), *args, **kwargs)
+
+    return decorated
+
+
+# Tokens from before multi-school support carry no school_id; scope by the user's school
+def scoped(user):
+    if current_school_id() is None:
+        enter_school(user.school_id)
+    return user
+
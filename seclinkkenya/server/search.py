@@ -0,0 +1,210 @@
+import re
+from sqlalchemy import event, text
+from extraction import extract_text
+from models import db
+from storage import get_storage
+from tenancy import current_school_id
+
+# Full-text search over learning materials (title, subject name and the text of the file).
+# PostgreSQL keeps a weighted tsvector with a GIN index in `learning_material_search`;
+# SQLite uses the FTS5 virtual table `learning_material_fts` (rowid = material id).
+
+# Made by create_search_index() rather than the models, so migrations leave them alone
+# (the FTS5 table keeps its data in shadow tables named after it)
+SEARCH_TABLES = {'learning_material_search', 'learning_material_fts'} | {
+    f'learning_material_fts_{shadow}' for shadow in ('data', 'idx', 'content', 'docsize', 'config')}
+
+MAX_BODY_CHARS = 200000  # enough for ranking and snippets, keeps tsvectors well under 1 MB
+
+# Only the newest RANK_WINDOW matches of a query are ranked. Scoring every match of a very
+# common term costs hundreds of ms at 100k documents; the window keeps every query in the
+# tens of ms, and very common terms are poor relevance signals anyway.
+RANK_WINDOW = 2000
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS learning_material_search (
+        material_id INTEGER PRIMARY KEY REFERENCES learning_material (id) ON DELETE CASCADE,
+        title TEXT NOT NULL,
+        subject TEXT,
+        body TEXT,
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(subject, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'C')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_learning_material_search_document "
+    "ON learning_material_search USING GIN (document)",
+]
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS learning_material_fts "
+    "USING fts5(title, subject, body, tokenize = 'porter unicode61')",
+]
+
+
+def create_search_index(connection):
+    if connection.dialect.name == 'postgresql':
+        statements = POSTGRES_DDL
+    elif connection.dialect.name == 'sqlite':
+        statements = SQLITE_DDL
+    else:
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def drop_search_index(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DROP TABLE IF EXISTS learning_material_search'))
+    elif connection.dialect.name == 'sqlite':
+        connection.execute(text('DROP TABLE IF EXISTS learning_material_fts'))
+
+
+# Keep the index in step with db.create_all() / db.drop_all() (used by seed.py)
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    drop_search_index(connection)
+
+
+## Indexing ##
+
+def index_material(material, body=None):
+    # Add or replace a material's entry; the caller commits
+    if body is None:
+        try:
+            with get_storage().local_path(material.file_path) as path:
+                body = extract_text(path)
+        except FileNotFoundError:
+            body = ''
+    params = {
+        'id': material.id,
+        'title': material.title,
+        'subject': material.subject.subject_name if material.subject else None,
+        'body': body[:MAX_BODY_CHARS],
+    }
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text("""
+            INSERT INTO learning_material_search (material_id, title, subject, body)
+            VALUES (:id, :title, :subject, :body)
+            ON CONFLICT (material_id) DO UPDATE
+            SET title = excluded.title, subject = excluded.subject, body = excluded.body
+        """), params)
+    elif dialect == 'sqlite':
+        db.session.execute(text('DELETE FROM learning_material_fts WHERE rowid = :id'), params)
+        db.session.execute(text("""
+            INSERT INTO learning_material_fts (rowid, title, subject, body)
+            VALUES (:id, :title, :subject, :body)
+        """), params)
+
+
+def remove_material(material_id):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(text('DELETE FROM learning_material_search WHERE material_id = :id'), {'id': material_id})
+    elif dialect == 'sqlite':
+        db.session.execute(text('DELETE FROM learning_material_fts WHERE rowid = :id'), {'id': material_id})
+
+
+## Querying ##
+
+def search_terms(query):
+    # Only word characters reach the query parser, so user input can't break its syntax
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def search_materials(query, limit, offset):
+    # Returns (total, [(material_id, rank, snippet), ...]) ordered by relevance; total is
+    # capped at RANK_WINDOW. Every term must match, after stemming ("equations" finds "equation").
+    terms = search_terms(query)
+    if not terms:
+        return 0, []
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return _search_postgres(terms, limit, offset)
+    if dialect == 'sqlite':
+        return _search_sqlite(terms, limit, offset)
+    return 0, []
+
+
+def school_join(id_column):
+    # Raw SQL is not scoped by tenancy.py, so limit matches to the current school here
+    if current_school_id() is None:
+        return '', {}
+    return (f'JOIN learning_material AS scoped ON scoped.id = {id_column} AND scoped.school_id = :school_id',
+            {'school_id': current_school_id()})
+
+
+def _search_postgres(terms, limit, offset):
+    tsquery = ' & '.join(terms)
+    scope, scope_params = school_join('learning_material_search.material_id')
+    params = {'q': tsquery, 'limit': limit, 'offset': offset, 'window': RANK_WINDOW, **scope_params}
+    total = db.session.execute(text(f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM learning_material_search {scope}
+            WHERE document @@ to_tsquery('english', :q)
+            LIMIT :window
+        ) AS matches
+    """), params).scalar()
+    rows = db.session.execute(text(f"""
+        SELECT material_id, ts_rank_cd(document, to_tsquery('english', :q)) AS rank
+        FROM (
+            SELECT material_id, document FROM learning_material_search {scope}
+            WHERE document @@ to_tsquery('english', :q)
+            ORDER BY material_id DESC
+            LIMIT :window
+        ) AS recent
+        ORDER BY rank DESC, material_id DESC
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    if not rows:
+        return total, []
+    # ts_headline is costly, so only run it on the rows returned
+    snippets = dict(db.session.execute(text("""
+        SELECT material_id,
+               ts_headline('english', coalesce(body, ''), to_tsquery('english', :q),
+                           'MaxFragments=1, MaxWords=20, MinWords=8')
+        FROM learning_material_search
+        WHERE material_id = ANY(:ids)
+    """), {'q': tsquery, 'ids': [row.material_id for row in rows]}).all())
+    return total, [(row.material_id, float(row.rank), snippets.get(row.material_id)) for row in rows]
+
+
+def _search_sqlite(terms, limit, offset):
+    match = ' '.join(f'"{term}"' for term in terms)
+    scope, scope_params = school_join('learning_material_fts.rowid')
+    params = {'q': match, 'limit': limit, 'offset': offset, 'window': RANK_WINDOW, **scope_params}
+    total = db.session.execute(text(f"""
+        SELECT count(*) FROM (
+            SELECT 1 FROM learning_material_fts {scope} WHERE learning_material_fts MATCH :q LIMIT :window
+        )
+    """), params).scalar()
+    # bm25() is lower-is-better; weights favour title over subject over body.
+    # FTS5 walks matches in rowid order, so the window stops after RANK_WINDOW rows.
+    rows = db.session.execute(text(f"""
+        SELECT material_id, -score AS rank FROM (
+            SELECT learning_material_fts.rowid AS material_id, bm25(learning_material_fts, 10.0, 5.0, 1.0) AS score
+            FROM learning_material_fts {scope}
+            WHERE learning_material_fts MATCH :q
+            ORDER BY learning_material_fts.rowid DESC
+            LIMIT :window
+        )
+        ORDER BY score, material_id DESC
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+    if not rows:
+        return total, []
+    ids = [row.material_id for row in rows]
+    snippets = dict(db.session.execute(text(f"""
+        SELECT rowid, snippet(learning_material_fts, 2, '<b>', '</b>', '...', 16)
+        FROM learning_material_fts
+        WHERE learning_material_fts MATCH :q AND rowid IN ({', '.join(str(int(i)) for i in ids)})
+    """), {'q': match}).all())
+    return total, [(row.material_id, row.rank, snippets.get(row.material_id)) for row in rows]
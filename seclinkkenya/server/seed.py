@@ -1,15 +1,9 @@
-from flask import Flask
-from models import db, Teacher, Parent, Student, Class, Subject, Grade, Notifications, LearningMaterial
-from flask_bcrypt import Bcrypt
+from app import create_app
+from models import db, School, Teacher, Parent, Student, Class, Subject, Grade, Notifications, LearningMaterial
 from datetime import datetime, date, timezone
-from config import Config
 from werkzeug.security import generate_password_hash, check_password_hash
 
-app = Flask(__name__)
-app.config.from_object(Config)
-
-db.init_app(app)
-bcrypt = Bcrypt(app)
+app = create_app()
 
 def seed_data():
     with app.app_context():
@@ -17,6 +11,10 @@ def seed_data():
             db.drop_all()  # Be cautious: This will delete all data in the database
             db.create_all()
 
+            # The first school, id 1: everything below belongs to it (DEFAULT_SCHOOL_ID)
+            db.session.add(School(name="SecLink Kenya", code="default"))
+            db.session.commit()
+
             # Sample Teachers
             teacher_1 = Teacher(
                 name="Fredrick Kariuki",
@@ -0,0 +1,83 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; responses are always JSON without it
+    msgpack = None
+
+# Encoding of response bodies. to_dict() methods return dates and datetimes as they are,
+# and they are written as ISO 8601 strings here: by orjson in C when it is installed,
+# rather than through an isoformat() call per value.
+# Clients that send `Accept: application/msgpack` (the mobile app) get MessagePack instead,
+# with the same structure and the same date strings.
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Integer keys become strings, as with the stdlib encoder
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(obj):
+    # What neither encoder handles itself (orjson does datetimes, UUIDs and dataclasses natively)
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def wants_msgpack():
+    # JSON unless the client prefers MessagePack; */* and no Accept header get JSON
+    if msgpack is None or not has_request_context():
+        return False
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(_default)
+    # Keys stay in the order to_dict() builds them; sorting every object of a long list costs time
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # Options only the stdlib encoder understands (e.g. indent) fall back to it
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if wants_msgpack():
+            response = self._app.response_class(msgpack.packb(obj, default=_default), mimetype=MSGPACK_MIMETYPE)
+        elif orjson is None or self._app.debug:
+            # Flask's own response, pretty-printed in debug mode
+            response = super().response(obj)
+        else:
+            response = self._app.response_class(
+                orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE),
+                mimetype=self.mimetype)
+        if msgpack is not None:
+            response.vary.add('Accept')
+        return response
+
+
+def init_json(app):
+    app.json = JSONProvider(app)
@@ -0,0 +1,165 @@
+import mimetypes
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from flask import current_app, redirect, request
+from werkzeug.utils import secure_filename
+from compression import (VARIANT_SUFFIXES, available_encodings, choose_encoding, compressed_variants,
+                         remove_variants, send_material, write_variants)
+from tenancy import current_school_id
+
+# Where uploaded learning materials are kept. A material's `file_path` is its location in
+# the configured backend:
+#   - local: a path under UPLOAD_FOLDER (default instance/uploads), served by the app;
+#   - s3: an object key in S3_BUCKET (AWS S3, or MinIO etc. via S3_ENDPOINT_URL). Downloads
+#     redirect to a presigned URL valid for S3_PRESIGN_SECONDS, so the bytes never go
+#     through the app, and every node sees the same files.
+# The precompressed copies (see compression.py) live next to the original in both.
+# Files are stored as `<school id>-<uuid>-<name>` (storage_name()), so uploads never replace
+# each other, and downloads go through the material's row, so only its school can fetch it.
+
+
+class LocalStorage:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def location(self, filename):
+        return os.path.join(self.directory, filename)
+
+    def save(self, file, filename):
+        location = self.location(filename)
+        file.save(location)
+        return location
+
+    def delete(self, location):
+        os.remove(location)
+        remove_variants(location)
+
+    @contextmanager
+    def local_path(self, location):
+        yield location
+
+    def write_variants(self, location, path):
+        return write_variants(path)
+
+    def download(self, filename):
+        return send_material(self.directory, filename)
+
+
+class S3Storage:
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, presign_seconds=300):
+        try:
+            import boto3  # only needed here, and slow to import
+        except ImportError:
+            raise RuntimeError('STORAGE_BACKEND=s3 needs the boto3 package')
+        # Credentials come from the usual AWS environment variables or instance role
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_seconds = presign_seconds
+
+    def location(self, filename):
+        return self.prefix + filename
+
+    def save(self, file, filename):
+        key = self.location(filename)
+        self.client.upload_fileobj(file.stream, self.bucket, key, ExtraArgs={'ContentType': content_type(filename)})
+        # Copies of a file uploaded earlier under the same name are stale now
+        self._delete_variants(key)
+        return key
+
+    def delete(self, location):
+        self.client.delete_object(Bucket=self.bucket, Key=location)
+        self._delete_variants(location)
+
+    def _delete_variants(self, key):
+        self.client.delete_objects(Bucket=self.bucket, Delete={
+            'Objects': [{'Key': key + suffix} for suffix in VARIANT_SUFFIXES.values()], 'Quiet': True})
+
+    @contextmanager
+    def local_path(self, location):
+        # A temporary copy for the parsers, which need a file; same extension, as they go by it
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(location)[1]) as copy:
+            try:
+                self.client.download_fileobj(self.bucket, location, copy)
+            except self.client.exceptions.ClientError as e:
+                if not_found(e):
+                    raise FileNotFoundError(location) from e
+                raise
+            copy.flush()
+            yield copy.name
+
+    def write_variants(self, location, path):
+        with open(path, 'rb') as f:
+            variants = compressed_variants(location, f.read())
+        for encoding, data in variants.items():
+            self.client.put_object(Bucket=self.bucket, Key=location + VARIANT_SUFFIXES[encoding], Body=data,
+                                   ContentType=content_type(location), ContentEncoding=encoding)
+        return list(variants)
+
+    def download(self, filename):
+        key = self.location(filename)
+        # The best copy the client accepts; a HEAD per encoding tried, usually just one
+        accepted = [e for e in available_encodings() if request.accept_encodings[e]]
+        while accepted:
+            encoding = choose_encoding(request.accept_encodings, accepted)
+            if self._exists(key + VARIANT_SUFFIXES[encoding]):
+                key += VARIANT_SUFFIXES[encoding]
+                break
+            accepted.remove(encoding)
+        else:
+            if not self._exists(key):
+                raise FileNotFoundError(filename)
+        url = self.client.generate_presigned_url('get_object', ExpiresIn=self.presign_seconds, Params={
+            'Bucket': self.bucket, 'Key': key,
+            'ResponseContentDisposition': f'attachment; filename="{filename}"'})
+        response = redirect(url, 302)
+        # The URL expires, so the redirect must not be cached longer than it lives
+        response.headers['Cache-Control'] = f'private, max-age={max(self.presign_seconds - 30, 0)}'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError as e:
+            if not_found(e):
+                return False
+            raise
+        return True
+
+
+def storage_name(filename):
+    # A new name for every upload, in the current school
+    return f'{current_school_id()}-{uuid.uuid4().hex}-{secure_filename(filename)}'
+
+
+def not_found(error):
+    return error.response['Error']['Code'] in ('404', 'NoSuchKey')
+
+
+def content_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def create_storage(config, instance_path):
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage(config.get('UPLOAD_FOLDER') or os.path.join(instance_path, 'uploads'))
+    if backend == 's3':
+        if not config.get('S3_BUCKET'):
+            raise RuntimeError('STORAGE_BACKEND=s3 needs S3_BUCKET')
+        return S3Storage(config['S3_BUCKET'], prefix=config.get('S3_PREFIX', ''),
+                         endpoint_url=config.get('S3_ENDPOINT_URL'), region=config.get('S3_REGION'),
+                         presign_seconds=config.get('S3_PRESIGN_SECONDS', 300))
+    raise RuntimeError(f'Unknown STORAGE_BACKEND {backend!r}')
+
+
+def get_storage():
+    # Made on first use, as most requests never touch files
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        storage = current_app.extensions['storage'] = create_storage(current_app.config, current_app.instance_path)
+    return storage
@@ -0,0 +1,176 @@
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+import jwt
+from flask import current_app, has_request_context, request
+from sqlalchemy import event, select
+from sqlalchemy.orm import with_loader_criteria
+from models import School, TenantMixin, db
+
+# Multi-school tenancy. Every tenant table has a `school_id`; the school of the current
+# request comes from its token. While a school is set:
+#   - every ORM query (including lazy loads, session.get and bulk UPDATE/DELETE) only sees
+#     that school's rows;
+#   - new rows get its school_id, and writing rows of another school is refused.
+# Without a school (scripts, the CLI) queries see every school and new rows go to
+# DEFAULT_SCHOOL_ID. A request without a school (no token) can't query tenant tables at
+# all, except inside any_school() for lookups meant to span schools (logging in by username).
+# Ids a request refers to (a class, a parent) are looked up with in_school().
+#
+# With TENANCY_SCHEMAS on PostgreSQL, a school created with `flask create-school --schema`
+# keeps its tables in its own schema: each transaction of a request for that school sets
+# its search_path first. Schools without a schema use the tables in `public`.
+
+# Tables every school shares, in `public` in schema mode; the rest are per school
+SHARED_TABLES = {'schools', 'change_log', 'audit_log'}
+
+_current_school = ContextVar('current_school', default=None)
+_any_school = ContextVar('any_school', default=False)
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def current_school_id():
+    return _current_school.get()
+
+
+@contextmanager
+def school_scope(school_id):
+    # Run a block (e.g. in a worker thread or a CLI command) as one school
+    token = _current_school.set(school_id)
+    try:
+        yield
+    finally:
+        _current_school.reset(token)
+
+
+@contextmanager
+def any_school():
+    # Lookups across every school inside a request that has no school yet
+    token = _any_school.set(True)
+    try:
+        yield
+    finally:
+        _any_school.reset(token)
+
+
+def in_school(model, id):
+    # The row with this id if it belongs to the current school, else None. For ids taken
+    # from a request body, which the query scoping can't see once they're in a foreign key.
+    obj = db.session.get(model, id) if id is not None else None
+    return obj if obj is not None and obj.school_id == current_school_id() else None
+
+
+def enter_school(school_id):
+    # Scope the rest of the current request to a school; undone when the request ends
+    request.environ.setdefault('seclink.school_scope', []).append(_current_school.set(school_id))
+    if db.session().in_transaction():
+        # e.g. after looking up the school: switch the transaction already under way too
+        _use_school_schema(db.session, None, db.session.connection())
+
+
+def school_by_code(code):
+    return School.query.filter_by(code=code).first() if code else None
+
+
+def default_school_id():
+    return current_app.config.get('DEFAULT_SCHOOL_ID', 1)
+
+
+## Request scope ##
+
+def _school_from_token():
+    # Decoded only; token_required still checks the token and loads its user
+    from routes.auth import secret_key
+    token = request.headers.get('Authorization', '')
+    if not token.startswith('Bearer '):
+        return
+    try:
+        payload = jwt.decode(token.split()[1], secret_key(), algorithms=['HS256'])
+    except jwt.InvalidTokenError:
+        return
+    if isinstance(payload.get('school_id'), int):
+        enter_school(payload['school_id'])
+
+
+def _leave_school(exception=None):
+    for token in reversed(request.environ.pop('seclink.school_scope', [])):
+        _current_school.reset(token)
+
+
+def init_tenancy(app):
+    app.before_request(_school_from_token)
+    app.teardown_request(_leave_school)
+
+
+## Query scoping ##
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _scope_to_school(execute_state):
+    school_id = current_school_id()
+    if execute_state.is_column_load:
+        return
+    if school_id is None:
+        if has_request_context() and not _any_school.get() and any(
+                issubclass(mapper.class_, TenantMixin) for mapper in execute_state.all_mappers):
+            raise PermissionError('Tenant tables were queried in a request without a school')
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(with_loader_criteria(
+            TenantMixin, lambda cls: cls.school_id == school_id, include_aliases=True))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _assign_school(session, flush_context, instances):
+    school_id = current_school_id()
+    for obj in session.new:
+        if isinstance(obj, TenantMixin) and obj.school_id is None:
+            obj.school_id = school_id if school_id is not None else default_school_id()
+    if school_id is None:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, TenantMixin) and obj.school_id != school_id:
+            raise PermissionError(f'{type(obj).__name__} {obj.id} belongs to another school')
+
+
+## Schema per school (PostgreSQL) ##
+
+def school_schema(connection, school_id):
+    # Schools never change schema, so the answer is kept for the life of the process
+    if school_id not in _schemas:
+        schema = connection.execute(select(School.schema_name).where(School.id == school_id)).scalar()
+        with _schemas_lock:
+            _schemas[school_id] = schema
+    return _schemas[school_id]
+
+
+def use_schema(connection, schema):
+    # SET LOCAL: only for this transaction, so pooled connections come back clean
+    connection.exec_driver_sql(
+        f'SET LOCAL search_path TO {connection.dialect.identifier_preparer.quote(schema)}, public')
+
+
+@event.listens_for(db.session, 'after_begin')
+def _use_school_schema(session, transaction, connection):
+    school_id = current_school_id()
+    if (school_id is None or connection.dialect.name != 'postgresql'
+            or not current_app.config.get('TENANCY_SCHEMAS')):
+        return
+    schema = school_schema(connection, school_id)
+    if schema:
+        use_schema(connection, schema)
+
+
+def create_school_schema(connection, school):
+    if connection.dialect.name != 'postgresql':
+        raise ValueError('A schema per school needs PostgreSQL')
+    school.schema_name = f'school_{school.id}'
+    if not re.fullmatch(r'[a-z0-9_]+', school.schema_name):
+        raise ValueError(f'Invalid schema name {school.schema_name!r}')
+    connection.exec_driver_sql(f'CREATE SCHEMA {connection.dialect.identifier_preparer.quote(school.schema_name)}')
+    use_schema(connection, school.schema_name)
+    # checkfirst would find the tables in public through the search_path
+    db.metadata.create_all(connection, tables=[table for table in db.metadata.sorted_tables
+                                               if table.name not in SHARED_TABLES], checkfirst=False)
@@ -0,0 +1,150 @@
+import os
+import shutil
+import sys
+import uuid
+
+import jwt
+import pytest
+from sqlalchemy import create_engine, make_url, text
+
+# The server's modules import each other by their flat names (`from models import db`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from config import Config, engine_options  # noqa: E402
+from models import School, db  # noqa: E402
+
+
+def make_config(directory):
+    class TestConfig(Config):
+        JWT_SECRET_KEY = 'a-secret-key-only-used-by-the-tests'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{directory}/test.db'
+        UPLOAD_FOLDER = str(directory / 'uploads')
+        RATELIMIT_ENABLED = False
+        IDEMPOTENCY_STORAGE_URL = 'memory://'
+        AUDIT_FLUSH_INTERVAL = 0
+        MAIL_USERNAME = None
+        MATERIAL_WORKERS = 0
+        SQLALCHEMY_REPLICA_URIS = []
+        PARENT_FEED_CACHE = False
+        TENANCY_SCHEMAS = False
+
+    return TestConfig
+
+
+# A PostgreSQL server where the tests may create and drop databases, e.g.
+# postgresql://postgres@localhost/postgres. Tests of PostgreSQL-only code are skipped without it.
+POSTGRES_URI = os.getenv('TEST_POSTGRES_URI')
+
+
+def close(app):
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def seeded(tmp_path_factory):
+    # Two schools with the same kinds of users, made once: password hashing makes signing
+    # up and logging in slow. Each test gets a copy of the database. Ids differ between the
+    # schools, as the tables are shared.
+    directory = tmp_path_factory.mktemp('seeded')
+    app = create_app(make_config(directory))
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([School(name='Alliance', code='alliance'), School(name='Kenya High', code='kenyahigh')])
+        db.session.commit()
+    client = app.test_client()
+    schools = SchoolUsers(client, 'a', 'alliance'), SchoolUsers(client, 'b', 'kenyahigh')
+    close(app)
+    return directory / 'test.db', schools
+
+
+@pytest.fixture
+def config(tmp_path, seeded):
+    shutil.copy(seeded[0], tmp_path / 'test.db')
+    return make_config(tmp_path)
+
+
+@pytest.fixture
+def schools(seeded):
+    return seeded[1]
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    yield app
+    close(app)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def postgres_app(tmp_path):
+    # An app on a new PostgreSQL database with the two (empty) schools, dropped afterwards
+    if not POSTGRES_URI:
+        pytest.skip('Set TEST_POSTGRES_URI to run the PostgreSQL tests')
+    name = f'seclink_test_{uuid.uuid4().hex[:12]}'
+    admin = create_engine(POSTGRES_URI, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE {name}'))
+    uri = make_url(POSTGRES_URI).set(database=name).render_as_string(hide_password=False)
+
+    class PostgresConfig(make_config(tmp_path)):
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri)
+
+    app = create_app(PostgresConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([School(name='Alliance', code='alliance'), School(name='Kenya High', code='kenyahigh')])
+        db.session.commit()
+    yield app
+    close(app)
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE {name} WITH (FORCE)'))
+    admin.dispose()
+
+
+def signup(client, username, role, school):
+    response = client.post('/signup', json={'name': username.title(), 'username': username, 'password': 'pw',
+                                            'email': f'{username}@example.com', 'role': role,
+                                            'subject': 'Mathematics', 'school': school})
+    assert response.status_code == 201, response.get_json()
+
+
+def login(client, username):
+    response = client.post('/login', json={'username': username, 'password': 'pw'})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def user_id(headers):
+    return jwt.decode(headers['Authorization'].split()[1], options={'verify_signature': False})['user_id']
+
+
+class SchoolUsers:
+    # A teacher, a parent, a class and a student of one school, with the users' tokens
+    def __init__(self, client, prefix, code):
+        signup(client, f'{prefix}teacher', 'Teacher', code)
+        signup(client, f'{prefix}parent', 'Parent', code)
+        self.teacher = login(client, f'{prefix}teacher')
+        self.parent = login(client, f'{prefix}parent')
+        self.teacher_id = user_id(self.teacher)
+        self.parent_id = user_id(self.parent)
+
+        response = client.post('/class', json={'class_name': f'{prefix.upper()} 1', 'teacher_id': self.teacher_id,
+                                               'form': 1}, headers=self.teacher)
+        assert response.status_code == 201, response.get_json()
+        self.class_id = response.get_json()['class']['id']
+
+        response = client.post('/add-student', json={'name': f'{prefix.title()} Student', 'dob': '2010-01-01',
+                                                     'overall_grade': 'B', 'class_id': self.class_id,
+                                                     'teacher_id': self.teacher_id, 'parent_id': self.parent_id},
+                               headers=self.teacher)
+        assert response.status_code == 200, response.get_json()
+        self.student_id = max(student['id'] for student in client.get('/students', headers=self.teacher).get_json())
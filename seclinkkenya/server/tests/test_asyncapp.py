@@ -0,0 +1,41 @@
+import io
+import os
+import pytest
+from starlette.testclient import TestClient
+from asyncapp import create_asgi_app
+from models import Notifications, db
+from tenancy import school_scope
+
+
+@pytest.fixture
+def client(config):
+    # Starlette's test client, for the routes asyncapp.py serves itself
+    app = create_asgi_app(config)
+    with TestClient(app) as client:
+        client.flask_app = app.state.flask_app
+        yield client
+
+
+## Downloads ##
+
+def test_download_needs_a_material_of_the_school(client, schools):
+    a, b = schools
+    response = client.post('/learning-material', headers=a.teacher, files={'file': ('notes.pdf', io.BytesIO(b'pdf'))},
+                           data={'title': 'Notes', 'student_id': str(a.student_id)})
+    filename = os.path.basename(response.json()['file_path'])
+    assert client.get(f'/download/{filename}', headers=a.parent).content == b'pdf'
+    assert client.get(f'/download/{filename}', headers=b.parent).status_code == 404
+    assert client.get('/download/notes.pdf', headers=a.parent).status_code == 404
+
+
+## Long polls ##
+
+def test_poll_stays_in_the_school(client, schools):
+    a, _ = schools
+    # Another school writing to the same parent id, e.g. through a script
+    with client.flask_app.app_context(), school_scope(2):
+        db.session.add(Notifications(message='Other school', parent_id=a.parent_id))
+        db.session.commit()
+    response = client.get('/notifications/poll?after=0&timeout=0', headers=a.parent)
+    assert response.status_code == 200 and response.json()['notifications'] == []
+    assert client.get('/notifications/poll?timeout=0', headers=a.parent).json()['after'] == 0
@@ -0,0 +1,118 @@
+import random
+import pytest
+from attendance import count_at, count_bits, from_bitmap, has_bit, mask_of, positions_of, to_bitmap
+from models import Attendance, Student, db
+from tenancy import school_scope
+
+TERM = {'from': '2026-01-05', 'to': '2026-01-30'}
+
+
+## Bitmaps ##
+
+@pytest.mark.parametrize('seed', range(5))
+def test_count_bits_counts_every_position(seed):
+    rng = random.Random(seed)
+    masks = [rng.getrandbits(45) for _ in range(rng.randrange(1, 40))]
+    planes = count_bits(masks)
+    for position in range(45):
+        assert count_at(planes, position) == sum(mask >> position & 1 for mask in masks)
+
+
+def test_count_bits_of_nothing():
+    assert count_bits([]) == [] and count_bits([0, 0]) == []
+    assert count_at([], 3) == 0
+
+
+def test_bitmaps_past_the_first_byte():
+    positions = [0, 7, 8, 9, 15, 16, 39]
+    bitmap = to_bitmap(mask_of(positions))
+    assert len(bitmap) == 5 and bitmap[1] == 0b10000011
+    assert from_bitmap(bitmap) == mask_of(positions)
+    assert list(positions_of(from_bitmap(bitmap))) == positions
+    assert [p for p in range(48) if has_bit(bitmap, p)] == positions
+    assert to_bitmap(0) == b'' and not has_bit(b'', 0)
+
+
+## Roll calls ##
+
+@pytest.fixture
+def pupils(app, schools):
+    # The seeded student and 11 more: register positions 0 to 11
+    a, _ = schools
+    with app.app_context(), school_scope(1):
+        students = [Student(name=f'Pupil {i}', dob='2010-01-01', class_id=a.class_id,
+                            teacher_id=a.teacher_id, parent_id=a.parent_id) for i in range(11)]
+        db.session.add_all(students)
+        db.session.commit()
+        return [a.student_id] + [student.id for student in students]
+
+
+def submit(client, school, *roll_calls):
+    response = client.post('/attendance', json={'roll_calls': list(roll_calls)}, headers=school.teacher)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['roll_calls']
+
+
+def roll_call(school, day, present, absent, lesson=0):
+    return {'class_id': school.class_id, 'date': day, 'lesson': lesson, 'present': present, 'absent': absent}
+
+
+def test_roll_call_of_a_large_class(app, client, schools, pupils):
+    a, _ = schools
+    present, absent = pupils[:3] + pupils[9:], pupils[3:9]
+    [result] = submit(client, a, roll_call(a, '2026-01-05', present, absent))
+    assert sorted(result['present']) == sorted(present) and sorted(result['absent']) == sorted(absent)
+    with app.app_context():
+        row = db.session.query(Attendance).one()
+        assert len(row.recorded) == 2 and from_bitmap(row.recorded) == 0xFFF
+        assert from_bitmap(row.present) == 0b111000000111
+
+
+def test_resending_corrects_only_those_named(client, schools, pupils):
+    a, _ = schools
+    submit(client, a, roll_call(a, '2026-01-05', pupils[:6], pupils[6:10]))  # the last two not taken
+    # Two present become absent, one absent becomes present, and the last two are added
+    [result] = submit(client, a, roll_call(a, '2026-01-05', [pupils[8], pupils[11]], [pupils[1], pupils[4], pupils[10]]))
+    assert sorted(result['present']) == sorted([pupils[i] for i in (0, 2, 3, 5, 8, 11)])
+    assert sorted(result['absent']) == sorted([pupils[i] for i in (1, 4, 6, 7, 9, 10)])
+
+    response = client.get(f'/attendance/classes/{a.class_id}', query_string={'date': '2026-01-05'}, headers=a.teacher)
+    assert response.status_code == 200
+    [stored] = response.get_json()
+    assert sorted(stored['present']) == sorted(result['present'])
+
+
+def test_absence_rates_match_each_students_roll_calls(client, schools, pupils):
+    a, _ = schools
+    rng = random.Random(46)
+    # {(day, lesson): {student id: present}}, kept alongside as the expected marks
+    marks = {}
+    for day in range(5, 31):
+        for lesson in (0, 1):
+            taken = [s for s in pupils if rng.random() < 0.9]
+            here = {s: rng.random() < 0.8 for s in taken}
+            marks[day, lesson] = dict(here)
+            submit(client, a, roll_call(a, f'2026-01-{day:02}', [s for s in taken if here[s]],
+                                        [s for s in taken if not here[s]], lesson))
+    # Corrections to some of them
+    for day, lesson in rng.sample(sorted(marks), 10):
+        fixes = {s: rng.random() < 0.5 for s in rng.sample(pupils, 4)}
+        marks[day, lesson].update(fixes)
+        submit(client, a, roll_call(a, f'2026-01-{day:02}', [s for s in fixes if fixes[s]],
+                                    [s for s in fixes if not fixes[s]], lesson))
+
+    response = client.get(f'/attendance/classes/{a.class_id}/summary', query_string=TERM, headers=a.teacher)
+    assert response.status_code == 200
+    summary = response.get_json()
+    by_student = {s['student_id']: s for s in summary['students']}
+    for student_id in pupils:
+        recorded = sum(student_id in marked for marked in marks.values())
+        absent = sum(marked.get(student_id) is False for marked in marks.values())
+        assert (by_student[student_id]['recorded'], by_student[student_id]['absent']) == (recorded, absent)
+        assert by_student[student_id]['absence_rate'] == round(absent / recorded, 4)
+
+        response = client.get(f'/attendance/students/{student_id}', query_string=TERM, headers=a.teacher)
+        assert (response.get_json()['recorded'], response.get_json()['absent']) == (recorded, absent)
+    assert summary['roll_calls'] == len(marks)
+    assert summary['recorded'] == sum(len(marked) for marked in marks.values())
+    assert summary['absent'] == sum(not here for marked in marks.values() for here in marked.values())
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from app import create_app
+from conftest import close
+
+
+@pytest.fixture
+def other_worker(config):
+    # Another process (or server) with the same configuration
+    app = create_app(config)
+    yield app.test_client()
+    close(app)
+
+
+def test_tokens_work_on_every_worker(client, other_worker, schools):
+    a, _ = schools
+    token = client.post('/login', json={'username': 'ateacher', 'password': 'pw'}).get_json()['token']
+    response = other_worker.get('/students', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+
+def test_tokens_signed_with_another_key_are_refused(client, schools):
+    a, _ = schools
+    token = jwt.encode({'user_id': a.teacher_id, 'role': 'Teacher', 'school_id': 1,
+                        'exp': datetime.utcnow() + timedelta(hours=1)}, 'a-secret-key-of-some-other-deployment', algorithm='HS256')
+    assert client.get('/students', headers={'Authorization': f'Bearer {token}'}).status_code == 401
+
+
+def test_production_needs_a_secret_key(config):
+    class NoKeyConfig(config):
+        JWT_SECRET_KEY = None
+        FLASK_ENV = 'production'
+
+    with pytest.raises(RuntimeError, match='SECRET_KEY'):
+        create_app(NoKeyConfig)
+
+
+def test_development_falls_back_to_a_key_of_the_process(config):
+    class NoKeyConfig(config):
+        JWT_SECRET_KEY = None
+        FLASK_ENV = 'development'
+
+    first, second = create_app(NoKeyConfig), create_app(NoKeyConfig)
+    assert first.config['JWT_SECRET_KEY'] and first.config['JWT_SECRET_KEY'] != second.config['JWT_SECRET_KEY']
+    close(first)
+    close(second)
@@ -0,0 +1,42 @@
+from models import Attendance, Subject, db
+
+
+def add_subject(client, school):
+    response = client.post('/subject', json={'subject_name': 'Biology', 'subject_code': 'BIO', 'class_id': school.class_id},
+                           headers=school.teacher)
+    assert response.status_code == 201
+    return response.get_json()['subject']['id']
+
+
+def batch(client, school, *sub_requests):
+    response = client.post('/batch', json={'requests': list(sub_requests)}, headers=school.teacher)
+    assert response.status_code == 200
+    return [sub_response['status'] for sub_response in response.get_json()['responses']]
+
+
+def roll_call(school):
+    return {'method': 'POST', 'path': '/attendance',
+            'body': {'class_id': school.class_id, 'date': '2026-01-12', 'present': [school.student_id]}}
+
+
+def test_failed_sub_request_leaves_nothing_for_the_next_commit(app, client, schools):
+    a, _ = schools
+    subject_id = add_subject(client, a)
+    # The rename is made before periods_per_week is found invalid
+    rename = {'method': 'PUT', 'path': '/subject',
+              'body': {'subject_id': subject_id, 'subject_name': 'Batched', 'periods_per_week': -1}}
+    assert batch(client, a, rename, roll_call(a)) == [400, 200]
+    with app.app_context():
+        assert db.session.get(Subject, subject_id).subject_name == 'Biology'
+        assert db.session.query(Attendance).count() == 1
+
+
+def test_sub_requests_commit_on_their_own(app, client, schools):
+    a, _ = schools
+    subject_id = add_subject(client, a)
+    rename = {'method': 'PUT', 'path': '/subject', 'body': {'subject_id': subject_id, 'subject_name': 'Batched'}}
+    bad_roll_call = {'method': 'POST', 'path': '/attendance', 'body': {'class_id': a.class_id, 'date': 'monday'}}
+    assert batch(client, a, rename, bad_roll_call, {'method': 'GET', 'path': '/students'}) == [200, 400, 200]
+    with app.app_context():
+        assert db.session.get(Subject, subject_id).subject_name == 'Batched'
+        assert db.session.query(Attendance).count() == 0
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from database import SQLiteWriteLock, serialize_writes
+from partitions import include_in_migrations
+from search import SEARCH_TABLES
+
+
+## SQLite write lock ##
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/lock.db')
+    serialize_writes(engine, SQLiteWriteLock(timeout=0.5))
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE t (x INTEGER)'))
+    yield engine
+    engine.dispose()
+
+
+def write(engine):
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO t VALUES (1)'))
+
+
+@pytest.mark.parametrize('discard', [
+    lambda conn: conn.invalidate(),
+    lambda conn: conn.connection.invalidate(soft=True),
+    lambda conn: conn.detach(),
+], ids=['invalidate', 'soft_invalidate', 'detach'])
+def test_discarded_connection_releases_the_write_lock(engine, discard):
+    conn = engine.connect()
+    conn.execute(text('INSERT INTO t VALUES (0)'))
+    discard(conn)
+    conn.close()
+    write(engine)
+
+
+def test_write_lock_is_held_until_the_transaction_ends(engine):
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO t VALUES (0)'))
+        with pytest.raises(SQLAlchemyTimeoutError):
+            write(engine)
+    write(engine)
+
+
+## Migrations ##
+
+@pytest.mark.parametrize('name', sorted(SEARCH_TABLES) + ['notifications_y2026m01', 'notifications_default'])
+def test_runtime_tables_are_left_out_of_migrations(name):
+    assert not include_in_migrations(name, 'table', {})
+
+
+def test_model_tables_are_in_migrations():
+    assert include_in_migrations('learning_materials', 'table', {})
+    assert include_in_migrations('notifications', 'table', {})
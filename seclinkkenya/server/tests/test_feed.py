@@ -0,0 +1,90 @@
+import shutil
+import sqlite3
+from app import create_app
+from conftest import close
+from models import Class, Grade, Parent, ParentFeed, Student, Subject, db
+from tenancy import school_scope
+
+
+## Read replicas ##
+
+def test_feed_cache_is_written_to_the_primary(tmp_path, config, schools):
+    shutil.copy(tmp_path / 'test.db', tmp_path / 'replica.db')
+
+    class ReplicaConfig(config):
+        SQLALCHEMY_REPLICA_URIS = [f'sqlite:///{tmp_path}/replica.db']
+        PARENT_FEED_CACHE = True
+
+    app = create_app(ReplicaConfig)
+    a, _ = schools
+    assert app.test_client().get('/parent/feed', headers=a.parent).status_code == 200
+    close(app)
+    app.extensions['replicas'].replicas[0].engine.dispose()
+
+    def cached(filename):
+        with sqlite3.connect(tmp_path / filename) as conn:
+            return conn.execute('SELECT parent_id FROM parent_feeds').fetchall()
+
+    assert cached('test.db') == [(a.parent_id,)]
+    assert cached('replica.db') == []
+
+
+## Invalidation ##
+
+def feed_versions(app):
+    with app.app_context():
+        return dict(db.session.query(ParentFeed.parent_id, ParentFeed.version))
+
+
+def test_subject_changes_refresh_the_feeds_of_its_classes(config, schools):
+    class CacheConfig(config):
+        PARENT_FEED_CACHE = True
+
+    app = create_app(CacheConfig)
+    client = app.test_client()
+    a, _ = schools
+    with app.app_context(), school_scope(1):
+        # A second class, whose student has another parent
+        parent = Parent(name='Other Parent', username='otherparent', email='otherparent@example.com', password='-')
+        other_class = Class(class_name='Form 1 South', teacher_id=a.teacher_id)
+        db.session.add_all([parent, other_class])
+        db.session.flush()
+        db.session.add(Student(name='Other Student', dob='2010-01-01', class_id=other_class.id,
+                               teacher_id=a.teacher_id, parent_id=parent.id))
+        subject = Subject(subject_name='Chemistry', subject_code='CHE', class_id=a.class_id, teacher_id=a.teacher_id)
+        db.session.add(subject)
+        db.session.flush()
+        db.session.add(Grade(student_id=a.student_id, subject_id=subject.id, grade='B'))
+        db.session.commit()
+        other_parent, other_class_id, subject_id = parent.id, other_class.id, subject.id
+
+    def subjects_in_feed():
+        feed = client.get('/parent/feed', headers=a.parent).get_json()
+        return [grade['subject'] for child in feed['children'] for grade in child['latest_grades']]
+
+    # Renamed: the cached feed isn't served again
+    assert subjects_in_feed() == ['Chemistry']
+    response = client.put('/subject', json={'subject_id': subject_id, 'subject_name': 'Physics'}, headers=a.teacher)
+    assert response.status_code == 200
+    assert subjects_in_feed() == ['Physics']
+
+    # Moved: the class it left and the class it joined
+    before = feed_versions(app)
+    with app.app_context(), school_scope(1):
+        db.session.get(Subject, subject_id).class_id = other_class_id
+        db.session.commit()
+    after = feed_versions(app)
+    assert after[a.parent_id] == before[a.parent_id] + 1 and after[other_parent] == before.get(other_parent, 0) + 1
+
+    # Deleted: its class
+    with app.app_context(), school_scope(1):
+        spare = Subject(subject_name='Art', subject_code='ART', class_id=other_class_id, teacher_id=a.teacher_id)
+        db.session.add(spare)
+        db.session.commit()
+        spare_id = spare.id
+    before = feed_versions(app)
+    response = client.delete('/subject', query_string={'subject_id': spare_id}, headers=a.teacher)
+    assert response.status_code == 200
+    after = feed_versions(app)
+    assert after[a.parent_id] == before[a.parent_id] and after[other_parent] == before[other_parent] + 1
+    close(app)
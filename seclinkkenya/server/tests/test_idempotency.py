@@ -0,0 +1,114 @@
+import threading
+import time
+from unittest import mock
+import pytest
+from flask import Flask
+from idempotency import create_store, idempotent
+from models import Notifications, Student, db
+
+
+def add_student(client, school, key, name='Retried'):
+    return client.post('/add-student', json={'name': name, 'dob': '2011-01-01', 'overall_grade': 'C',
+                                             'class_id': school.class_id, 'teacher_id': school.teacher_id,
+                                             'parent_id': school.parent_id},
+                       headers=dict(school.teacher, **{'Idempotency-Key': key}))
+
+
+def count(app, model):
+    with app.app_context():
+        return db.session.query(model).count()
+
+
+def test_retry_gets_the_first_response(app, client, schools):
+    a, _ = schools
+    first = add_student(client, a, 'key-1')
+    retry = add_student(client, a, 'key-1')
+    assert (retry.status_code, retry.data) == (first.status_code, first.data)
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert count(app, Student) == 3
+
+
+def test_key_reused_for_another_request(client, schools):
+    a, _ = schools
+    add_student(client, a, 'key-1')
+    assert add_student(client, a, 'key-1', name='Someone else').status_code == 422
+
+
+def test_keys_are_per_user(app, client, schools):
+    a, b = schools
+    add_student(client, a, 'key-1')
+    response = add_student(client, b, 'key-1')
+    assert 'Idempotent-Replayed' not in response.headers
+    assert count(app, Student) == 4
+
+
+def test_requests_without_a_key_are_not_replayed(app, client, schools):
+    a, _ = schools
+    for _ in range(2):
+        client.post('/notifications', json={'message': 'Hi', 'parent_id': a.parent_id}, headers=a.teacher)
+    assert count(app, Notifications) == 2
+
+
+def test_concurrent_duplicates_run_once(app, schools):
+    a, _ = schools
+    commit = db.session.commit
+
+    def slow_commit():
+        time.sleep(0.3)
+        commit()
+
+    responses = []
+
+    def send():
+        responses.append(app.test_client().post('/notifications', json={'message': 'Hi', 'parent_id': a.parent_id},
+                                                headers=dict(a.teacher, **{'Idempotency-Key': 'once'})))
+
+    with mock.patch.object(db.session, 'commit', side_effect=slow_commit):
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert [response.status_code for response in responses] == [200] * 4
+    assert sum('Idempotent-Replayed' in response.headers for response in responses) == 3
+    assert count(app, Notifications) == 1
+
+
+def test_failed_request_frees_its_key(app, client, schools):
+    a, _ = schools
+    with mock.patch.object(db.session, 'commit', side_effect=RuntimeError('database went away')):
+        response = client.post('/notifications', json={'message': 'Hi', 'parent_id': a.parent_id},
+                               headers=dict(a.teacher, **{'Idempotency-Key': 'retry-me'}))
+        assert response.status_code == 500
+    response = client.post('/notifications', json={'message': 'Hi', 'parent_id': a.parent_id},
+                           headers=dict(a.teacher, **{'Idempotency-Key': 'retry-me'}))
+    assert 'Idempotent-Replayed' not in response.headers
+    assert count(app, Notifications) == 1
+
+
+@pytest.mark.parametrize('url', ['memory://', 'fake://'])
+def test_duplicate_still_running_gets_409(url):
+    app = Flask(__name__)
+    app.config['IDEMPOTENCY_WAIT'] = 0.1
+    app.extensions['idempotency'] = create_store(url)
+    started, release = threading.Event(), threading.Event()
+
+    @app.post('/slow')
+    @idempotent('slow')
+    def slow():
+        started.set()
+        release.wait(5)
+        return {'done': True}, 201
+
+    first = []
+    thread = threading.Thread(target=lambda: first.append(app.test_client().post('/slow', headers={
+        'Idempotency-Key': 'k'})))
+    thread.start()
+    started.wait(5)
+    duplicate = app.test_client().post('/slow', headers={'Idempotency-Key': 'k'})
+    release.set()
+    thread.join()
+    assert duplicate.status_code == 409 and duplicate.headers['Retry-After']
+    assert first[0].status_code == 201
+    assert app.test_client().post('/slow', headers={'Idempotency-Key': 'k'}).status_code == 201
@@ -0,0 +1,65 @@
+import io
+import os
+from unittest import mock
+from sqlalchemy.exc import OperationalError
+from models import LearningMaterial, db
+
+
+def upload(client, school, name='notes.pdf', data=b'%PDF-1.4 notes', **form):
+    form = {'title': 'Notes', 'student_id': str(school.student_id), **form}
+    return client.post('/learning-material', data=dict(form, file=(io.BytesIO(data), name)), headers=school.teacher)
+
+
+def stored_files(app):
+    directory = app.config['UPLOAD_FOLDER']
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_same_name_in_two_schools_keeps_both(app, client, schools):
+    a, b = schools
+    path_a = upload(client, a, data=b'from a').get_json()['file_path']
+    path_b = upload(client, b, data=b'from b').get_json()['file_path']
+    assert path_a != path_b
+    assert os.path.basename(path_a).startswith('1-') and os.path.basename(path_b).startswith('2-')
+    assert client.get(f'/download/{os.path.basename(path_a)}', headers=a.parent).data == b'from a'
+    assert client.get(f'/download/{os.path.basename(path_b)}', headers=b.parent).data == b'from b'
+
+
+def test_download_needs_a_material_of_the_school(client, schools):
+    a, b = schools
+    filename = os.path.basename(upload(client, a).get_json()['file_path'])
+    assert client.get(f'/download/{filename}', headers=b.parent).status_code == 404
+    assert client.get(f'/download/{filename}', headers=b.teacher).status_code == 404
+    assert client.get('/download/notes.pdf', headers=a.parent).status_code == 404
+
+
+def test_replacing_the_file_deletes_the_old_one(app, client, schools):
+    a, _ = schools
+    old_path = upload(client, a).get_json()['file_path']
+    with app.app_context():
+        material_id = db.session.query(LearningMaterial.id).scalar()
+    response = client.put('/learning-material', data={'id': str(material_id), 'file': (io.BytesIO(b'v2'), 'notes.pdf')},
+                          headers=a.teacher)
+    assert response.status_code == 200
+    with app.app_context():
+        new_path = db.session.get(LearningMaterial, material_id).file_path
+    assert new_path != old_path and os.path.exists(new_path)
+    assert not os.path.exists(old_path)
+
+
+def test_bad_forms_store_nothing(app, client, schools):
+    a, b = schools
+    assert upload(client, a, title='').status_code == 400
+    assert upload(client, a, student_id='').status_code == 400
+    assert upload(client, a, student_id=str(b.student_id)).status_code == 404
+    assert upload(client, a, subject_id='999').status_code == 404
+    assert stored_files(app) == []
+
+
+def test_failed_commit_removes_the_file(app, client, schools):
+    a, _ = schools
+    with mock.patch.object(db.session, 'commit', side_effect=OperationalError('INSERT', {}, Exception('disk full'))):
+        assert upload(client, a).status_code == 500
+    assert stored_files(app) == []
+    with app.app_context():
+        assert db.session.query(LearningMaterial).count() == 0
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+import pytest
+from models import PasswordResetToken, db
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    # The reset links that would have been emailed, by address
+    links = {}
+    monkeypatch.setattr('routes.passwordreset.send_reset_email', lambda email, token: links.__setitem__(email, token))
+    return links
+
+
+def request_reset(client, email='aparent@example.com'):
+    response = client.post('/password-reset-request', json={'email': email})
+    assert response.status_code == 200
+
+
+def confirm(client, token, password='new-pw'):
+    return client.post('/password-reset-confirm', json={'token': token, 'new_password': password})
+
+
+def test_token_works_once(client, schools, sent):
+    request_reset(client)
+    token = sent['aparent@example.com']
+    assert confirm(client, token).status_code == 200
+    assert client.post('/login', json={'username': 'aparent', 'password': 'new-pw'}).status_code == 200
+    assert confirm(client, token, 'other-pw').status_code == 400
+    assert client.post('/login', json={'username': 'aparent', 'password': 'other-pw'}).status_code == 401
+
+
+def test_new_request_replaces_the_old_token(client, schools, sent):
+    request_reset(client)
+    first = sent['aparent@example.com']
+    request_reset(client)
+    assert confirm(client, first).status_code == 400
+    assert confirm(client, sent['aparent@example.com']).status_code == 200
+
+
+def test_expired_token_is_refused(app, client, schools, sent):
+    request_reset(client)
+    with app.app_context():
+        db.session.query(PasswordResetToken).update({'expiry_date': datetime.utcnow() - timedelta(minutes=1)})
+        db.session.commit()
+    assert confirm(client, sent['aparent@example.com']).status_code == 400
+
+
+def test_token_only_works_in_its_school(client, schools, sent):
+    request_reset(client)
+    _, secret = sent['aparent@example.com'].split('.', 1)
+    assert confirm(client, f'2.{secret}').status_code == 400
+    assert confirm(client, secret).status_code == 400
+
+
+def test_unknown_email_gets_the_same_answer(client, schools, sent):
+    response = client.post('/password-reset-request', json={'email': 'nobody@example.com'})
+    assert response.status_code == 200
+    assert sent == {}
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta
+import jwt
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from models import Class, Grade, Parent, Student, Subject, Teacher, db
+from rankings import refresh_rankings
+from tenancy import school_scope
+
+# (subject, grade) in the order they are given; a later grade in a subject replaces the earlier.
+# Means in KCSE points: stream 1 (form 1) Amina 12, Baraka 9, Chebet 9, Dan 6;
+# stream 2 (form 1) Njeri 11, Otieno 3; stream 3 (no form) Solo 9.
+GRADES = {
+    'stream 1': {'Amina': [('Maths', 'A'), ('English', 'A')],
+                 'Baraka': [('Maths', 'B'), ('English', 'B')],
+                 'Chebet': [('Maths', 'A-'), ('English', 'C+')],
+                 'Dan': [('Maths', 'A'), ('Maths', 'C'), ('English', 'C')]},
+    'stream 2': {'Njeri': [('Maths', 'A'), ('English', 'B+')],
+                 'Otieno': [('Maths', 'D'), ('English', 'D')]},
+    'stream 3': {'Solo': [('Maths', 'B')]},
+}
+
+
+def grade_students(school_id, teacher_id, parent_id, class_id):
+    # Through the ORM, as routes do: the flushes refresh the rankings. `class_id` is stream 1.
+    with school_scope(school_id):
+        streams = {'stream 1': db.session.get(Class, class_id),
+                   'stream 2': Class(class_name='1 South', teacher_id=teacher_id, form=1),
+                   'stream 3': Class(class_name='Remedial', teacher_id=teacher_id)}
+        streams['stream 1'].form = 1
+        db.session.add_all(streams.values())
+        subjects = {name: Subject(subject_name=name, subject_code=name[:3].upper(), class_id=class_id,
+                                  teacher_id=teacher_id) for name in ('Maths', 'English')}
+        db.session.add_all(subjects.values())
+        db.session.flush()
+
+        students = {}
+        for stream, marks in GRADES.items():
+            for name, grades in marks.items():
+                students[name] = Student(name=name, dob='2010-01-01', class_id=streams[stream].id,
+                                         teacher_id=teacher_id, parent_id=parent_id)
+                db.session.add(students[name])
+                db.session.flush()
+                for subject, grade in grades:
+                    db.session.add(Grade(student_id=students[name].id, subject_id=subjects[subject].id, grade=grade))
+                    db.session.flush()  # so a later grade gets a higher id
+        db.session.commit()
+        return ({name: student.id for name, student in students.items()},
+                {stream: cls.id for stream, cls in streams.items()})
+
+
+def rankings(client, headers, **args):
+    response = client.get('/rankings', query_string=args, headers=headers)
+    assert response.status_code == 200
+    return {ranking['name']: ranking for ranking in response.get_json()['rankings']}
+
+
+def column(rankings, key):
+    return {name: ranking[key] for name, ranking in rankings.items()}
+
+
+def check_form_one(client, headers, streams):
+    stream = rankings(client, headers, class_id=streams['stream 1'])
+    assert list(stream) == ['Amina', 'Baraka', 'Chebet', 'Dan']  # students without grades aren't ranked
+    assert column(stream, 'stream_position') == {'Amina': 1, 'Baraka': 2, 'Chebet': 2, 'Dan': 4}
+    assert set(column(stream, 'stream_size').values()) == {4}
+    assert column(stream, 'mean_grade') == {'Amina': 'A', 'Baraka': 'B', 'Chebet': 'B', 'Dan': 'C'}
+    assert column(stream, 'subjects') == {'Amina': 2, 'Baraka': 2, 'Chebet': 2, 'Dan': 2}
+
+    form = rankings(client, headers, form=1)
+    assert column(form, 'form_position') == {'Amina': 1, 'Njeri': 2, 'Baraka': 3, 'Chebet': 3, 'Dan': 5, 'Otieno': 6}
+    assert set(column(form, 'form_size').values()) == {6}
+    # Share of the form with a mean no higher
+    assert column(form, 'percentile') == {'Amina': 100.0, 'Njeri': 83.3, 'Baraka': 66.7, 'Chebet': 66.7,
+                                          'Dan': 33.3, 'Otieno': 16.7}
+    assert column(form, 'stream_position') == {'Amina': 1, 'Njeri': 1, 'Baraka': 2, 'Chebet': 2, 'Dan': 4, 'Otieno': 2}
+
+    # A class without a form is ranked on its own
+    solo = rankings(client, headers, class_id=streams['stream 3'])['Solo']
+    assert (solo['form'], solo['form_position'], solo['form_size'], solo['percentile']) == (None, 1, 1, 100.0)
+
+
+@pytest.fixture
+def graded(app, schools):
+    a, _ = schools
+    with app.app_context():
+        return grade_students(1, a.teacher_id, a.parent_id, a.class_id)
+
+
+def test_positions_and_percentiles(client, schools, graded):
+    a, _ = schools
+    check_form_one(client, a.teacher, graded[1])
+
+
+def test_forms_are_ranked_within_their_school(app, client, schools, graded):
+    a, b = schools
+    with app.app_context(), school_scope(2):
+        subject = Subject(subject_name='Maths', subject_code='MAT', class_id=b.class_id, teacher_id=b.teacher_id)
+        db.session.add(subject)
+        db.session.flush()
+        db.session.add(Grade(student_id=b.student_id, subject_id=subject.id, grade='E'))
+        db.session.commit()
+    form = rankings(client, b.teacher, form=1)
+    assert column(form, 'form_position') == {'B Student': 1} and column(form, 'form_size') == {'B Student': 1}
+    assert set(column(rankings(client, a.teacher, form=1), 'form_size').values()) == {6}
+
+
+def test_moving_a_student_re_ranks_both_classes(app, client, schools, graded):
+    a, _ = schools
+    students, streams = graded
+    with app.app_context(), school_scope(1):
+        db.session.get(Student, students['Chebet']).class_id = streams['stream 3']
+        db.session.commit()
+    stream = rankings(client, a.teacher, class_id=streams['stream 1'])
+    assert column(stream, 'stream_position') == {'Amina': 1, 'Baraka': 2, 'Dan': 3}
+    assert set(column(stream, 'stream_size').values()) == {3}
+    assert column(rankings(client, a.teacher, class_id=streams['stream 3']), 'stream_position') == {'Chebet': 1, 'Solo': 1}
+    form = rankings(client, a.teacher, form=1)
+    assert 'Chebet' not in form and set(column(form, 'form_size').values()) == {5}
+
+
+def test_changing_a_form_re_ranks_both_forms(app, client, schools, graded):
+    a, _ = schools
+    _, streams = graded
+    with app.app_context(), school_scope(1):
+        db.session.get(Class, streams['stream 2']).form = 2
+        db.session.commit()
+    assert column(rankings(client, a.teacher, form=1), 'form_position') == {'Amina': 1, 'Baraka': 2, 'Chebet': 2, 'Dan': 4}
+    assert column(rankings(client, a.teacher, form=2), 'form_position') == {'Njeri': 1, 'Otieno': 2}
+
+
+def test_new_grade_replaces_the_subjects_latest(app, client, schools, graded):
+    a, _ = schools
+    students, _ = graded
+    with app.app_context(), school_scope(1):
+        maths = db.session.query(Subject.id).filter_by(subject_name='Maths').scalar()
+        db.session.add(Grade(student_id=students['Otieno'], subject_id=maths, grade='A'))
+        db.session.commit()
+    otieno = rankings(client, a.teacher, form=1)['Otieno']
+    # (12 + 3) / 2 = 7.5, rounded half up to a B-
+    assert (otieno['mean_points'], otieno['mean_grade'], otieno['form_position']) == (7.5, 'B-', 5)
+
+
+## PostgreSQL ##
+
+@pytest.fixture
+def postgres_graded(postgres_app):
+    with postgres_app.app_context(), school_scope(1):
+        teacher = Teacher(name='Teacher', username='teacher', email='teacher@example.com', password='-')
+        parent = Parent(name='Parent', username='parent', email='parent@example.com', password='-')
+        db.session.add_all([teacher, parent])
+        db.session.flush()
+        first = Class(class_name='1 North', teacher_id=teacher.id)
+        db.session.add(first)
+        db.session.commit()
+        teacher_id, parent_id, class_id = teacher.id, parent.id, first.id
+        _, streams = grade_students(1, teacher_id, parent_id, class_id)
+    token = jwt.encode({'user_id': teacher_id, 'role': 'Teacher', 'school_id': 1,
+                        'exp': datetime.utcnow() + timedelta(hours=1)},
+                       postgres_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}, streams
+
+
+def test_positions_and_percentiles_on_postgresql(postgres_app, postgres_graded):
+    headers, streams = postgres_graded
+    check_form_one(postgres_app.test_client(), headers, streams)
+
+
+def test_refreshes_of_one_form_wait_for_each_other(postgres_app, postgres_graded):
+    _, streams = postgres_graded
+    with postgres_app.app_context(), db.engine.connect() as first, db.engine.connect() as second:
+        assert refresh_rankings(first, [streams['stream 1']]) == 6
+        second.execute(text("SELECT set_config('lock_timeout', '300ms', true)"))
+        # Another form is not held up
+        assert refresh_rankings(second, [streams['stream 3']]) == 1
+        second.commit()
+        # The same form (through its other stream) waits for the first refresh
+        second.execute(text("SELECT set_config('lock_timeout', '300ms', true)"))
+        with pytest.raises(OperationalError, match='lock timeout'):
+            refresh_rankings(second, [streams['stream 2']])
+        second.rollback()
+        first.commit()
@@ -0,0 +1,44 @@
+import pytest
+from app import create_app
+from conftest import close
+
+
+@pytest.fixture
+def client(config):
+    class LimitedConfig(config):
+        RATELIMIT_ENABLED = True
+        RATELIMIT_LOGIN_IP = '6/minute'
+        RATELIMIT_LOGIN_USERNAME = '3/minute'
+        RATELIMIT_PASSWORD_RESET_IP = '100/minute'
+        RATELIMIT_PASSWORD_RESET_EMAIL = '2/hour'
+
+    app = create_app(LimitedConfig)
+    yield app.test_client()
+    close(app)
+
+
+def login(client, username, ip='10.0.0.1'):
+    return client.post('/login', json={'username': username, 'password': 'wrong'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_guessing_one_password_is_limited(client, schools):
+    assert [login(client, 'ateacher').status_code for _ in range(4)] == [401, 401, 401, 429]
+    response = login(client, 'ateacher')
+    assert response.status_code == 429 and int(response.headers['Retry-After']) > 0
+    # Other users are not locked out by it
+    assert login(client, 'bteacher').status_code == 401
+
+
+def test_one_address_is_limited_across_usernames(client, schools):
+    statuses = [login(client, f'user{n}').status_code for n in range(7)]
+    assert statuses == [401] * 6 + [429]
+    assert login(client, 'user7', ip='10.0.0.2').status_code == 401
+
+
+def test_reset_emails_are_limited_per_address(client, schools, monkeypatch):
+    monkeypatch.setattr('routes.passwordreset.send_reset_email', lambda email, token: None)
+    statuses = [client.post('/password-reset-request', json={'email': 'aparent@example.com'}).status_code
+                for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert client.post('/password-reset-request', json={'email': 'bparent@example.com'}).status_code == 200
@@ -0,0 +1,121 @@
+import gzip
+import io
+from urllib.parse import unquote, urlsplit
+import boto3
+import brotli
+import pytest
+from fpdf import FPDF
+from moto import mock_aws
+from werkzeug.datastructures import FileStorage
+from app import create_app
+from conftest import close
+from models import LearningMaterial, db
+from storage import get_storage
+
+BUCKET = 'seclink-materials'
+
+
+def notes_pdf():
+    # Uncompressed, so the precompressed copies are worth keeping
+    pdf = FPDF()
+    pdf.set_compression(False)
+    pdf.add_page()
+    pdf.set_font('helvetica', size=12)
+    for _ in range(40):
+        pdf.cell(text='Photosynthesis turns light, water and carbon dioxide into sugar.')
+        pdf.ln()
+    return bytes(pdf.output())
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def app(config, s3):
+    class S3Config(config):
+        STORAGE_BACKEND = 's3'
+        S3_BUCKET = BUCKET
+        S3_REGION = 'us-east-1'
+
+    app = create_app(S3Config)
+    yield app
+    close(app)
+
+
+def keys(s3):
+    return sorted(item['Key'] for item in s3.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def upload(client, school, data):
+    response = client.post('/learning-material', headers=school.teacher, data={
+        'title': 'Notes', 'student_id': str(school.student_id), 'file': (io.BytesIO(data), 'notes.pdf')})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['file_path']
+
+
+def download(client, school, key, encodings):
+    # The object the download redirects to
+    filename = key.removeprefix('materials/')
+    response = client.get(f'/download/{filename}', headers={**school.parent, 'Accept-Encoding': encodings})
+    assert response.status_code == 302
+    assert response.headers['Cache-Control'] == 'private, max-age=270'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    url = urlsplit(response.headers['Location'])
+    assert 'Signature=' in url.query and f'filename%3D%22{filename}%22' in url.query
+    # Virtual-hosted (bucket.s3.amazonaws.com/key) or path-style (/bucket/key)
+    path = unquote(url.path)
+    return path.removeprefix('/') if url.netloc.startswith(BUCKET) else path.removeprefix(f'/{BUCKET}/')
+
+
+def test_upload_download_and_delete(app, client, schools, s3):
+    a, b = schools
+    data = notes_pdf()
+    key = upload(client, a, data)
+    assert key.startswith('materials/1-') and key.endswith('-notes.pdf')
+    assert keys(s3) == sorted([key, key + '.br', key + '.gz'])
+    assert s3.head_object(Bucket=BUCKET, Key=key)['ContentType'] == 'application/pdf'
+    assert s3.get_object(Bucket=BUCKET, Key=key)['Body'].read() == data
+
+    # The best copy the client takes
+    assert download(client, a, key, 'gzip, br') == key + '.br'
+    assert download(client, a, key, 'gzip') == key + '.gz'
+    assert download(client, a, key, 'identity') == key
+    br = s3.get_object(Bucket=BUCKET, Key=key + '.br')
+    assert (br['ContentEncoding'], br['ContentType']) == ('br', 'application/pdf')
+    assert brotli.decompress(br['Body'].read()) == data
+    assert gzip.decompress(s3.get_object(Bucket=BUCKET, Key=key + '.gz')['Body'].read()) == data
+
+    # A copy that has gone is skipped for the next the client takes (a HEAD each)
+    s3.delete_object(Bucket=BUCKET, Key=key + '.br')
+    assert download(client, a, key, 'br, gzip') == key + '.gz'
+    assert client.get(f"/download/{key.removeprefix('materials/')}", headers=b.parent).status_code == 404
+
+    with app.app_context():
+        material_id = db.session.query(LearningMaterial.id).scalar()
+    response = client.delete('/learning-material', data={'id': str(material_id)}, headers=a.teacher)
+    assert response.status_code == 200
+    assert keys(s3) == []
+
+
+def test_missing_object_is_not_found(client, schools, s3):
+    a, _ = schools
+    key = upload(client, a, notes_pdf())
+    for name in keys(s3):
+        s3.delete_object(Bucket=BUCKET, Key=name)
+    response = client.get(f"/download/{key.removeprefix('materials/')}", headers={**a.parent, 'Accept-Encoding': 'br, gzip'})
+    assert response.status_code == 404
+
+
+def test_uploading_again_under_a_name_drops_its_stale_copies(app, s3):
+    with app.app_context():
+        storage = get_storage()
+        s3.put_object(Bucket=BUCKET, Key='materials/notes.pdf.gz', Body=b'old')
+        key = storage.save(FileStorage(io.BytesIO(b'%PDF new'), 'notes.pdf'), 'notes.pdf')
+    assert key == 'materials/notes.pdf' and keys(s3) == ['materials/notes.pdf']
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from changelog import purge_change_log, record_changes
+from models import db
+
+
+def sync(client, school, since=None):
+    response = client.get('/sync' if since is None else f'/sync?since={since}', headers=school.teacher)
+    return response.status_code, response.get_json()
+
+
+def add_student(client, school, name):
+    response = client.post('/add-student', json={'name': name, 'dob': '2011-01-01', 'overall_grade': 'C',
+                                                 'class_id': school.class_id, 'teacher_id': school.teacher_id,
+                                                 'parent_id': school.parent_id}, headers=school.teacher)
+    assert response.status_code == 200
+
+
+def test_schools_only_get_their_own_changes(client, schools):
+    a, b = schools
+    a_start, b_start = sync(client, a)[1]['next'], sync(client, b)[1]['next']
+    add_student(client, a, 'New in A')
+    assert sync(client, b)[1]['next'] == b_start
+    assert sync(client, b, b_start)[1]['changes'] == {}
+    status, body = sync(client, a, a_start)
+    assert status == 200 and [s['name'] for s in body['changes']['students']['upserts']] == ['New in A']
+    assert body['next'] == sync(client, a)[1]['next'] > a_start
+
+
+def test_purge_only_sends_clients_behind_it_to_reload(app, client, schools):
+    a, b = schools
+    a_behind = sync(client, a)[1]['next']
+    b_next = sync(client, b)[1]['next']
+    add_student(client, a, 'First')
+    add_student(client, a, 'Second')
+    with app.app_context():
+        assert purge_change_log(datetime.utcnow() + timedelta(seconds=1)) > 0
+
+    # B's positions are its own, so A's later entries don't put B's client behind
+    assert sync(client, b, b_next)[0] == 200
+    status, body = sync(client, a, a_behind)
+    assert status == 410
+    assert sync(client, a, body['next']) == (200, {'changes': {}, 'next': body['next'], 'has_more': False})
+
+    add_student(client, a, 'After the purge')
+    body = sync(client, a, body['next'])[1]
+    assert [s['name'] for s in body['changes']['students']['upserts']] == ['After the purge']
+
+
+def test_new_school_starting_from_nothing_is_not_sent_to_reload(app, client, schools):
+    a, b = schools
+    with app.app_context():
+        purge_change_log(datetime.utcnow() + timedelta(seconds=1))
+        # As if B had never written anything: only A has entries (and a marker)
+        db.session.execute(text('DELETE FROM change_log WHERE school_id = 2'))
+        db.session.commit()
+    assert sync(client, b)[1]['next'] == 0
+    add_student(client, b, 'First in B')
+    status, body = sync(client, b, 0)
+    assert status == 200 and [s['name'] for s in body['changes']['students']['upserts']] == ['First in B']
+
+
+## PostgreSQL ##
+
+def lock_timeout(connection):
+    connection.execute(text("SELECT set_config('lock_timeout', '300ms', true)"))
+
+
+def test_change_log_lock_is_per_school(postgres_app):
+    with postgres_app.app_context(), db.engine.connect() as first, db.engine.connect() as second:
+        record_changes(first, 'students', [1], school_id=1)
+        # Another school's writer doesn't wait for the first transaction
+        lock_timeout(second)
+        record_changes(second, 'students', [2], school_id=2)
+        second.commit()
+        # The same school's does
+        lock_timeout(second)
+        with pytest.raises(OperationalError, match='lock timeout'):
+            record_changes(second, 'students', [3], school_id=1)
+        second.rollback()
+        first.commit()
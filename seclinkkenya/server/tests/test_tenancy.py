@@ -0,0 +1,133 @@
+import pytest
+from models import Notifications, Parent, Student, db
+from tenancy import any_school, enter_school, school_scope
+
+
+## Requests without a token ##
+
+@pytest.mark.parametrize('method, path', [
+    ('get', '/students'),
+    ('get', '/students/1'),
+    ('patch', '/students/1'),
+    ('delete', '/students/1'),
+    ('post', '/add-student'),
+    ('post', '/class'),
+    ('get', '/classes'),
+    ('get', '/class/1/subjects'),
+    ('get', '/notifications'),
+    ('post', '/notifications'),
+    ('get', '/download/notes.pdf'),
+])
+def test_routes_need_a_token(client, schools, method, path):
+    response = getattr(client, method)(path, json={})
+    assert response.status_code == 403
+
+
+def test_tenant_query_without_a_school_fails(app, schools):
+    with app.test_request_context():
+        with pytest.raises(PermissionError):
+            db.session.query(Student).all()
+        # Lookups meant to span schools say so
+        with any_school():
+            assert db.session.query(Student).count() == 2
+
+
+def test_scripts_see_every_school(app, schools):
+    with app.app_context():
+        assert db.session.query(Student).count() == 2
+
+
+## Another school's token ##
+
+def test_reads_stay_in_the_school(client, schools):
+    a, b = schools
+    assert [student['id'] for student in client.get('/students', headers=b.teacher).get_json()] == [b.student_id]
+    assert client.get(f'/students/{a.student_id}', headers=b.teacher).status_code == 404
+    assert client.get(f'/students/{a.student_id}', headers=a.teacher).status_code == 200
+
+
+def test_changes_stay_in_the_school(client, schools):
+    a, b = schools
+    assert client.patch(f'/students/{a.student_id}', json={'name': 'X'}, headers=b.teacher).status_code == 404
+    assert client.delete(f'/students/{a.student_id}', headers=b.teacher).status_code == 404
+    assert client.get(f'/students/{a.student_id}', headers=a.teacher).get_json()['name'] == 'A Student'
+
+
+@pytest.mark.parametrize('field', ['class_id', 'teacher_id', 'parent_id'])
+def test_new_student_cannot_point_at_another_school(client, schools, field):
+    a, b = schools
+    body = {'name': 'New', 'dob': '2011-01-01', 'overall_grade': 'C', 'class_id': a.class_id,
+            'teacher_id': a.teacher_id, 'parent_id': a.parent_id}
+    response = client.post('/add-student', json=dict(body, **{field: getattr(b, field)}), headers=a.teacher)
+    assert response.status_code == 404
+    assert len(client.get('/students', headers=a.teacher).get_json()) == 1
+
+
+def test_student_cannot_be_moved_to_another_school(client, schools):
+    a, b = schools
+    response = client.patch(f'/students/{a.student_id}', json={'name': 'A Student', 'parent_id': b.parent_id},
+                            headers=a.teacher)
+    assert response.status_code == 404
+
+
+def test_class_cannot_get_another_schools_teacher(client, schools):
+    a, b = schools
+    response = client.post('/class', json={'class_name': 'X', 'teacher_id': b.teacher_id}, headers=a.teacher)
+    assert response.status_code == 404
+
+
+def test_notification_only_to_own_school(app, client, schools):
+    a, b = schools
+    response = client.post('/notifications', json={'message': 'Hi', 'parent_id': b.parent_id}, headers=a.teacher)
+    assert response.status_code == 404
+    response = client.post('/notifications', json={'message': 'Hi', 'parent_id': a.parent_id}, headers=a.teacher)
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.query(Notifications).count() == 1
+
+
+def test_parents_only_see_their_schools_notifications(app, client, schools):
+    a, b = schools
+    # Another school writing to the same parent id, e.g. through a script
+    with app.app_context(), school_scope(2):
+        db.session.add(Notifications(message='Other school', parent_id=a.parent_id))
+        db.session.commit()
+    assert client.get('/notifications', headers=a.parent).get_json() == []
+    response = client.get('/notifications/poll?after=0&timeout=0', headers=a.parent)
+    assert response.get_json()['notifications'] == []
+
+
+def test_relationship_loads_are_scoped(app, schools):
+    a, b = schools
+    # A student of the other school linked to this parent
+    with app.app_context(), school_scope(2):
+        db.session.add(Student(name='Elsewhere', dob='2010-01-01', class_id=b.class_id, teacher_id=b.teacher_id,
+                               parent_id=a.parent_id))
+        db.session.commit()
+    with app.test_request_context():
+        # Loaded before the school is known, as for a token from before schools existed
+        with any_school():
+            parent = db.session.get(Parent, a.parent_id)
+        enter_school(1)
+        assert [child.name for child in parent.children] == ['A Student']
+
+
+## Roles ##
+
+def test_parents_cannot_change_students(client, schools):
+    a, _ = schools
+    assert client.patch(f'/students/{a.student_id}', json={'name': 'X'}, headers=a.parent).status_code == 403
+    assert client.delete(f'/students/{a.student_id}', headers=a.parent).status_code == 403
+
+
+def test_only_teachers_add_classes(client, schools):
+    a, _ = schools
+    assert client.post('/class', json={'class_name': 'X', 'teacher_id': a.teacher_id},
+                       headers=a.parent).status_code == 403
+    assert client.get(f'/class/{a.class_id}/subjects', headers=a.parent).status_code == 403
+
+
+def test_teachers_list_their_own_classes(client, schools):
+    a, b = schools
+    assert [c['id'] for c in client.get('/classes', headers=a.teacher).get_json()] == [a.class_id]
+    assert [c['id'] for c in client.get('/classes', headers=b.teacher).get_json()] == [b.class_id]
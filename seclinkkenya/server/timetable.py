@@ -0,0 +1,272 @@
+import random
+import time
+from collections import Counter, defaultdict
+from flask import current_app
+from sqlalchemy import select
+from models import Subject, TeacherUnavailability, TimetableSlot, db
+
+# Weekly timetables. Each subject of a class (a Subject row: its class and its teacher) is
+# taught `periods_per_week` times in a week of TIMETABLE_DAYS days of TIMETABLE_PERIODS
+# periods. A timetable is clash-free when no class and no teacher has two lessons in one
+# period and no teacher teaches in a period they are unavailable (teacher_unavailability).
+# Less important, a subject's lessons are spread over the week: no more on one day than
+# needed (e.g. at most 2 a day for 6 a week).
+#
+# The solver works in two steps, on slots numbered day * periods + period:
+#   1. Construction with constraint propagation. The subject with the least room left (the
+#      periods where both its class and its teacher are still free, less the lessons it
+#      still needs) gets its next lesson, in one of those periods, on the day it has the
+#      fewest lessons. When a subject has no such period left, its lesson goes in a period
+#      free for the class and the teacher is double booked, for step 2 to repair. A class
+#      is never double booked.
+#   2. Tabu search. A lesson in a clash (or a crowded day) is moved to another period of
+#      its class, swapping with the class's lesson there, choosing the move that leaves the
+#      fewest clashes. Moves just undone are barred for a few steps so the search doesn't
+#      go round in circles. It stops when nothing is left to repair, or at the time limit.
+
+HARD = 100  # weight of a clash against a crowded day
+
+
+def bits(mask):
+    # The set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Solver:
+    def __init__(self, subjects, unavailable, days, periods, seed=None):
+        # subjects: (subject id, class id, teacher id, periods per week);
+        # unavailable: {teacher id: slots they can't teach}
+        self.subjects = subjects
+        self.days, self.periods, self.size = days, periods, days * periods
+        self.blocked = {teacher_id: frozenset(slots) for teacher_id, slots in unavailable.items()}
+        self.random = random.Random(seed)
+        # Most lessons of each subject that fit on one day without crowding it
+        self.caps = [-(-count // days) for _, _, _, count in subjects]
+
+        self.lessons_of = []
+        self.lesson_subject, self.lesson_class, self.lesson_teacher = [], [], []
+        for k, (_, class_id, teacher_id, count) in enumerate(subjects):
+            self.lessons_of.append(range(len(self.lesson_subject), len(self.lesson_subject) + count))
+            self.lesson_subject += [k] * count
+            self.lesson_class += [class_id] * count
+            self.lesson_teacher += [teacher_id] * count
+        self.slot = [None] * len(self.lesson_subject)
+
+        self.class_at = defaultdict(lambda: [None] * self.size)  # class: its lesson in each slot
+        self.teacher_at = defaultdict(lambda: [[] for _ in range(self.size)])  # teacher: lessons in each slot
+        self.subject_days = [[0] * days for _ in subjects]  # subject: lessons each day
+        self.clashes = set()  # (teacher, slot) with a clash
+        self.crowded = set()  # (subject, day) with too many lessons
+        self.hard = self.soft = 0
+        self.iterations = 0
+
+    def check(self):
+        # Timetables that can't exist, however the lessons are placed
+        class_load, teacher_load = Counter(), Counter()
+        for subject_id, class_id, teacher_id, count in self.subjects:
+            if not 0 <= count <= self.size:
+                raise ValueError(f'Subject {subject_id} has {count} periods a week, the week has {self.size}')
+            class_load[class_id] += count
+            teacher_load[teacher_id] += count
+        for class_id, load in class_load.items():
+            if load > self.size:
+                raise ValueError(f'Class {class_id} has {load} periods a week, the week has {self.size}')
+        for teacher_id, load in teacher_load.items():
+            available = self.size - len(self.blocked.get(teacher_id, ()))
+            if load > available:
+                raise ValueError(f'Teacher {teacher_id} has {load} periods a week, but is available for {available}')
+
+    ## State ##
+
+    def cost(self):
+        return HARD * self.hard + self.soft
+
+    def hard_cost(self, teacher_id, slot):
+        count = len(self.teacher_at[teacher_id][slot])
+        return max(count - 1, 0) + (count if slot in self.blocked.get(teacher_id, ()) else 0)
+
+    def soft_cost(self, k, day):
+        return max(self.subject_days[k][day] - self.caps[k], 0)
+
+    def _change(self, lesson, slot, add):
+        teacher_id, k, day = self.lesson_teacher[lesson], self.lesson_subject[lesson], slot // self.periods
+        self.hard -= self.hard_cost(teacher_id, slot)
+        self.soft -= self.soft_cost(k, day)
+        if add:
+            self.slot[lesson] = slot
+            self.class_at[self.lesson_class[lesson]][slot] = lesson
+            self.teacher_at[teacher_id][slot].append(lesson)
+            self.subject_days[k][day] += 1
+        else:
+            self.slot[lesson] = None
+            self.class_at[self.lesson_class[lesson]][slot] = None
+            self.teacher_at[teacher_id][slot].remove(lesson)
+            self.subject_days[k][day] -= 1
+        hard, soft = self.hard_cost(teacher_id, slot), self.soft_cost(k, day)
+        self.hard += hard
+        self.soft += soft
+        (self.clashes.add if hard else self.clashes.discard)((teacher_id, slot))
+        (self.crowded.add if soft else self.crowded.discard)((k, day))
+
+    def place(self, lesson, slot):
+        self._change(lesson, slot, add=True)
+
+    def unplace(self, lesson):
+        self._change(lesson, self.slot[lesson], add=False)
+
+    def move(self, lesson, slot):
+        # `lesson` to `slot`, and the class's lesson there (returned, if any) to where `lesson` was
+        previous = self.slot[lesson]
+        other = self.class_at[self.lesson_class[lesson]][slot]
+        self.unplace(lesson)
+        if other is not None:
+            self.unplace(other)
+            self.place(other, previous)
+        self.place(lesson, slot)
+        return other
+
+    def load(self, slots):
+        for lesson, slot in enumerate(self.slot):
+            if slot is not None:
+                self.unplace(lesson)
+        for lesson, slot in enumerate(slots):
+            self.place(lesson, slot)
+
+    ## 1. Construction ##
+
+    def construct(self):
+        week = (1 << self.size) - 1
+        class_free = defaultdict(lambda: week)
+        teacher_free = {teacher_id: week & ~sum(1 << slot for slot in self.blocked.get(teacher_id, ()))
+                        for teacher_id in set(self.lesson_teacher)}
+        remaining = {k: list(lessons) for k, lessons in enumerate(self.lessons_of) if lessons}
+
+        def room(k):
+            _, class_id, teacher_id, _ = self.subjects[k]
+            return (class_free[class_id] & teacher_free[teacher_id]).bit_count() - len(remaining[k])
+
+        while remaining:
+            k = min(remaining, key=lambda k: (room(k), -len(remaining[k]), self.random.random()))
+            _, class_id, teacher_id, _ = self.subjects[k]
+            lesson = remaining[k].pop()
+            if not remaining[k]:
+                del remaining[k]
+
+            free = class_free[class_id] & teacher_free[teacher_id]
+            if free:
+                slot = min(bits(free), key=lambda slot: (
+                    self.subject_days[k][slot // self.periods], self.random.random()))
+            else:
+                # Double book the teacher where it costs least
+                slot = min(bits(class_free[class_id]), key=lambda slot: (
+                    len(self.teacher_at[teacher_id][slot]) + (slot in self.blocked.get(teacher_id, ())),
+                    self.subject_days[k][slot // self.periods], self.random.random()))
+            self.place(lesson, slot)
+            class_free[class_id] &= ~(1 << slot)
+            teacher_free[teacher_id] &= ~(1 << slot)
+
+    ## 2. Tabu search ##
+
+    def pick(self):
+        # A lesson to move: one in a clash, else one on a crowded day
+        if self.clashes:
+            teacher_id, slot = self.random.choice(tuple(self.clashes))
+            return self.random.choice(self.teacher_at[teacher_id][slot])
+        k, day = self.random.choice(tuple(self.crowded))
+        return self.random.choice([lesson for lesson in self.lessons_of[k]
+                                   if self.slot[lesson] // self.periods == day])
+
+    def search(self, deadline, patience=2000):
+        # Stops when the cost is 0, at the deadline, or after `patience` moves without
+        # improvement once there are no clashes
+        best_cost, best = self.cost(), list(self.slot)
+        tabu = {}
+        idle = 0
+        while best_cost and time.monotonic() < deadline and not (idle > patience and best_cost < HARD):
+            self.iterations += 1
+            lesson = self.pick()
+            previous = self.slot[lesson]
+            moves, lowest = [], None
+            for slot in range(self.size):
+                if slot == previous:
+                    continue
+                other = self.move(lesson, slot)
+                cost = self.cost()
+                self.move(lesson, previous)
+                barred = tabu.get((lesson, slot), 0) > self.iterations or (
+                    other is not None and tabu.get((other, previous), 0) > self.iterations)
+                if barred and cost >= best_cost:
+                    continue
+                if lowest is None or cost < lowest:
+                    moves, lowest = [slot], cost
+                elif cost == lowest:
+                    moves.append(slot)
+            if not moves:
+                continue
+
+            slot = self.random.choice(moves)
+            other = self.move(lesson, slot)
+            tenure = self.iterations + 5 + self.random.randrange(10)
+            tabu[lesson, previous] = tenure
+            if other is not None:
+                tabu[other, slot] = tenure
+
+            if self.cost() < best_cost:
+                best_cost, best = self.cost(), list(self.slot)
+                idle = 0
+            else:
+                idle += 1
+            if idle > patience and self.hard:
+                # Stuck with clashes: shake the timetable up a little and carry on from there
+                for _ in range(self.random.randint(5, 15)):
+                    lesson, slot = self.random.randrange(len(self.slot)), self.random.randrange(self.size)
+                    if slot != self.slot[lesson]:
+                        self.move(lesson, slot)
+                idle = 0
+        if self.cost() > best_cost:
+            self.load(best)
+
+
+def solve(subjects, unavailable, days, periods, time_limit, seed=None):
+    solver = Solver(subjects, unavailable, days, periods, seed=seed)
+    solver.check()
+    deadline = time.monotonic() + time_limit
+    solver.construct()
+    solver.search(deadline)
+    return solver
+
+
+## Timetables in the database ##
+
+def grid():
+    return current_app.config.get('TIMETABLE_DAYS', 5), current_app.config.get('TIMETABLE_PERIODS', 8)
+
+
+def generate_timetable(time_limit=None):
+    # Solves for the current school's subjects and, when it is clash-free, replaces its
+    # timetable (the caller commits). Returns the solver, for its counts.
+    days, periods = grid()
+    subjects = db.session.execute(
+        select(Subject.id, Subject.class_id, Subject.teacher_id, Subject.periods_per_week)
+        .where(Subject.periods_per_week > 0).order_by(Subject.id)).all()
+    unavailable = defaultdict(set)
+    for teacher_id, day, period in db.session.execute(
+            select(TeacherUnavailability.teacher_id, TeacherUnavailability.day, TeacherUnavailability.period)):
+        if day < days and period < periods:
+            unavailable[teacher_id].add(day * periods + period)
+
+    if time_limit is None:
+        time_limit = current_app.config.get('TIMETABLE_TIME_LIMIT', 30)
+    solver = solve([tuple(subject) for subject in subjects], unavailable, days, periods, time_limit)
+    if solver.hard:
+        return solver
+
+    TimetableSlot.query.delete()
+    db.session.add_all([TimetableSlot(subject_id=solver.subjects[k][0], class_id=solver.lesson_class[lesson],
+                                      teacher_id=solver.lesson_teacher[lesson],
+                                      day=slot // periods, period=slot % periods)
+                        for lesson, (k, slot) in enumerate(zip(solver.lesson_subject, solver.slot))])
+    return solver